@@ -2,10 +2,15 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from flask import Flask
+from flask import Flask, Response, jsonify
 from flask_cors import CORS
 from config import Config
-from routes.prediction_routes import prediction_bp
+from routes.prediction_routes import prediction_bp, prediction_service
+from routes.model_routes import model_bp
+from routes.record_routes import record_bp
+from routes.user_routes import user_bp
+from services.metrics import registry
+from services.startup import timeline
 
 def create_app():
     app = Flask(__name__)
@@ -15,19 +20,49 @@ def create_app():
     CORS(app)
 
     # Register blueprints
-    print("Registering prediction blueprint...")
     app.register_blueprint(prediction_bp, url_prefix='/api')
-    print("Blueprint registered successfully")
+    app.register_blueprint(model_bp, url_prefix='/api')
+    app.register_blueprint(record_bp, url_prefix='/api')
+    app.register_blueprint(user_bp, url_prefix='/api')
 
     @app.route('/')
     def index():
         return {'message': 'CardioCare API is running'}
 
-    # List all routes for debugging
-    print("Registered routes:")
-    for rule in app.url_map.iter_rules():
-        print(f"  {rule.rule} -> {rule.endpoint}")
-    print("App initialization complete!")
+    @app.route('/api/metrics')
+    def metrics():
+        # Prometheus text exposition format
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+    @app.route('/api/health')
+    def health():
+        # Liveness: the process is up and serving, whatever the model is doing
+        return jsonify({'status': 'alive'}), 200
+
+    @app.route('/api/ready')
+    def ready():
+        # Readiness: a model is loaded and warmed up
+        body = {
+            'ready': prediction_service.ready,
+            'status': prediction_service.status,
+            'model_version': prediction_service.model_version
+        }
+        if prediction_service.startup_error:
+            body['error'] = prediction_service.startup_error
+        return jsonify(body), 200 if prediction_service.ready else 503
+
+    timeline.mark('app_created')
+
+    # Load the model without blocking startup, unless it has to be in memory
+    # before workers fork (gunicorn preload)
+    if not prediction_service.ready:
+        if Config.MODEL_LOAD_MODE == 'eager':
+            prediction_service.load_and_warm_up()
+        else:
+            prediction_service.start_background_load()
+
+    # Pick up newly activated model versions without a restart
+    prediction_service.start_watcher(Config.MODEL_WATCH_INTERVAL)
 
     return app
 
@@ -6,7 +6,66 @@ class Config:
 
     # MongoDB settings
     MONGO_URI = os.environ.get('MONGO_URI') or 'mongodb://localhost:27017/cardio_care'
+    # Store every prediction in MongoDB through a background write-behind queue
+    RECORD_PREDICTIONS = (os.environ.get('RECORD_PREDICTIONS') or '0') == '1'
+    RECORD_BATCH_SIZE = int(os.environ.get('RECORD_BATCH_SIZE') or 100)
+    RECORD_FLUSH_INTERVAL_MS = float(os.environ.get('RECORD_FLUSH_INTERVAL_MS') or 500)
+    RECORD_QUEUE_SIZE = int(os.environ.get('RECORD_QUEUE_SIZE') or 10000)
+
+    # Versioned artifacts live in MODEL_DIR/versions/<version>/; versions/CURRENT
+    # names the one to serve. MODEL_PATH/SCALER_PATH are used when no version exists.
+    MODEL_DIR = os.environ.get('MODEL_DIR') or os.path.join(os.path.dirname(__file__), 'models')
+    # Seconds between checks for a newly activated version (0 disables the watcher)
+    MODEL_WATCH_INTERVAL = float(os.environ.get('MODEL_WATCH_INTERVAL') or 0)
+    # Required in the X-Admin-Token header of admin endpoints when set
+    ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
 
     # Model path
     MODEL_PATH = os.path.join(os.path.dirname(__file__), 'models', 'ml_model.pkl')
-    SCALER_PATH = os.path.join(os.path.dirname(__file__), 'models', 'scaler.pkl')
\ No newline at end of file
+    SCALER_PATH = os.path.join(os.path.dirname(__file__), 'models', 'scaler.pkl')
+    # Reported with metrics; defaults to the model file's modification time
+    MODEL_VERSION = os.environ.get('MODEL_VERSION')
+    # How the model is evaluated: 'sklearn' or 'native' (flattened forest arrays)
+    PREDICTION_BACKEND = os.environ.get('PREDICTION_BACKEND') or 'sklearn'
+    # 'background' loads the model after the app starts serving health checks;
+    # 'eager' loads it inside create_app (needed when gunicorn preloads the app)
+    MODEL_LOAD_MODE = os.environ.get('MODEL_LOAD_MODE') or 'background'
+    # Synthetic batch sizes scored before a model is marked ready
+    WARMUP_BATCH_SIZES = [int(size) for size in (os.environ.get('WARMUP_BATCH_SIZES') or '1,8,64,512').split(',')]
+    # 'mmap' serves the native backend from memory-mapped arrays shared by all workers
+    MODEL_SHARING = os.environ.get('MODEL_SHARING') or None
+    # 'compact' lets the native backend load a version's forest.ccf (NumPy
+    # only, no sklearn import) instead of unpickling; 'pickle' always unpickles
+    MODEL_FORMAT = os.environ.get('MODEL_FORMAT') or 'compact'
+
+    # In-process cache of prediction results (0 disables it)
+    PREDICTION_CACHE_SIZE = int(os.environ.get('PREDICTION_CACHE_SIZE') or 10000)
+    PREDICTION_CACHE_TTL = float(os.environ.get('PREDICTION_CACHE_TTL') or 3600)
+    # Explanations are cached the same way, with the same TTL (0: no cache)
+    EXPLANATION_CACHE_SIZE = int(os.environ.get('EXPLANATION_CACHE_SIZE') or 2000)
+
+    # Queue concurrent /api/predict calls and score them as one matrix
+    # (worthwhile with threaded workers, e.g. GUNICORN_THREADS > 1)
+    MICRO_BATCHING = (os.environ.get('MICRO_BATCHING') or '0') == '1'
+    MICRO_BATCH_MAX_SIZE = int(os.environ.get('MICRO_BATCH_MAX_SIZE') or 32)
+    MICRO_BATCH_MAX_WAIT_MS = float(os.environ.get('MICRO_BATCH_MAX_WAIT_MS') or 5)
+
+    # Admission control on the prediction and record endpoints. Clients send
+    # X-API-Key; keys carry their own limits, others get the defaults (per IP)
+    API_KEYS_REQUIRED = (os.environ.get('API_KEYS_REQUIRED') or '0') == '1'
+    DEFAULT_RATE_LIMIT = float(os.environ.get('DEFAULT_RATE_LIMIT') or 50)  # requests/s, 0: unlimited
+    DEFAULT_RATE_BURST = float(os.environ.get('DEFAULT_RATE_BURST') or 100)
+    API_KEY_CACHE_TTL = float(os.environ.get('API_KEY_CACHE_TTL') or 60)
+    # Requests served at once per process before shedding with 503 (0: no cap)
+    MAX_IN_FLIGHT = int(os.environ.get('MAX_IN_FLIGHT') or 64)
+
+    # Upper bound on records accepted by /api/predict/batch
+    MAX_BATCH_SIZE = int(os.environ.get('MAX_BATCH_SIZE') or 10000)
+    # Upper bound on records accepted by /api/explain
+    MAX_EXPLAIN_BATCH_SIZE = int(os.environ.get('MAX_EXPLAIN_BATCH_SIZE') or 1000)
+
+    # Rows vectorized and scored at a time by /api/predict/stream
+    STREAM_CHUNK_ROWS = int(os.environ.get('STREAM_CHUNK_ROWS') or 2000)
+
+    # Upper bound on rows (all grid points plus the patient) scored by /api/predict/whatif
+    MAX_WHATIF_ROWS = int(os.environ.get('MAX_WHATIF_ROWS') or 2000)
@@ -0,0 +1,33 @@
+# gunicorn -c gunicorn.conf.py wsgi:app  (run from the backend directory)
+import os
+
+bind = os.environ.get('GUNICORN_BIND') or '0.0.0.0:5000'
+workers = int(os.environ.get('GUNICORN_WORKERS') or 2)
+threads = int(os.environ.get('GUNICORN_THREADS') or 1)
+
+# Load the app (and the model) once in the master and fork workers from it.
+# Defaults on when the model is memory-mapped, so workers share its pages.
+preload_app = (os.environ.get('GUNICORN_PRELOAD') or
+               ('1' if os.environ.get('MODEL_SHARING') == 'mmap' else '0')) == '1'
+
+# A model loading in a background thread of the master would be lost at
+# fork, so a preloading master loads it before forking
+if preload_app:
+    os.environ.setdefault('MODEL_LOAD_MODE', 'eager')
+
+
+def post_fork(server, worker):
+    # Background threads started in a preloading master do not survive fork;
+    # without preloading, create_app starts them in each worker itself
+    if not server.cfg.preload_app:
+        return
+    from config import Config
+    from routes.prediction_routes import prediction_service
+    prediction_service.start_watcher(Config.MODEL_WATCH_INTERVAL)
+
+
+def worker_exit(server, worker):
+    # Write out queued prediction records before the worker goes away
+    from routes.prediction_routes import record_writer
+    if record_writer is not None:
+        record_writer.close()
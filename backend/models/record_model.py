@@ -0,0 +1,78 @@
+import os
+import sys
+from datetime import datetime, timezone
+
+# database/ lives next to backend/
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from database.connection import get_database
+from database.init_db import create_indexes
+
+COLLECTION = 'prediction_records'
+
+# Newest first; _id breaks ties between records with the same timestamp
+SORT = [('timestamp', -1), ('_id', -1)]
+
+
+def build_record(input_data, result, timestamp=None):
+    """
+    A prediction record document: the submitted features, the scored result
+    and the model version that produced it. user_id is taken from the input's
+    metadata when present.
+    """
+    features = {key: value for key, value in input_data.items() if key != 'user_id'}
+    return {
+        'user_id': input_data.get('user_id'),
+        'timestamp': timestamp or datetime.now(timezone.utc),
+        'input': features,
+        'prediction': result['prediction'],
+        'probability': result['probability'],
+        'risk_level': result['risk_level'],
+        'model_version': result.get('model_version')
+    }
+
+
+class RecordModel:
+    """Access to the prediction_records collection"""
+
+    def __init__(self, db=None, uri=None):
+        self.db = db if db is not None else get_database(uri)
+        self.collection = self.db[COLLECTION]
+
+    def ensure_indexes(self):
+        """Create the listing indexes (see database/init_db.py) if missing; returns self"""
+        create_indexes(self.db)
+        return self
+
+    def insert_many(self, records):
+        """Insert a batch of records; unordered, so one bad document does not stop the rest"""
+        if not records:
+            return []
+        return self.collection.insert_many(records, ordered=False).inserted_ids
+
+    def find_by_user(self, user_id, limit=50):
+        """A user's most recent records, newest first"""
+        return self.page({'user_id': user_id}, limit)
+
+    def page(self, filters, limit, after=None, projection=None):
+        """
+        Up to limit records matching filters, newest first.
+
+        after: (timestamp, _id) of the last record of the previous page. The
+        next page starts right after it in (timestamp, _id) order, so with the
+        indexes from database/init_db.py every page costs the same, unlike
+        skip(), which walks over all the earlier records.
+        """
+        query = dict(filters)
+        if after is not None:
+            timestamp, record_id = after
+            keyset = {'$or': [
+                {'timestamp': {'$lt': timestamp}},
+                {'timestamp': timestamp, '_id': {'$lt': record_id}}
+            ]}
+            query = {'$and': [query, keyset]} if query else keyset
+        cursor = self.collection.find(query, projection).sort(SORT).limit(limit)
+        return list(cursor)
+
+    def count(self, query=None):
+        return self.collection.count_documents(query or {})
@@ -0,0 +1,58 @@
+import hashlib
+import os
+import secrets
+import sys
+from datetime import datetime, timezone
+
+# database/ lives next to backend/
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from database.connection import get_database
+
+COLLECTION = 'api_keys'
+
+
+def hash_key(key):
+    """Keys are stored as SHA-256 hashes, never in plain text"""
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+class UserModel:
+    """API clients (integrations) and their keys and rate limits"""
+
+    def __init__(self, db=None, uri=None):
+        self.db = db if db is not None else get_database(uri)
+        self.collection = self.db[COLLECTION]
+
+    def create(self, name, rate_limit=None, burst=None):
+        """
+        Register a client and return its new API key (shown only this once).
+        rate_limit/burst: requests per second and bucket size (None: server defaults)
+        """
+        key = secrets.token_urlsafe(32)
+        self.collection.insert_one({
+            'name': name,
+            'key_hash': hash_key(key),
+            'rate_limit': rate_limit,
+            'burst': burst,
+            'active': True,
+            'created_at': datetime.now(timezone.utc)
+        })
+        return key
+
+    def find_by_key(self, key):
+        """The active client owning key, or None"""
+        return self.collection.find_one({'key_hash': hash_key(key), 'active': True}, {'_id': 0})
+
+    def get(self, name):
+        return self.collection.find_one({'name': name}, {'_id': 0, 'key_hash': 0})
+
+    def list(self):
+        return list(self.collection.find({}, {'_id': 0, 'key_hash': 0}).sort('name', 1))
+
+    def update_limits(self, name, rate_limit, burst):
+        return self.collection.update_one(
+            {'name': name}, {'$set': {'rate_limit': rate_limit, 'burst': burst}}).matched_count > 0
+
+    def deactivate(self, name):
+        return self.collection.update_one({'name': name}, {'$set': {'active': False}}).matched_count > 0
@@ -0,0 +1,66 @@
+import threading
+
+from flask import Blueprint, request, jsonify
+from routes.prediction_routes import prediction_service
+from routes.user_routes import admin_rejection
+from services.model_store import activate_version, active_version, list_versions
+
+model_bp = Blueprint('model', __name__)
+
+
+def _reload_in_background(version):
+    try:
+        prediction_service.reload(version)
+    except Exception as e:
+        print(f"Background model reload failed: {e}")
+
+
+@model_bp.route('/model', methods=['GET'])
+def model_info():
+    bundle = prediction_service.bundle
+    return jsonify({
+        'status': prediction_service.status,
+        'serving_version': bundle.version if bundle else None,
+        'backend': bundle.backend if bundle else None,
+        'loaded_at': bundle.loaded_at if bundle else None,
+        'active_version': active_version(),
+        'available_versions': list_versions(),
+        # Counts are for the worker process that answered
+        'cache': {
+            'prediction': prediction_service.cache.stats(),
+            'explanation': prediction_service.explanation_cache.stats()
+        }
+    }), 200
+
+
+@model_bp.route('/model/reload', methods=['POST'])
+def reload_model():
+    """
+    Load a model version in the background and swap it in once ready.
+
+    With a "version" in the body, that version is also written to
+    versions/CURRENT so the watchers in the other workers follow. Without
+    one, the currently active version is (re)loaded.
+    """
+    rejection = admin_rejection()
+    if rejection:
+        return rejection
+
+    data = request.get_json(silent=True) or {}
+    version = data.get('version')
+
+    if version is not None:
+        if version not in list_versions():
+            return jsonify({'error': f'Unknown model version: {version}'}), 404
+        activate_version(version)
+    else:
+        version = active_version()
+
+    # Loading can take seconds; keep it off the request path
+    threading.Thread(target=_reload_in_background, args=(version,), name='model-reload', daemon=True).start()
+
+    return jsonify({
+        'status': 'reloading',
+        'version': version,
+        'serving_version': prediction_service.model_version
+    }), 202
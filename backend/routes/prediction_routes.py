@@ -1,36 +1,284 @@
-from flask import Blueprint, request, jsonify
-from services.prediction_service import PredictionService
+import atexit
+
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from config import Config
+from models.record_model import RecordModel, build_record
+from services.metrics import ERRORS, REQUESTS, STAGE_SECONDS
+from services.micro_batcher import MicroBatcher
+from services.prediction_service import PredictionService, validate_record
+from services.record_writer import RecordWriter
+from services.stream_scoring import StreamScorer
+from services.whatif import sensitivity_curves
+from routes.user_routes import install_admission
 
 prediction_bp = Blueprint('prediction', __name__)
-prediction_service = PredictionService()
+install_admission(prediction_bp)
+
+# The model is loaded by create_app (in the background by default), so
+# importing this module stays fast
+prediction_service = PredictionService(load=False)
+
+# Optional: score concurrent single-record requests together
+micro_batcher = None
+if Config.MICRO_BATCHING:
+    micro_batcher = MicroBatcher(
+        prediction_service,
+        max_batch_size=Config.MICRO_BATCH_MAX_SIZE,
+        max_wait=Config.MICRO_BATCH_MAX_WAIT_MS / 1000.0
+    )
+
+# Predictions are stored in MongoDB off the request path
+record_writer = None
+if Config.RECORD_PREDICTIONS:
+    record_writer = RecordWriter(
+        # Created on the writer thread, so the index check stays off the request path
+        lambda: RecordModel(uri=Config.MONGO_URI).ensure_indexes(),
+        batch_size=Config.RECORD_BATCH_SIZE,
+        flush_interval=Config.RECORD_FLUSH_INTERVAL_MS / 1000.0,
+        max_queue=Config.RECORD_QUEUE_SIZE
+    )
+    atexit.register(record_writer.close)
+
+
+def _error(endpoint, message, status):
+    ERRORS.inc((endpoint, str(status)))
+    return jsonify({'error': message}), status
+
+
+@prediction_bp.before_request
+def require_ready_model():
+    if not prediction_service.ready:
+        endpoint = request.endpoint.rsplit('.', 1)[-1]
+        REQUESTS.inc(endpoint)
+        response, status = _error(endpoint, 'Model is not ready yet', 503)
+        response.headers['Retry-After'] = '1'
+        return response, status
+
 
 @prediction_bp.route('/predict', methods=['POST'])
 def predict():
+    REQUESTS.inc('predict')
     try:
-        print("Received prediction request")
-        data = request.get_json()
-        print(f"Request data: {data}")
+        with STAGE_SECONDS.time('parse'):
+            data = request.get_json(silent=True)
 
         if not data:
-            print("No input data provided")
-            return jsonify({'error': 'No input data provided'}), 400
+            return _error('predict', 'No input data provided', 400)
 
-        # Validate required fields (basic validation)
-        required_fields = ['age', 'gender_Male']  # At minimum
-        for field in required_fields:
-            if field not in data:
-                print(f"Missing required field: {field}")
-                return jsonify({'error': f'Missing required field: {field}'}), 400
+        # Validate required fields and value types
+        with STAGE_SECONDS.time('validation'):
+            error = validate_record(data)
+        if error:
+            return _error('predict', error, 400)
 
-        print("Making prediction...")
         # Make prediction
-        result = prediction_service.predict(data)
-        print(f"Prediction result: {result}")
+        if micro_batcher is not None:
+            result = micro_batcher.submit(data)
+        else:
+            result = prediction_service.predict(data)
+
+        if record_writer is not None:
+            record_writer.submit(build_record(data, result))
 
-        return jsonify(result), 200
+        with STAGE_SECONDS.time('serialization'):
+            response = jsonify(result)
+        return response, 200
 
     except Exception as e:
         print(f"Error in prediction route: {e}")
         import traceback
         traceback.print_exc()
-        return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
\ No newline at end of file
+        ERRORS.inc(('predict', '500'))
+        return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
+
+
+@prediction_bp.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    REQUESTS.inc('predict_batch')
+    try:
+        with STAGE_SECONDS.time('parse'):
+            data = request.get_json(silent=True)
+
+        # Accept either a bare list of records or {"records": [...]}
+        records = data.get('records') if isinstance(data, dict) else data
+
+        if not records:
+            return _error('predict_batch', 'No input records provided', 400)
+
+        if not isinstance(records, list):
+            return _error('predict_batch', 'Records must be a list', 400)
+
+        if len(records) > Config.MAX_BATCH_SIZE:
+            return _error('predict_batch', f'Batch too large: at most {Config.MAX_BATCH_SIZE} records per request', 413)
+
+        results = prediction_service.predict_batch(records)
+        error_count = sum(1 for result in results if 'error' in result)
+
+        if record_writer is not None:
+            for result in results:
+                if 'error' not in result:
+                    record_writer.submit(build_record(records[result['index']], result))
+
+        with STAGE_SECONDS.time('serialization'):
+            response = jsonify({
+                'results': results,
+                'count': len(results),
+                'error_count': error_count
+            })
+        return response, 200
+
+    except Exception as e:
+        print(f"Error in batch prediction route: {e}")
+        import traceback
+        traceback.print_exc()
+        ERRORS.inc(('predict_batch', '500'))
+        return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
+
+
+@prediction_bp.route('/predict/whatif', methods=['POST'])
+def predict_whatif():
+    """
+    Sensitivity curves for one patient:
+    {"record": {...}, "grids": {"cholesterol_level": {"low": 150, "high": 350, "steps": 21},
+                                "sleep_hours": [5, 6, 7, 8]}}
+    grids may also be a list of feature names, which get default ranges.
+    Every perturbed row is scored in one model pass; results are not stored.
+    """
+    REQUESTS.inc('predict_whatif')
+    try:
+        with STAGE_SECONDS.time('parse'):
+            data = request.get_json(silent=True)
+
+        if not isinstance(data, dict) or not isinstance(data.get('record'), dict):
+            return _error('predict_whatif', 'A record is required', 400)
+
+        try:
+            curves = sensitivity_curves(prediction_service, data['record'], data.get('grids'),
+                                        Config.MAX_WHATIF_ROWS)
+        except ValueError as e:
+            return _error('predict_whatif', str(e), 400)
+
+        with STAGE_SECONDS.time('serialization'):
+            response = jsonify(curves)
+        return response, 200
+
+    except Exception as e:
+        print(f"Error in what-if route: {e}")
+        import traceback
+        traceback.print_exc()
+        ERRORS.inc(('predict_whatif', '500'))
+        return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
+
+
+@prediction_bp.route('/explain', methods=['POST'])
+def explain():
+    """
+    Why a record scored the way it did: the prediction plus each feature's
+    contribution to the risk probability (bias + contributions = probability).
+    Accepts one record, a list of records or {"records": [...]}; lists get
+    the same response shape as /predict/batch. ?top=N keeps only the N
+    largest contributions per record.
+    """
+    REQUESTS.inc('explain')
+    try:
+        with STAGE_SECONDS.time('parse'):
+            data = request.get_json(silent=True)
+
+        try:
+            top = int(request.args['top']) if request.args.get('top') else None
+        except ValueError:
+            return _error('explain', 'top must be an integer', 400)
+
+        single = isinstance(data, dict) and 'records' not in data
+        records = [data] if single else (data.get('records') if isinstance(data, dict) else data)
+
+        if not records:
+            return _error('explain', 'No input data provided', 400)
+
+        if not isinstance(records, list):
+            return _error('explain', 'Records must be a list', 400)
+
+        if len(records) > Config.MAX_EXPLAIN_BATCH_SIZE:
+            return _error('explain', f'Batch too large: at most {Config.MAX_EXPLAIN_BATCH_SIZE} records per request', 413)
+
+        try:
+            results = prediction_service.explain_batch(records)
+        except ValueError as e:
+            # The serving model is not a tree ensemble
+            return _error('explain', f'Explanations are not available for this model: {e}', 501)
+
+        if top is not None:
+            for result in results:
+                if 'contributions' in result:
+                    result['contributions'] = result['contributions'][:max(top, 0)]
+
+        if single:
+            result = results[0]
+            if 'error' in result:
+                return _error('explain', result['error'], 400)
+            result.pop('index')
+            with STAGE_SECONDS.time('serialization'):
+                response = jsonify(result)
+            return response, 200
+
+        with STAGE_SECONDS.time('serialization'):
+            response = jsonify({
+                'results': results,
+                'count': len(results),
+                'error_count': sum(1 for result in results if 'error' in result)
+            })
+        return response, 200
+
+    except Exception as e:
+        print(f"Error in explanation route: {e}")
+        import traceback
+        traceback.print_exc()
+        ERRORS.inc(('explain', '500'))
+        return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
+
+
+STREAM_FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+
+def _stream_format(value, content_type):
+    if value:
+        return value.lower()
+    if content_type and 'csv' in content_type:
+        return 'csv'
+    return 'ndjson'
+
+
+@prediction_bp.route('/predict/stream', methods=['POST'])
+def predict_stream():
+    """
+    Score a CSV (with header) or NDJSON body of any size.
+
+    The body is read and scored STREAM_CHUNK_ROWS rows at a time and each
+    chunk's results are written out as soon as they are ready, so neither
+    side needs the whole file in memory.
+
+    Query parameters:
+      input:    csv | ndjson (default: from Content-Type, else ndjson)
+      format:   csv | ndjson output (default: same as input)
+      progress: 1 to add a throughput line after each NDJSON chunk
+    """
+    REQUESTS.inc('predict_stream')
+    input_format = _stream_format(request.args.get('input'), request.mimetype)
+    output_format = (request.args.get('format') or input_format).lower()
+    if input_format not in STREAM_FORMATS or output_format not in STREAM_FORMATS:
+        return _error('predict_stream', f'Unsupported format: use one of {sorted(STREAM_FORMATS)}', 400)
+
+    scorer = StreamScorer(
+        prediction_service,
+        input_format,
+        output_format,
+        Config.STREAM_CHUNK_ROWS,
+        progress=request.args.get('progress') == '1'
+    )
+    response = Response(
+        stream_with_context(scorer.generate(request.stream)),
+        mimetype=STREAM_FORMATS[output_format]
+    )
+    # Ask reverse proxies not to buffer the streamed body
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,156 @@
+import base64
+import json
+from datetime import datetime, timezone
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from flask import Blueprint, g, request, jsonify
+from config import Config
+from models.record_model import RecordModel
+from routes.user_routes import admin_authorized, install_admission
+from services.metrics import ERRORS, REQUESTS
+
+record_bp = Blueprint('records', __name__)
+install_admission(record_bp)
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+# Fields a client may request with ?fields=; input.<feature> selects single inputs
+FIELDS = ('user_id', 'timestamp', 'input', 'prediction', 'probability', 'risk_level', 'model_version')
+
+RISK_LEVELS = ('High', 'Low')
+
+
+def _error(message, status):
+    ERRORS.inc(('records', str(status)))
+    return jsonify({'error': message}), status
+
+
+def _parse_time(value):
+    """ISO 8601 timestamp as a naive UTC datetime (how MongoDB returns them)"""
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def encode_cursor(record):
+    """Opaque cursor pointing just after record in (timestamp, _id) order"""
+    timestamp = record['timestamp']
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    raw = json.dumps({'t': timestamp.isoformat(), 'id': str(record['_id'])})
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(timestamp, _id) from a cursor made by encode_cursor; ValueError if it is malformed"""
+    padded = cursor + '=' * (-len(cursor) % 4)
+    data = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    if not isinstance(data, dict) or not isinstance(data.get('t'), str) or not isinstance(data.get('id'), str):
+        raise ValueError('Malformed cursor')
+    return _parse_time(data['t']), ObjectId(data['id'])
+
+
+def _projection(fields):
+    if not fields:
+        return None
+    projection = {}
+    for field in fields.split(','):
+        field = field.strip()
+        if not field:
+            continue
+        if field not in FIELDS and not field.startswith('input.'):
+            raise ValueError(f'Unknown field: {field}')
+        # MongoDB rejects a projection naming a field and one of its subfields
+        for other in projection:
+            if field == other or field.startswith(other + '.') or other.startswith(field + '.'):
+                raise ValueError(f'Overlapping fields: {other} and {field}')
+        projection[field] = 1
+    # Needed to build the next cursor
+    projection['timestamp'] = 1
+    projection['_id'] = 1
+    return projection
+
+
+def _filters(args):
+    filters = {}
+    if args.get('user_id'):
+        filters['user_id'] = args['user_id']
+    if args.get('risk_level'):
+        if args['risk_level'] not in RISK_LEVELS:
+            raise ValueError(f'risk_level must be one of {list(RISK_LEVELS)}')
+        filters['risk_level'] = args['risk_level']
+    if args.get('model_version'):
+        filters['model_version'] = args['model_version']
+
+    time_range = {}
+    if args.get('from'):
+        time_range['$gte'] = _parse_time(args['from'])
+    if args.get('to'):
+        time_range['$lt'] = _parse_time(args['to'])
+    if time_range:
+        filters['timestamp'] = time_range
+    return filters
+
+
+def _serialize(record):
+    record['id'] = str(record.pop('_id'))
+    if isinstance(record.get('timestamp'), datetime):
+        record['timestamp'] = record['timestamp'].isoformat()
+    return record
+
+
+@record_bp.route('/records', methods=['GET'])
+def list_records():
+    """
+    Stored prediction records, newest first, one page at a time.
+
+    Query parameters:
+      user_id, risk_level (High|Low), model_version: exact-match filters
+      from, to: ISO 8601 timestamp range [from, to)
+      fields: comma-separated fields to return (e.g. prediction,probability,input.age)
+      limit: page size (default 50, at most 500)
+      cursor: next_cursor from the previous page
+
+    Records hold patient data, so an API key or the admin token is required
+    even when API_KEYS_REQUIRED is off.
+    """
+    REQUESTS.inc('records')
+    if g.get('client') is None and not admin_authorized():
+        return _error('API key or admin token required', 401)
+    if not Config.RECORD_PREDICTIONS:
+        return _error('Prediction records are not stored (set RECORD_PREDICTIONS=1)', 404)
+
+    try:
+        filters = _filters(request.args)
+        projection = _projection(request.args.get('fields'))
+        limit = min(max(int(request.args.get('limit', DEFAULT_LIMIT)), 1), MAX_LIMIT)
+    except ValueError as e:
+        return _error(str(e), 400)
+
+    after = None
+    if request.args.get('cursor'):
+        try:
+            after = decode_cursor(request.args['cursor'])
+        except (ValueError, KeyError, TypeError, InvalidId):
+            return _error('Invalid cursor', 400)
+
+    try:
+        # One extra record tells whether there is a next page
+        records = RecordModel(uri=Config.MONGO_URI).page(filters, limit + 1, after=after, projection=projection)
+    except Exception as e:
+        print(f"Error listing records: {e}")
+        return _error('Record store unavailable', 503)
+
+    next_cursor = None
+    if len(records) > limit:
+        records = records[:limit]
+        next_cursor = encode_cursor(records[-1])
+
+    return jsonify({
+        'records': [_serialize(record) for record in records],
+        'count': len(records),
+        'next_cursor': next_cursor
+    }), 200
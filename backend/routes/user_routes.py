@@ -0,0 +1,194 @@
+import hmac
+
+from flask import Blueprint, g, request, jsonify
+from pymongo.errors import PyMongoError
+from config import Config
+from models.user_model import UserModel
+from services.admission import REJECTIONS, ApiKeyCache, InFlightLimiter, RateLimiter
+from services.metrics import ERRORS
+
+user_bp = Blueprint('users', __name__)
+
+api_keys = ApiKeyCache(
+    lambda key: UserModel(uri=Config.MONGO_URI).find_by_key(key),
+    ttl=Config.API_KEY_CACHE_TTL
+)
+rate_limiter = RateLimiter()
+in_flight = InFlightLimiter(Config.MAX_IN_FLIGHT)
+
+
+def admin_authorized():
+    """True if the request carries the admin token; always False when ADMIN_TOKEN is not configured"""
+    if not Config.ADMIN_TOKEN:
+        return False
+    return hmac.compare_digest(request.headers.get('X-Admin-Token', ''), Config.ADMIN_TOKEN)
+
+
+def admin_rejection():
+    """The error response for a request to an admin endpoint, or None if it is authorized"""
+    if not Config.ADMIN_TOKEN:
+        return jsonify({'error': 'Admin endpoints are disabled; set ADMIN_TOKEN to enable them'}), 403
+    if not admin_authorized():
+        return jsonify({'error': 'Unauthorized'}), 401
+    return None
+
+
+def _key_store_unavailable(e):
+    print(f"API key store unavailable: {e}")
+    response = jsonify({'error': 'API key store unavailable'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+
+def _api_key():
+    key = request.headers.get('X-API-Key')
+    if key:
+        return key
+    auth = request.headers.get('Authorization', '')
+    if auth.startswith('Bearer '):
+        return auth[len('Bearer '):].strip()
+    return None
+
+
+def _reject(endpoint, reason, message, status, retry_after=None):
+    REJECTIONS.inc((endpoint, reason))
+    ERRORS.inc((endpoint, str(status)))
+    response = jsonify({'error': message})
+    if retry_after is not None:
+        response.headers['Retry-After'] = str(max(1, int(retry_after + 0.999)))
+    return response, status
+
+
+def _admit():
+    endpoint = (request.endpoint or '').rsplit('.', 1)[-1]
+
+    # Identify the client
+    key = _api_key()
+    if key:
+        try:
+            client = api_keys.get(key)
+        except Exception as e:
+            print(f"API key lookup failed: {e}")
+            return _reject(endpoint, 'key_store_unavailable', 'API key store unavailable', 503, retry_after=1)
+        if client is None:
+            return _reject(endpoint, 'invalid_key', 'Invalid API key', 401)
+        client_id = 'key:' + client['name']
+        rate = client.get('rate_limit') or Config.DEFAULT_RATE_LIMIT
+        burst = client.get('burst') or max(Config.DEFAULT_RATE_BURST, rate)
+    elif Config.API_KEYS_REQUIRED:
+        return _reject(endpoint, 'missing_key', 'API key required (X-API-Key header)', 401)
+    else:
+        client = None
+        client_id = 'ip:' + (request.remote_addr or 'unknown')
+        rate = Config.DEFAULT_RATE_LIMIT
+        burst = Config.DEFAULT_RATE_BURST
+
+    # Per-client token bucket
+    wait = rate_limiter.check(client_id, rate, burst)
+    if wait:
+        return _reject(endpoint, 'rate_limited', 'Rate limit exceeded', 429, retry_after=wait)
+
+    # Global cap on concurrent requests in this process
+    if not in_flight.acquire():
+        return _reject(endpoint, 'overloaded', 'Server is busy, retry shortly', 503, retry_after=1)
+    g.admitted = True
+    g.client = client
+
+
+def _release(exc=None):
+    if g.pop('admitted', False):
+        in_flight.release()
+
+
+def install_admission(blueprint):
+    """Identify, rate-limit and cap concurrent requests for every route of blueprint"""
+    blueprint.before_request(_admit)
+    blueprint.teardown_request(_release)
+
+
+def _limits(data):
+    """rate_limit and burst from a request body (None: server default)"""
+    limits = []
+    for field in ('rate_limit', 'burst'):
+        value = data.get(field)
+        if value is not None and (type(value) not in (int, float) or value <= 0):
+            raise ValueError(f'{field} must be a positive number')
+        limits.append(value)
+    return limits
+
+
+@user_bp.route('/keys', methods=['POST'])
+def create_key():
+    """Register an API client: {"name": ..., "rate_limit": req/s, "burst": n}; returns its key once"""
+    rejection = admin_rejection()
+    if rejection:
+        return rejection
+
+    data = request.get_json(silent=True) or {}
+    name = data.get('name')
+    if not name or not isinstance(name, str):
+        return jsonify({'error': 'name is required'}), 400
+    try:
+        rate_limit, burst = _limits(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        users = UserModel(uri=Config.MONGO_URI)
+        if users.get(name) is not None:
+            return jsonify({'error': f'Client already exists: {name}'}), 409
+        key = users.create(name, rate_limit, burst)
+    except PyMongoError as e:
+        return _key_store_unavailable(e)
+    return jsonify({'name': name, 'api_key': key, 'rate_limit': rate_limit, 'burst': burst}), 201
+
+
+@user_bp.route('/keys', methods=['GET'])
+def list_keys():
+    rejection = admin_rejection()
+    if rejection:
+        return rejection
+    try:
+        clients = UserModel(uri=Config.MONGO_URI).list()
+    except PyMongoError as e:
+        return _key_store_unavailable(e)
+    for client in clients:
+        if client.get('created_at') is not None:
+            client['created_at'] = client['created_at'].isoformat()
+    return jsonify({'clients': clients}), 200
+
+
+@user_bp.route('/keys/<name>', methods=['PATCH'])
+def update_key(name):
+    """Change a client's limits: {"rate_limit": req/s, "burst": n}"""
+    rejection = admin_rejection()
+    if rejection:
+        return rejection
+    try:
+        rate_limit, burst = _limits(request.get_json(silent=True) or {})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        updated = UserModel(uri=Config.MONGO_URI).update_limits(name, rate_limit, burst)
+    except PyMongoError as e:
+        return _key_store_unavailable(e)
+    if not updated:
+        return jsonify({'error': f'Unknown client: {name}'}), 404
+    api_keys.invalidate()
+    return jsonify({'name': name, 'rate_limit': rate_limit, 'burst': burst}), 200
+
+
+@user_bp.route('/keys/<name>', methods=['DELETE'])
+def revoke_key(name):
+    rejection = admin_rejection()
+    if rejection:
+        return rejection
+    try:
+        revoked = UserModel(uri=Config.MONGO_URI).deactivate(name)
+    except PyMongoError as e:
+        return _key_store_unavailable(e)
+    if not revoked:
+        return jsonify({'error': f'Unknown client: {name}'}), 404
+    # Keys are cached by value, not by name; other workers catch up within API_KEY_CACHE_TTL
+    api_keys.invalidate()
+    return jsonify({'name': name, 'active': False}), 200
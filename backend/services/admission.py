@@ -0,0 +1,138 @@
+import collections
+import threading
+import time
+
+from services.metrics import registry
+
+REJECTIONS = registry.counter(
+    'cardiocare_rejections_total', 'Requests turned away by admission control', ('endpoint', 'reason'))
+IN_FLIGHT = registry.gauge(
+    'cardiocare_in_flight_requests', 'Admission-controlled requests being served by this process')
+
+
+class TokenBucket:
+    """rate tokens per second, holding at most burst; each request takes one"""
+
+    __slots__ = ('rate', 'burst', 'tokens', 'updated')
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, now):
+        """0 if a token was taken, else the seconds until one is available"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """
+    Token buckets per client, kept in this process.
+
+    With several gunicorn workers each has its own buckets, so a client's
+    effective limit is its rate times the number of workers.
+    """
+
+    def __init__(self, max_clients=100000):
+        self.max_clients = max_clients
+        self._buckets = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def check(self, client_id, rate, burst):
+        """0 if the request may proceed, else the seconds the client should wait"""
+        if not rate:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(client_id)
+            if bucket is None or bucket.rate != rate or bucket.burst != burst:
+                bucket = TokenBucket(rate, burst)
+                self._buckets[client_id] = bucket
+                if len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(client_id)
+            return bucket.take(now)
+
+
+class InFlightLimiter:
+    """
+    Caps the requests served at once. A request over the cap is rejected
+    straight away rather than queued, so overload shows up as fast 503s
+    instead of rising latency for everyone.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.current = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self.limit and self.current >= self.limit:
+                return False
+            self.current += 1
+            IN_FLIGHT.set(self.current)
+            return True
+
+    def release(self):
+        with self._lock:
+            self.current -= 1
+            IN_FLIGHT.set(self.current)
+
+
+class ApiKeyCache:
+    """
+    TTL cache in front of the API key lookup, so identifying a client costs a
+    dict lookup instead of a database round-trip per request. Unknown keys
+    are cached too (for a shorter time) so a client retrying with a bad key
+    cannot hammer the database.
+    """
+
+    _MISSING = object()
+
+    def __init__(self, lookup, ttl=60.0, negative_ttl=10.0, max_size=10000):
+        self.lookup = lookup
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """The client document for key, or None if the key is unknown or inactive"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                return entry[1]
+
+        try:
+            client = self.lookup(key)
+        except Exception:
+            # Store unavailable: keep serving a recently known key rather than failing it
+            if entry is not None and entry[1] is not None:
+                return entry[1]
+            raise
+
+        expires = now + (self.ttl if client is not None else self.negative_ttl)
+        with self._lock:
+            self._entries[key] = (expires, client)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return client
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
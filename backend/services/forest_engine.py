@@ -0,0 +1,458 @@
+import hashlib
+import json
+import os
+import struct
+
+import numpy as np
+
+# Largest absolute difference from sklearn's predict_proba we accept before
+# refusing to serve from the native engine. In practice the outputs are
+# identical: the traversal and the averaging below follow sklearn's own
+# arithmetic step for step.
+PROBA_TOLERANCE = 1e-12
+
+
+class FlatForest:
+    """
+    A fitted RandomForestClassifier flattened into contiguous NumPy arrays.
+
+    The nodes of every tree are concatenated into shared feature, threshold,
+    child and value arrays, with child indices rewritten to point into the
+    shared arrays. A batch then walks all trees at once with plain array
+    indexing, skipping sklearn's per-call input validation and joblib dispatch.
+
+    Probabilities match RandomForestClassifier.predict_proba exactly:
+    - rows are cast to float32 before comparing against the float64
+      thresholds, as sklearn's tree code does
+    - node values are normalized the same way as
+      DecisionTreeClassifier.predict_proba normalizes leaf values
+    - per-tree outputs are summed in estimator order, then divided by the
+      number of trees
+
+    The win is per call: a single row costs tens of microseconds instead of
+    milliseconds. For very large batches sklearn's compiled traversal is
+    about as fast, so the engine mostly pays off on the request path.
+    """
+
+    ARRAYS = ('feature', 'threshold', 'left', 'right', 'value', 'roots', 'classes', 'is_leaf')
+
+    def __init__(self, feature, threshold, left, right, value, roots, classes, is_leaf=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.classes = classes
+        self.is_leaf = left == np.arange(len(left)) if is_leaf is None else is_leaf
+        self.n_trees = len(roots)
+        self.n_classes = value.shape[1]
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """Flatten a fitted RandomForestClassifier (or any forest of DecisionTreeClassifiers)"""
+        estimators = getattr(model, 'estimators_', None)
+        if not estimators or not hasattr(estimators[0], 'tree_'):
+            raise ValueError(f"Cannot flatten {type(model).__name__}: expected a fitted tree ensemble")
+        if getattr(model, 'n_outputs_', 1) != 1:
+            raise ValueError("Only single-output forests are supported")
+
+        n_classes = int(model.n_classes_)
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+
+        for estimator in estimators:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            local = np.arange(n_nodes)
+            leaf = tree.children_left == -1
+
+            # Leaves point at themselves so traversal can keep indexing them
+            # without branching; their feature/threshold are never consulted
+            left = np.where(leaf, local, tree.children_left) + offset
+            right = np.where(leaf, local, tree.children_right) + offset
+
+            # Same normalization as DecisionTreeClassifier.predict_proba
+            value = np.array(tree.value[:, 0, :n_classes], dtype=np.float64)
+            normalizer = value.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            value /= normalizer
+
+            features.append(np.where(leaf, 0, tree.feature))
+            thresholds.append(np.where(leaf, 0.0, tree.threshold))
+            lefts.append(left)
+            rights.append(right)
+            values.append(value)
+            roots.append(offset)
+            offset += n_nodes
+
+        return cls(
+            feature=np.ascontiguousarray(np.concatenate(features), dtype=np.intp),
+            threshold=np.ascontiguousarray(np.concatenate(thresholds), dtype=np.float64),
+            left=np.ascontiguousarray(np.concatenate(lefts), dtype=np.intp),
+            right=np.ascontiguousarray(np.concatenate(rights), dtype=np.intp),
+            value=np.ascontiguousarray(np.concatenate(values), dtype=np.float64),
+            roots=np.asarray(roots, dtype=np.intp),
+            classes=np.asarray(model.classes_),
+        )
+
+    def save(self, directory):
+        """Write every array as a raw .npy file so workers can memory-map them"""
+        os.makedirs(directory, exist_ok=True)
+        for name in self.ARRAYS:
+            np.save(os.path.join(directory, f'{name}.npy'), getattr(self, name), allow_pickle=False)
+
+    @classmethod
+    def load(cls, directory, mmap_mode=None):
+        """
+        Load arrays written by save(). With mmap_mode='r' the node arrays stay
+        in the OS page cache and are shared by every process mapping them.
+        """
+        arrays = {
+            name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mmap_mode, allow_pickle=False)
+            for name in cls.ARRAYS
+        }
+        return cls(**arrays)
+
+    def apply(self, X):
+        """Return the leaf index reached in every tree, shape (n_rows, n_trees)"""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        n_rows, n_features = X.shape
+        X_flat = X.ravel()
+
+        node = np.tile(self.roots, n_rows)
+        # Offset of each (row, tree) pair's row in the flattened input
+        row_offset = np.repeat(np.arange(n_rows) * n_features, self.n_trees)
+
+        # Only (row, tree) pairs that have not reached a leaf are advanced;
+        # the working set shrinks as paths end
+        active = np.flatnonzero(~self.is_leaf[node])
+        current = node[active]
+        offset = row_offset[active]
+        while active.size:
+            go_left = X_flat[offset + self.feature[current]] <= self.threshold[current]
+            current = np.where(go_left, self.left[current], self.right[current])
+            node[active] = current
+            keep = ~self.is_leaf[current]
+            active = active[keep]
+            current = current[keep]
+            offset = offset[keep]
+
+        return node.reshape(n_rows, self.n_trees)
+
+    def predict_proba(self, X):
+        leaves = self.apply(X)
+        # (n_trees, n_rows, n_classes) so the sum runs over trees in estimator order
+        per_tree = self.value[leaves.T]
+        proba = per_tree.sum(axis=0)
+        proba /= self.n_trees
+        return proba
+
+    def predict(self, X):
+        return self.classes.take(np.argmax(self.predict_proba(X), axis=1))
+
+
+class TreeExplainer:
+    """
+    Exact tree-path (Saabas) attributions for a FlatForest.
+
+    Walking a row down a tree, every split moves the predicted value from the
+    parent node's to the child's; that change is credited to the feature the
+    parent split on. Summed over the path and averaged over trees this gives
+    probability = bias + sum(contributions), where bias is the forest's mean
+    root value (the training prior).
+
+    Per node it precomputes the parent, the parent's split feature and the
+    change in positive-class value, so explaining a batch is one apply() and
+    a walk back up from the leaves, vectorized over all rows and trees.
+    """
+
+    def __init__(self, forest, n_features, positive=1):
+        self.forest = forest
+        self.n_features = n_features
+        value = forest.value[:, positive]
+
+        internal = np.flatnonzero(~forest.is_leaf)
+        parent = np.full(len(value), -1, dtype=np.intp)
+        parent[forest.left[internal]] = internal
+        parent[forest.right[internal]] = internal
+        has_parent = parent >= 0
+        safe_parent = np.where(has_parent, parent, 0)
+
+        self.parent = parent
+        self.split_feature = np.where(has_parent, forest.feature[safe_parent], 0)
+        self.delta = np.where(has_parent, value - value[safe_parent], 0.0)
+        self.bias = float(value[forest.roots].sum() / forest.n_trees)
+
+    def explain(self, X):
+        """
+        Return (proba, contributions) for scaled rows X: proba as
+        FlatForest.predict_proba, contributions of shape (n_rows, n_features)
+        to the positive-class probability
+        """
+        forest = self.forest
+        leaves = forest.apply(X)
+        n_rows = leaves.shape[0]
+        proba = forest.value[leaves.T].sum(axis=0)
+        proba /= forest.n_trees
+
+        # Walk every (row, tree) path from its leaf back to the root, adding
+        # each step's value change to (row, split feature); one bincount per
+        # depth level keeps memory at O(rows x trees)
+        size = n_rows * self.n_features
+        contributions = np.zeros(size, dtype=np.float64)
+        node = leaves.ravel()
+        cell_base = np.repeat(np.arange(n_rows) * self.n_features, forest.n_trees)
+        active = np.flatnonzero(self.parent[node] >= 0)
+        while active.size:
+            current = node[active]
+            contributions += np.bincount(cell_base[active] + self.split_feature[current],
+                                         weights=self.delta[current], minlength=size)
+            parents = self.parent[current]
+            node[active] = parents
+            active = active[self.parent[parents] >= 0]
+
+        contributions /= forest.n_trees
+        return proba, contributions.reshape(n_rows, self.n_features)
+
+
+class FlatScaler:
+    """StandardScaler.transform as two array operations, without sklearn's input checks"""
+
+    def __init__(self, mean, scale):
+        self.mean = mean
+        self.scale = scale
+
+    @classmethod
+    def from_sklearn(cls, scaler):
+        if not hasattr(scaler, 'scale_') or not hasattr(scaler, 'mean_'):
+            raise ValueError(f"Cannot flatten {type(scaler).__name__}: expected a fitted StandardScaler")
+        mean = None if scaler.mean_ is None else np.asarray(scaler.mean_, dtype=np.float64)
+        scale = None if scaler.scale_ is None else np.asarray(scaler.scale_, dtype=np.float64)
+        return cls(mean, scale)
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, 'scaler.json'), 'w', encoding='utf-8') as f:
+            json.dump({
+                'mean': None if self.mean is None else self.mean.tolist(),
+                'scale': None if self.scale is None else self.scale.tolist(),
+            }, f)
+
+    @classmethod
+    def load(cls, directory):
+        with open(os.path.join(directory, 'scaler.json'), 'r', encoding='utf-8') as f:
+            params = json.load(f)
+        mean = None if params['mean'] is None else np.asarray(params['mean'], dtype=np.float64)
+        scale = None if params['scale'] is None else np.asarray(params['scale'], dtype=np.float64)
+        return cls(mean, scale)
+
+    def transform(self, X):
+        X = np.array(X, dtype=np.float64)
+        if self.mean is not None:
+            X -= self.mean
+        if self.scale is not None:
+            X /= self.scale
+        return X
+
+
+# Compact forest files: a fixed prelude (magic, format version, header
+# length, SHA-256 of everything after the prelude), a JSON header describing
+# the forest and its arrays, then the arrays, each 8-byte aligned
+COMPACT_MAGIC = b'CCFOREST'
+COMPACT_FORMAT_VERSION = 1
+_PRELUDE = struct.Struct('<8sII32s')
+_ALIGNMENT = 8
+
+
+def quantize_thresholds(threshold):
+    """
+    float64 split thresholds as the largest float32 not above them.
+
+    sklearn compares float32 feature values against float64 thresholds; for a
+    float32 x, x <= t holds exactly when x <= (t rounded toward -inf to
+    float32), so the quantized forest takes the same path for every input.
+    """
+    threshold = np.asarray(threshold, dtype=np.float64)
+    quantized = threshold.astype(np.float32)
+    above = quantized.astype(np.float64) > threshold
+    quantized[above] = np.nextafter(quantized[above], np.float32(-np.inf))
+    return quantized
+
+
+def _smallest_int(limit):
+    return np.int16 if limit <= np.iinfo(np.int16).max else np.int32
+
+
+def save_compact(path, model, scaler=None, features=None, metadata=None):
+    """
+    Write a fitted forest (and optionally its StandardScaler) as a compact
+    forest file; returns the header.
+
+    Per node only what serving reads is kept: the split feature (int16), the
+    quantized float32 threshold and the child indices, local to their tree
+    (int16, or int32 for trees over 32767 nodes). Leaves keep their class
+    probabilities as float64, so predictions are unchanged, plus their
+    float32 training weight; internal node values are recomputed from those
+    on load (they are only needed for explanations).
+    """
+    estimators = getattr(model, 'estimators_', None)
+    if not estimators or not hasattr(estimators[0], 'tree_'):
+        raise ValueError(f"Cannot export {type(model).__name__}: expected a fitted tree ensemble")
+    forest = FlatForest.from_sklearn(model)
+    n_nodes = len(forest.feature)
+    n_features = int(model.n_features_in_)
+    roots = forest.roots
+    node_counts = np.diff(np.append(roots, n_nodes))
+    tree_of_node = np.repeat(np.arange(len(roots)), node_counts)
+    index_dtype = _smallest_int(int(node_counts.max()))
+
+    leaf = forest.is_leaf
+    left = np.where(leaf, -1, forest.left - roots[tree_of_node])
+    right = np.where(leaf, -1, forest.right - roots[tree_of_node])
+    weight = np.concatenate([estimator.tree_.weighted_n_node_samples for estimator in estimators])
+
+    arrays = {
+        'roots': roots.astype('<i4'),
+        'feature': np.where(leaf, -1, forest.feature).astype(np.dtype(_smallest_int(n_features)).newbyteorder('<')),
+        'threshold': np.where(leaf, np.float32(0), quantize_thresholds(forest.threshold)).astype('<f4'),
+        'left': left.astype(np.dtype(index_dtype).newbyteorder('<')),
+        'right': right.astype(np.dtype(index_dtype).newbyteorder('<')),
+        'leaf_value': forest.value[leaf].astype('<f8'),
+        'leaf_weight': weight[leaf].astype('<f4'),
+    }
+    if scaler is not None:
+        flat_scaler = FlatScaler.from_sklearn(scaler)
+        for name in ('mean', 'scale'):
+            if getattr(flat_scaler, name) is not None:
+                arrays[f'scaler_{name}'] = getattr(flat_scaler, name).astype('<f8')
+
+    layout, offset = {}, 0
+    for name, array in arrays.items():
+        layout[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        offset += -(-array.nbytes // _ALIGNMENT) * _ALIGNMENT
+    header = {
+        'format': COMPACT_FORMAT_VERSION,
+        'n_trees': forest.n_trees,
+        'n_nodes': n_nodes,
+        'n_leaves': int(leaf.sum()),
+        'n_features': n_features,
+        'classes': forest.classes.tolist(),
+        'features': list(features) if features is not None else None,
+        'scaler': scaler is not None,
+        'arrays': layout,
+        'metadata': metadata or {},
+    }
+    header_bytes = json.dumps(header).encode('utf-8')
+    header_bytes += b' ' * (-len(header_bytes) % _ALIGNMENT)
+
+    body = bytearray(header_bytes)
+    for name, array in arrays.items():
+        body += array.tobytes()
+        body += b'\0' * (-len(body) % _ALIGNMENT)
+    digest = hashlib.sha256(body).digest()
+
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(_PRELUDE.pack(COMPACT_MAGIC, COMPACT_FORMAT_VERSION, len(header_bytes), digest))
+        f.write(body)
+    os.replace(tmp, path)
+    return header
+
+
+def _internal_values(left, right, is_leaf, roots, value, weight):
+    """
+    Fill in the value of every internal node as the weight-averaged value of
+    its children, deepest level first (how the tree builder computed them)
+    """
+    n_nodes = len(is_leaf)
+    depth = np.zeros(n_nodes, dtype=np.intp)
+    frontier, level = roots, 0
+    while frontier.size:
+        depth[frontier] = level
+        internal = frontier[~is_leaf[frontier]]
+        frontier = np.concatenate([left[internal], right[internal]])
+        level += 1
+
+    weighted = value * weight[:, np.newaxis]
+    internal = np.flatnonzero(~is_leaf)
+    internal = internal[np.argsort(-depth[internal], kind='stable')]
+    boundaries = np.flatnonzero(np.diff(depth[internal])) + 1
+    for nodes in np.split(internal, boundaries):
+        weight[nodes] = weight[left[nodes]] + weight[right[nodes]]
+        weighted[nodes] = weighted[left[nodes]] + weighted[right[nodes]]
+    totals = weight[:, np.newaxis].copy()
+    totals[totals == 0.0] = 1.0
+    value[~is_leaf] = weighted[~is_leaf] / totals[~is_leaf]
+    return value
+
+
+def load_compact(path):
+    """
+    Read a compact forest file with NumPy alone. Returns (FlatForest,
+    FlatScaler or None, header); raises ValueError for a file that is not a
+    compact forest, has a newer format version or fails its checksum.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < _PRELUDE.size:
+        raise ValueError(f"{path}: truncated compact forest file")
+    magic, version, header_length, digest = _PRELUDE.unpack_from(data)
+    if magic != COMPACT_MAGIC:
+        raise ValueError(f"{path}: not a compact forest file")
+    if version > COMPACT_FORMAT_VERSION:
+        raise ValueError(f"{path}: format version {version} is newer than supported ({COMPACT_FORMAT_VERSION})")
+    body = memoryview(data)[_PRELUDE.size:]
+    if hashlib.sha256(body).digest() != digest:
+        raise ValueError(f"{path}: checksum mismatch, the file is corrupt")
+
+    header = json.loads(bytes(body[:header_length]).decode('utf-8'))
+    payload = _PRELUDE.size + header_length
+    arrays = {}
+    for name, spec in header['arrays'].items():
+        dtype = np.dtype(spec['dtype'])
+        count = int(np.prod(spec['shape']))
+        arrays[name] = np.frombuffer(data, dtype=dtype, count=count,
+                                     offset=payload + spec['offset']).reshape(spec['shape'])
+
+    roots = arrays['roots'].astype(np.intp)
+    n_nodes = header['n_nodes']
+    node_counts = np.diff(np.append(roots, n_nodes))
+    base = np.repeat(roots, node_counts)
+    own = np.arange(n_nodes, dtype=np.intp)
+    is_leaf = arrays['left'] < 0
+    # Leaves point at themselves, as in FlatForest.from_sklearn
+    left = np.where(is_leaf, own, arrays['left'].astype(np.intp) + base)
+    right = np.where(is_leaf, own, arrays['right'].astype(np.intp) + base)
+
+    leaf_value = arrays['leaf_value']
+    value = np.zeros((n_nodes, leaf_value.shape[1]), dtype=np.float64)
+    value[is_leaf] = leaf_value
+    weight = np.zeros(n_nodes, dtype=np.float64)
+    weight[is_leaf] = arrays['leaf_weight']
+    value = _internal_values(left, right, is_leaf, roots, value, weight)
+
+    forest = FlatForest(
+        feature=np.where(is_leaf, 0, arrays['feature']).astype(np.intp),
+        threshold=np.ascontiguousarray(arrays['threshold'], dtype=np.float32),
+        left=left,
+        right=right,
+        value=value,
+        roots=roots,
+        classes=np.asarray(header['classes']),
+        is_leaf=is_leaf,
+    )
+    scaler = None
+    if header['scaler']:
+        scaler = FlatScaler(
+            np.array(arrays['scaler_mean']) if 'scaler_mean' in arrays else None,
+            np.array(arrays['scaler_scale']) if 'scaler_scale' in arrays else None,
+        )
+    return forest, scaler, header
+
+
+def max_proba_difference(engine, model, X):
+    """Largest absolute gap between the engine's and the model's probabilities on X"""
+    return float(np.max(np.abs(engine.predict_proba(X) - model.predict_proba(X))))
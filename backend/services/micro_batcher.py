@@ -0,0 +1,111 @@
+import collections
+import threading
+import time
+
+from services.metrics import registry
+
+BATCH_SIZE = registry.histogram(
+    'cardiocare_microbatch_size', 'Records per micro-batch flushed to the model',
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256))
+BATCH_WINDOW = registry.gauge(
+    'cardiocare_microbatch_window_seconds', 'Current micro-batch collection window')
+
+
+class _Pending:
+    __slots__ = ('record', 'result', 'error', 'done')
+
+    def __init__(self, record):
+        self.record = record
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class MicroBatcher:
+    """
+    Collects concurrent single-record predictions and scores them together.
+
+    Request threads call submit() and block; one dispatcher thread flushes the
+    queue to PredictionService.predict_batch as soon as max_batch_size records
+    are waiting or the oldest one has waited for the current window.
+
+    The window adapts to load. A flush of a single record means nobody else
+    was arriving, so waiting only added latency and the window halves (down
+    to zero). A flush of several records means requests overlap, so the
+    window widens (up to max_wait) to collect bigger batches. Even at a zero
+    window, records that queue up while a batch is being scored are flushed
+    together.
+
+    Only useful with threaded workers (e.g. gunicorn --threads), where one
+    process serves several requests at once.
+    """
+
+    def __init__(self, service, max_batch_size=32, max_wait=0.005, result_timeout=30.0):
+        self.service = service
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.result_timeout = result_timeout
+        self.window = max_wait
+        self._queue = collections.deque()
+        self._condition = threading.Condition()
+        self._thread = None
+        BATCH_WINDOW.set(self.window)
+
+    def _ensure_dispatcher(self):
+        # Started lazily so a batcher created before a fork gets a thread in each worker
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+            self._thread.start()
+
+    def submit(self, record):
+        """Queue one validated record and wait for its prediction result"""
+        pending = _Pending(record)
+        with self._condition:
+            self._ensure_dispatcher()
+            self._queue.append((time.monotonic(), pending))
+            self._condition.notify()
+
+        if not pending.done.wait(self.result_timeout):
+            raise TimeoutError('Timed out waiting for a micro-batch result')
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _next_batch(self):
+        with self._condition:
+            while not self._queue:
+                self._condition.wait()
+
+            deadline = self._queue[0][0] + self.window
+            while len(self._queue) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+
+            size = min(len(self._queue), self.max_batch_size)
+            return [self._queue.popleft()[1] for _ in range(size)]
+
+    def _adapt(self, size):
+        if size <= 1:
+            self.window = self.window / 2 if self.window > self.max_wait / 64 else 0.0
+        elif size < self.max_batch_size:
+            self.window = min(self.max_wait, self.window * 2 if self.window else self.max_wait / 8)
+        BATCH_WINDOW.set(self.window)
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            BATCH_SIZE.observe(len(batch))
+            try:
+                results = self.service.predict_batch([pending.record for pending in batch])
+                for pending, result in zip(batch, results):
+                    result.pop('index', None)
+                    pending.result = result
+            except Exception as e:
+                for pending in batch:
+                    pending.error = e
+            finally:
+                for pending in batch:
+                    pending.done.set()
+            self._adapt(len(batch))
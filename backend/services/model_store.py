@@ -0,0 +1,286 @@
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+
+import joblib
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import Config
+from services.forest_engine import FlatForest, FlatScaler, PROBA_TOLERANCE, load_compact, max_proba_difference
+from utils.preprocess import SCHEMA, SCHEMA_FILENAME, FeatureSchema
+
+MODEL_FILENAME = 'ml_model.pkl'
+SCALER_FILENAME = 'scaler.pkl'
+COMPACT_FILENAME = 'forest.ccf'
+CURRENT_FILENAME = 'CURRENT'
+
+
+class ModelBundle:
+    """
+    One model/scaler pair plus everything derived from it.
+
+    Bundles are never modified after loading. The service swaps whole bundles,
+    and a request holds on to the bundle it started with, so a reload never
+    changes the model underneath an in-flight request.
+    """
+
+    def __init__(self, version, model, scaler, backend, engine=None, engine_scaler=None):
+        self.version = version
+        # model and scaler are None when a memory-mapped engine is served
+        # without unpickling the sklearn objects
+        self.model = model
+        self.scaler = scaler
+        self.backend = backend
+        self.engine = engine
+        self.engine_scaler = engine_scaler
+        self.classes = np.asarray(engine.classes if engine is not None else model.classes_)
+        self.loaded_at = time.time()
+
+
+def versions_dir():
+    return os.path.join(Config.MODEL_DIR, 'versions')
+
+
+def list_versions():
+    """
+    Versions available on disk, oldest first (names sort chronologically).
+    Dot-prefixed directories are versions still being written and are skipped.
+    """
+    root = versions_dir()
+    if not os.path.isdir(root):
+        return []
+    return sorted(
+        name for name in os.listdir(root)
+        if not name.startswith('.')
+        and os.path.isfile(os.path.join(root, name, MODEL_FILENAME))
+        and os.path.isfile(os.path.join(root, name, SCALER_FILENAME))
+    )
+
+
+def active_version():
+    """
+    The version that should be serving: the one named in versions/CURRENT,
+    else the newest version directory, else None (legacy flat artifacts)
+    """
+    try:
+        with open(os.path.join(versions_dir(), CURRENT_FILENAME), 'r', encoding='utf-8') as f:
+            version = f.read().strip()
+        if version:
+            return version
+    except OSError:
+        pass
+    versions = list_versions()
+    return versions[-1] if versions else None
+
+
+def activate_version(version):
+    """Point versions/CURRENT at version; the rename makes the switch atomic for watchers"""
+    if version not in list_versions():
+        raise ValueError(f"Unknown model version: {version}")
+    current = os.path.join(versions_dir(), CURRENT_FILENAME)
+    tmp = f"{current}.{os.getpid()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(version + '\n')
+    os.replace(tmp, current)
+
+
+def artifact_paths(version):
+    """(model path, scaler path, version label) for version, or the legacy flat files for None"""
+    if version is None:
+        label = Config.MODEL_VERSION or time.strftime(
+            '%Y%m%d%H%M%S', time.gmtime(os.path.getmtime(Config.MODEL_PATH)))
+        return Config.MODEL_PATH, Config.SCALER_PATH, label
+    directory = os.path.join(versions_dir(), version)
+    return os.path.join(directory, MODEL_FILENAME), os.path.join(directory, SCALER_FILENAME), version
+
+
+def compact_path(version):
+    """The version's compact forest file if it has one (the legacy flat artifacts never do)"""
+    if version is None:
+        return None
+    path = os.path.join(versions_dir(), version, COMPACT_FILENAME)
+    return path if os.path.isfile(path) else None
+
+
+def flat_dir(version, label):
+    """Where the memory-mappable arrays for a version are kept"""
+    if version is None:
+        return os.path.join(Config.MODEL_DIR, 'flat', label)
+    return os.path.join(versions_dir(), version, 'flat')
+
+
+def check_schema(model_path, model=None, scaler=None):
+    """
+    Refuse artifacts whose column order differs from the serving schema.
+
+    Checks the feature_schema.json saved next to the model by training, and
+    the column names/count the scaler and model were fitted with.
+    """
+    schema_path = os.path.join(os.path.dirname(model_path), SCHEMA_FILENAME)
+    if os.path.exists(schema_path):
+        SCHEMA.check_columns(FeatureSchema.load(schema_path).names, schema_path)
+    names = getattr(scaler, 'feature_names_in_', None)
+    if names is not None:
+        SCHEMA.check_columns(names, 'Scaler')
+    for name, fitted in (('Scaler', scaler), ('Model', model)):
+        n_features = getattr(fitted, 'n_features_in_', None)
+        if n_features is not None and n_features != len(SCHEMA):
+            raise ValueError(f"{name} expects {n_features} features, schema has {len(SCHEMA)}")
+
+
+def _source_stamp(model_path, scaler_path):
+    """Identifies the pickles an exported array set was built from"""
+    return {
+        os.path.basename(path): [os.path.getsize(path), int(os.path.getmtime(path))]
+        for path in (model_path, scaler_path)
+    }
+
+
+def _load_shared_engine(directory, stamp):
+    """Memory-map a previously exported engine, or return None if it is missing or stale"""
+    try:
+        with open(os.path.join(directory, 'manifest.json'), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('source') != stamp or 'features' not in manifest:
+            return None, None
+        SCHEMA.check_columns(manifest.get('features', ()), os.path.join(directory, 'manifest.json'))
+        return FlatForest.load(directory, mmap_mode='r'), FlatScaler.load(directory)
+    except OSError:
+        return None, None
+
+
+def _export_shared_engine(directory, engine, engine_scaler, stamp):
+    """
+    Write the engine's arrays next to the version. Written to a temporary
+    directory and renamed, so concurrently starting workers never map a
+    partial export.
+    """
+    tmp = f"{directory}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    engine.save(tmp)
+    engine_scaler.save(tmp)
+    with open(os.path.join(tmp, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump({'source': stamp, 'features': list(SCHEMA.names)}, f)
+    shutil.rmtree(directory, ignore_errors=True)
+    try:
+        os.rename(tmp, directory)
+    except OSError:
+        # Another worker published the same export first
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def _load_compact_engine(path):
+    """Forest and scaler from a compact forest file, checked against the serving schema"""
+    engine, engine_scaler, header = load_compact(path)
+    if header['features'] is not None:
+        SCHEMA.check_columns(header['features'], path)
+    if header['n_features'] != len(SCHEMA):
+        raise ValueError(f"{path} expects {header['n_features']} features, schema has {len(SCHEMA)}")
+    if engine_scaler is None:
+        raise ValueError(f"{path} has no scaler")
+    print(f"Loaded compact forest {path} ({engine.n_trees} trees, {len(engine.feature)} nodes)")
+    return engine, engine_scaler
+
+
+def _build_native_engine(model, scaler):
+    """Flatten model and scaler, or return None if they cannot be served natively"""
+    try:
+        engine = FlatForest.from_sklearn(model)
+        engine_scaler = FlatScaler.from_sklearn(scaler)
+
+        # Check parity on synthetic rows in the scaled feature space before serving
+        X_check = np.random.default_rng(0).normal(size=(256, model.n_features_in_))
+        difference = max_proba_difference(engine, model, X_check)
+        if difference > PROBA_TOLERANCE:
+            raise ValueError(f"native probabilities differ from sklearn by {difference:.3g}")
+    except Exception as e:
+        print(f"Native engine unavailable, using sklearn backend: {e}")
+        return None, None
+
+    print(f"Native forest engine ready ({engine.n_trees} trees, {len(engine.feature)} nodes)")
+    return engine, engine_scaler
+
+
+def load_bundle(version=None, backend='sklearn', sharing=None):
+    """
+    Load the artifacts for version (None means the legacy flat files) into a ModelBundle.
+
+    sharing='mmap' (native backend only) serves the forest from raw .npy arrays
+    mapped read-only with np.load(mmap_mode='r'). The pages live in the OS page
+    cache, so every gunicorn worker shares one physical copy, and the sklearn
+    pickle is only unpickled the first time a version is exported.
+
+    With the native backend a version's compact forest file (see
+    forest_engine.save_compact) is loaded instead of the pickles when
+    MODEL_FORMAT is 'compact', so sklearn is never imported.
+    """
+    model_path, scaler_path, label = artifact_paths(version)
+    compact = compact_path(version) if backend == 'native' and Config.MODEL_FORMAT == 'compact' else None
+
+    if backend == 'native' and sharing == 'mmap':
+        directory = flat_dir(version, label)
+        stamp = _source_stamp(model_path, scaler_path)
+        engine, engine_scaler = _load_shared_engine(directory, stamp)
+        if engine is None and compact is not None:
+            _export_shared_engine(directory, *_load_compact_engine(compact), stamp)
+            engine, engine_scaler = _load_shared_engine(directory, stamp)
+        if engine is None:
+            model = joblib.load(model_path)
+            scaler = joblib.load(scaler_path)
+            check_schema(model_path, model, scaler)
+            engine, engine_scaler = _build_native_engine(model, scaler)
+            if engine is None:
+                return ModelBundle(label, model, scaler, 'sklearn')
+            _export_shared_engine(directory, engine, engine_scaler, stamp)
+            # Drop the private copies and the pickle in favour of the shared mapping
+            del model, scaler
+            engine, engine_scaler = _load_shared_engine(directory, stamp)
+        print(f"Serving memory-mapped forest from {directory}")
+        return ModelBundle(label, None, None, backend, engine, engine_scaler)
+
+    if compact is not None:
+        engine, engine_scaler = _load_compact_engine(compact)
+        return ModelBundle(label, None, None, backend, engine, engine_scaler)
+
+    model = joblib.load(model_path)
+    scaler = joblib.load(scaler_path)
+    check_schema(model_path, model, scaler)
+
+    engine = engine_scaler = None
+    if backend == 'native':
+        engine, engine_scaler = _build_native_engine(model, scaler)
+        if engine is None:
+            backend = 'sklearn'
+
+    return ModelBundle(label, model, scaler, backend, engine, engine_scaler)
+
+
+class ModelWatcher(threading.Thread):
+    """Background thread that reloads the service when the active version on disk changes"""
+
+    def __init__(self, service, interval):
+        super().__init__(name='model-watcher', daemon=True)
+        self.service = service
+        self.interval = interval
+        self._stopped = threading.Event()
+        # A version that failed to load is not retried until CURRENT changes again
+        self._failed_version = None
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            version = active_version()
+            if version is None or version in (self.service.model_version, self._failed_version):
+                continue
+            try:
+                print(f"Model version {version} activated, reloading")
+                self.service.reload(version)
+            except Exception as e:
+                print(f"Model watcher could not load version {version}: {e}")
+                self._failed_version = version
+
+    def stop(self):
+        self._stopped.set()
@@ -0,0 +1,115 @@
+import threading
+import time
+from collections import OrderedDict
+
+from services.metrics import registry
+
+CACHE_LOOKUPS = registry.counter(
+    'cardiocare_prediction_cache_lookups_total', 'Prediction cache lookups', ('cache', 'result'))
+CACHE_EVICTIONS = registry.counter(
+    'cardiocare_prediction_cache_evictions_total', 'Prediction cache entries dropped', ('cache', 'reason'))
+CACHE_ENTRIES = registry.gauge(
+    'cardiocare_prediction_cache_entries', 'Entries currently held in the prediction cache', ('cache',))
+
+
+def feature_key(row):
+    """
+    Canonical cache key for one row of the float64 feature matrix.
+
+    The row's raw bytes make 1, 1.0 and True the same key; adding 0.0 folds
+    -0.0 into 0.0 so the sign of zero does not split entries.
+    """
+    return (row + 0.0).tobytes()
+
+
+class PredictionCache:
+    """
+    Bounded in-process LRU cache of prediction results.
+
+    Entries expire after ttl seconds; when the cache is full the least
+    recently used entry is evicted. The cache is bound to a model version and
+    empties itself when a different version is set, so a reload never serves
+    stale results. max_size=0 disables caching. name labels the cache's metrics.
+    """
+
+    def __init__(self, max_size, ttl, name='prediction'):
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self.model_version = None
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_size > 0
+
+    def bind_model(self, model_version):
+        """Drop every entry if the serving model changed"""
+        with self._lock:
+            if model_version == self.model_version:
+                return
+            self.model_version = model_version
+            if self._entries:
+                CACHE_EVICTIONS.inc((self.name, 'model_change'), len(self._entries))
+            self._entries.clear()
+            CACHE_ENTRIES.set(0, self.name)
+
+    def get(self, key):
+        """Return a copy of the cached result for key, or None"""
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, result = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    CACHE_LOOKUPS.inc((self.name, 'hit'))
+                    return dict(result)
+                del self._entries[key]
+                CACHE_EVICTIONS.inc((self.name, 'expired'))
+                CACHE_ENTRIES.set(len(self._entries), self.name)
+            self.misses += 1
+        CACHE_LOOKUPS.inc((self.name, 'miss'))
+        return None
+
+    def put(self, key, result, model_version=None):
+        """
+        Cache result under key. A result computed by a model other than the
+        bound one (a request that straddled a reload) is not stored.
+        """
+        if not self.enabled:
+            return
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            if model_version is not None and model_version != self.model_version:
+                return
+            self._entries[key] = (expires_at, dict(result))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                CACHE_EVICTIONS.inc((self.name, 'lru'))
+            CACHE_ENTRIES.set(len(self._entries), self.name)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            CACHE_ENTRIES.set(0, self.name)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'model_version': self.model_version,
+            }
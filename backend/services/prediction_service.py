@@ -1,74 +1,394 @@
-import joblib
 import numpy as np
 import os
 import sys
+import threading
 
 # Add the parent directory to the path to import config
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config import Config
+from services.forest_engine import FlatForest, TreeExplainer
+from services.metrics import MODEL_INFO, STAGE_SECONDS
+from services.model_store import ModelWatcher, active_version, load_bundle
+from services.startup import timeline
+from services.prediction_cache import PredictionCache, feature_key
+from utils.preprocess import SCHEMA
+
+# Expected features in the order the model was trained on
+FEATURES = list(SCHEMA.names)
+
+# Plausible (low, high) ranges for the measurements, used to build synthetic
+# warm-up rows and default what-if grids; every other feature is a 0/1 flag
+PLAUSIBLE_RANGES = {
+    'age': (20, 90), 'cholesterol_level': (120, 400), 'waist_circumference': (60, 150),
+    'sleep_hours': (4, 10), 'fasting_blood_sugar': (70, 250), 'triglycerides': (60, 600)
+}
+
+
+def synthetic_rows(n_rows, seed=0):
+    """Random but realistic raw feature rows, for warm-up and benchmarks"""
+    rng = np.random.default_rng(seed)
+    X = rng.integers(0, 2, size=(n_rows, len(FEATURES))).astype(np.float64)
+    for column, feature in enumerate(FEATURES):
+        if feature in PLAUSIBLE_RANGES:
+            low, high = PLAUSIBLE_RANGES[feature]
+            X[:, column] = rng.integers(low, high + 1, size=n_rows)
+    return X
+
+
+def build_result(prediction, probability, model_version=None):
+    """Shape a single model output the way the API returns it"""
+    return {
+        'prediction': int(prediction),
+        'probability': float(probability),
+        'risk_level': 'High' if prediction == 1 else 'Low',
+        'message': 'Heart attack risk detected' if prediction == 1 else 'No heart attack risk detected',
+        'model_version': model_version
+    }
+
+
+def build_explanation(prediction, probability, bias, contributions, row, model_version=None):
+    """
+    A prediction plus why: bias + sum of contributions = probability. Features
+    are listed by the size of their effect, largest first.
+    """
+    result = build_result(prediction, probability, model_version)
+    result['bias'] = float(bias)
+    result['contributions'] = [
+        {'feature': FEATURES[column], 'value': float(row[column]), 'contribution': float(contributions[column])}
+        for column in np.argsort(-np.abs(contributions), kind='stable')
+    ]
+    return result
+
+
+def validate_record(record):
+    """Return an error message for a malformed record, or None if it can be scored"""
+    return SCHEMA.validate(record)
+
 
 class PredictionService:
-    def __init__(self):
-        self.model = None
-        self.scaler = None
-        self.load_model()
+    """
+    Scores patient records with the trained model.
 
-    def load_model(self):
+    backend selects how the model is evaluated:
+    - 'sklearn': the unpickled estimator's own predict_proba
+    - 'native': the forest flattened into NumPy arrays (see forest_engine),
+      which avoids sklearn's per-call overhead; falls back to 'sklearn' if the
+      model cannot be flattened or does not reproduce sklearn's output
+
+    The model, scaler and derived engine live in one immutable ModelBundle.
+    reload() builds and warms a new bundle off the request path and swaps it
+    in with a single assignment; each prediction reads the bundle once, so
+    in-flight requests finish on the model they started with.
+
+    With load=False nothing is loaded until load_and_warm_up() or
+    start_background_load() is called; until then `ready` is False and
+    `status` tells a booting service from a failed one.
+    """
+
+    BACKENDS = ('sklearn', 'native')
+
+    def __init__(self, backend=None, load=True):
+        self.backend = backend or Config.PREDICTION_BACKEND
+        if self.backend not in self.BACKENDS:
+            raise ValueError(f"Unknown prediction backend: {self.backend}")
+        self.cache = PredictionCache(Config.PREDICTION_CACHE_SIZE, Config.PREDICTION_CACHE_TTL)
+        self.explanation_cache = PredictionCache(
+            Config.EXPLANATION_CACHE_SIZE, Config.PREDICTION_CACHE_TTL, name='explanation')
+        # (bundle, TreeExplainer), built on the first explanation for a bundle
+        self._explainer = None
+        self._explainer_lock = threading.Lock()
+        self._bundle = None
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+        self._ready = threading.Event()
+        self.status = 'starting'
+        self.startup_error = None
+        if load:
+            self.load_and_warm_up(raise_errors=True)
+
+    @property
+    def ready(self):
+        """True once a model is loaded and warmed up"""
+        return self._ready.is_set()
+
+    def load_and_warm_up(self, raise_errors=False):
+        """Load the active model, run warm-up predictions and mark the service ready"""
         try:
-            self.model = joblib.load(Config.MODEL_PATH)
-            self.scaler = joblib.load(Config.SCALER_PATH)
-            print("Model and scaler loaded successfully")
+            self.status = 'loading'
+            timeline.mark('model_load_started')
+            self.load_model()
+            self.status = 'ready'
+            self._ready.set()
+            timeline.mark('ready')
         except Exception as e:
-            print(f"Error loading model: {e}")
-            raise
+            self.status = 'failed'
+            self.startup_error = str(e)
+            timeline.mark('failed')
+            if raise_errors:
+                raise
+        finally:
+            timeline.log_once()
+
+    def start_background_load(self):
+        """Load and warm up in a daemon thread so the app can answer health checks meanwhile"""
+        thread = threading.Thread(target=self.load_and_warm_up, name='model-loader', daemon=True)
+        thread.start()
+        return thread
+
+    @property
+    def bundle(self):
+        return self._bundle
+
+    @property
+    def model(self):
+        return self._bundle.model
+
+    @property
+    def scaler(self):
+        return self._bundle.scaler
+
+    @property
+    def engine(self):
+        return self._bundle.engine
+
+    @property
+    def model_version(self):
+        return self._bundle.version if self._bundle is not None else None
+
+    def load_model(self):
+        """Load the active model version (or the legacy flat artifacts)"""
+        self.reload(active_version())
+
+    def reload(self, version=None):
+        """
+        Load version (None: legacy flat artifacts) and make it the serving model.
+        The old bundle keeps serving until the new one is fully loaded.
+        """
+        with self._reload_lock:
+            try:
+                bundle = load_bundle(version, self.backend, Config.MODEL_SHARING)
+                timeline.mark('model_loaded')
+                self.warm_up(bundle)
+                timeline.mark('warmed_up')
+            except Exception as e:
+                print(f"Error loading model: {e}")
+                raise
+
+            self._bundle = bundle
+
+            # Results cached for the previous model are no longer valid
+            self.cache.bind_model(bundle.version)
+            self.explanation_cache.bind_model(bundle.version)
+
+            MODEL_INFO.clear()
+            MODEL_INFO.set(1, (bundle.version, bundle.backend))
+            print(f"Model and scaler loaded successfully (version {bundle.version}, {bundle.backend} backend)")
+            return bundle
+
+    def warm_up(self, bundle):
+        """
+        Score synthetic rows at a few batch sizes before a bundle serves traffic,
+        so the first real requests do not pay for lazy imports, first-touch
+        page faults on the model arrays or cold CPU caches. Bypasses the
+        metrics and the cache.
+        """
+        for n_rows in Config.WARMUP_BATCH_SIZES:
+            X = synthetic_rows(n_rows)
+            if bundle.engine is not None:
+                bundle.engine.predict_proba(bundle.engine_scaler.transform(X))
+            else:
+                bundle.model.predict_proba(bundle.scaler.transform(X))
+
+    def start_watcher(self, interval):
+        """Poll the model directory every interval seconds and reload when the active version changes"""
+        # A watcher started in a preloading master does not survive the fork,
+        # so workers call this again after forking
+        if interval <= 0 or (self._watcher is not None and self._watcher.is_alive()):
+            return
+        self._watcher = ModelWatcher(self, interval)
+        self._watcher.start()
+
+    def predict_proba(self, X, bundle=None):
+        """Scale a raw N x 21 feature matrix and return class probabilities"""
+        bundle = bundle or self._bundle
+        if bundle.engine is not None:
+            with STAGE_SECONDS.time('scaling'):
+                X_scaled = bundle.engine_scaler.transform(X)
+            with STAGE_SECONDS.time('model'):
+                return bundle.engine.predict_proba(X_scaled)
+
+        with STAGE_SECONDS.time('scaling'):
+            X_scaled = bundle.scaler.transform(X)
+        with STAGE_SECONDS.time('model'):
+            return bundle.model.predict_proba(X_scaled)
+
+    def score_matrix(self, X, bundle=None):
+        """
+        Return (predicted classes, positive-class probabilities) for a raw,
+        already validated feature matrix. Bypasses the result cache.
+        """
+        bundle = bundle or self._bundle
+        proba = self.predict_proba(X, bundle)
+        # Same rule RandomForestClassifier.predict applies, without a second pass
+        predictions = bundle.classes.take(np.argmax(proba, axis=1))
+        return predictions, proba[:, 1]
 
     def predict(self, input_data):
         """
         Predict heart attack risk based on input features
         input_data: dict with feature values
         """
+        bundle = self._bundle
         try:
-            print(f"Input data received: {input_data}")
-
-            # Expected features in order
-            features = [
-                'age', 'hypertension', 'diabetes', 'cholesterol_level', 'obesity',
-                'waist_circumference', 'sleep_hours', 'fasting_blood_sugar', 'triglycerides',
-                'previous_heart_disease', 'medication_usage', 'region_Urban', 'income_level_middle',
-                'smoking_status_Never', 'smoking_status_Past', 'smoking_status_Unknown',
-                'physical_activity_Low', 'stress_level_Moderate', 'stress_level_moderate',
-                'EKG_results_Normal', 'gender_Male'
-            ]
-
             # Extract values in correct order
-            feature_values = [input_data.get(feature, 0) for feature in features]
-            print(f"Feature values: {feature_values}")
+            with STAGE_SECONDS.time('feature_extraction'):
+                X, _, errors = SCHEMA.vectorize([input_data])
+            if errors:
+                raise ValueError(errors[0])
 
-            # Convert to numpy array and scale
-            X = np.array(feature_values).reshape(1, -1)
-            print(f"Input array shape: {X.shape}")
-
-            X_scaled = self.scaler.transform(X)
-            print(f"Scaled array: {X_scaled}")
+            # Identical feature vectors get the cached result
+            key = None
+            if self.cache.enabled:
+                key = feature_key(X[0])
+                cached = self.cache.get(key)
+                if cached is not None:
+                    return cached
 
             # Make prediction
-            prediction = self.model.predict(X_scaled)[0]
-            probability = self.model.predict_proba(X_scaled)[0][1]  # Probability of positive class
-
-            print(f"Raw prediction: {prediction}, Probability: {probability}")
+            predictions, probabilities = self.score_matrix(X, bundle)
+            result = build_result(predictions[0], probabilities[0], bundle.version)
 
-            result = {
-                'prediction': int(prediction),
-                'probability': float(probability),
-                'risk_level': 'High' if prediction == 1 else 'Low',
-                'message': 'Heart attack risk detected' if prediction == 1 else 'No heart attack risk detected'
-            }
-
-            print(f"Final result: {result}")
+            if key is not None:
+                self.cache.put(key, result, bundle.version)
             return result
 
         except Exception as e:
             print(f"Error in prediction: {e}")
             import traceback
             traceback.print_exc()
-            raise
\ No newline at end of file
+            raise
+
+    def predict_batch(self, records):
+        """
+        Predict heart attack risk for many patients in a single model pass
+        records: list of dicts with feature values
+        Returns one entry per record, in input order. Rows that fail
+        validation get {'index': i, 'error': message} instead of a result.
+        """
+        bundle = self._bundle
+        results = [None] * len(records)
+
+        # One N x 21 matrix, validated as a whole, one transform and one model
+        # pass for the whole batch
+        with STAGE_SECONDS.time('feature_extraction'):
+            X, valid, errors = SCHEMA.vectorize(records)
+        for i, error in errors.items():
+            results[i] = {'index': i, 'error': error}
+
+        row_index = np.flatnonzero(valid).tolist()
+        if not row_index:
+            return results
+        if errors:
+            X = X[valid]
+
+        # Serve repeated profiles from the cache and only score the misses
+        keys = None
+        misses = range(len(row_index))
+        if self.cache.enabled:
+            keys = [feature_key(row) for row in X]
+            misses = []
+            for j, i in enumerate(row_index):
+                cached = self.cache.get(keys[j])
+                if cached is None:
+                    misses.append(j)
+                else:
+                    cached['index'] = i
+                    results[i] = cached
+            if not misses:
+                return results
+            X = X[misses]
+
+        predictions, positive = self.score_matrix(X, bundle)
+
+        for j, prediction, probability in zip(misses, predictions, positive):
+            result = build_result(prediction, probability, bundle.version)
+            if keys is not None:
+                self.cache.put(keys[j], result, bundle.version)
+            i = row_index[j]
+            result['index'] = i
+            results[i] = result
+
+        return results
+
+    def explainer(self, bundle=None):
+        """
+        TreeExplainer for bundle, built once per bundle. Uses the native
+        engine's arrays when it is loaded, otherwise flattens the sklearn
+        forest; raises ValueError if the model is not a tree ensemble.
+        """
+        bundle = bundle or self._bundle
+        current = self._explainer
+        if current is not None and current[0] is bundle:
+            return current[1]
+        with self._explainer_lock:
+            current = self._explainer
+            if current is None or current[0] is not bundle:
+                forest = bundle.engine if bundle.engine is not None else FlatForest.from_sklearn(bundle.model)
+                current = (bundle, TreeExplainer(forest, len(FEATURES)))
+                self._explainer = current
+            return current[1]
+
+    def explain_batch(self, records):
+        """
+        Per-feature contributions to each record's risk probability (see
+        TreeExplainer), scored in one pass. Same shape as predict_batch: one
+        entry per record, rows that fail validation get an error instead.
+        """
+        bundle = self._bundle
+        explainer = self.explainer(bundle)
+        scaler = bundle.engine_scaler if bundle.engine is not None else bundle.scaler
+        results = [None] * len(records)
+
+        with STAGE_SECONDS.time('feature_extraction'):
+            X, valid, errors = SCHEMA.vectorize(records)
+        for i, error in errors.items():
+            results[i] = {'index': i, 'error': error}
+
+        row_index = np.flatnonzero(valid).tolist()
+        if not row_index:
+            return results
+        if errors:
+            X = X[valid]
+
+        keys = None
+        misses = range(len(row_index))
+        if self.explanation_cache.enabled:
+            keys = [feature_key(row) for row in X]
+            misses = []
+            for j, i in enumerate(row_index):
+                cached = self.explanation_cache.get(keys[j])
+                if cached is None:
+                    misses.append(j)
+                else:
+                    cached['index'] = i
+                    results[i] = cached
+            if not misses:
+                return results
+            X = X[misses]
+
+        with STAGE_SECONDS.time('scaling'):
+            X_scaled = scaler.transform(X)
+        with STAGE_SECONDS.time('explanation'):
+            proba, contributions = explainer.explain(X_scaled)
+        predictions = bundle.classes.take(np.argmax(proba, axis=1))
+
+        for k, j in enumerate(misses):
+            result = build_explanation(predictions[k], proba[k, 1], explainer.bias, contributions[k], X[k],
+                                       bundle.version)
+            if keys is not None:
+                self.explanation_cache.put(keys[j], result, bundle.version)
+            i = row_index[j]
+            result['index'] = i
+            results[i] = result
+
+        return results
@@ -0,0 +1,133 @@
+import collections
+import os
+import threading
+import time
+
+from services.metrics import registry
+
+RECORDS = registry.counter(
+    'cardiocare_records_total', 'Prediction records handled by the write-behind queue', ('outcome',))
+RECORD_QUEUE_DEPTH = registry.gauge(
+    'cardiocare_record_queue_depth', 'Prediction records waiting to be written')
+RECORD_BATCH_SECONDS = registry.histogram(
+    'cardiocare_record_batch_seconds', 'Time to write one batch of prediction records')
+
+
+class RecordWriter:
+    """
+    Write-behind queue for prediction records.
+
+    submit() only appends to an in-memory queue, so a request never waits on
+    the database. A background thread drains the queue into insert_many
+    batches of up to batch_size records, flushing at least every
+    flush_interval seconds. A batch that fails to insert is discarded and
+    counted as failed, not retried. While the database is slow the queue is
+    capped at max_queue records and the oldest are dropped (and counted).
+
+    close() (registered with atexit by the caller) writes what is still
+    queued before the process exits.
+    """
+
+    def __init__(self, model_factory, batch_size=100, flush_interval=0.5, max_queue=10000):
+        self.model_factory = model_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self._queue = collections.deque()
+        self._condition = threading.Condition()
+        self._model = None
+        self._thread = None
+        self._pid = None
+        self._writing = 0
+        self._flush_waiters = 0
+        self._closed = False
+
+    def _ensure_thread(self):
+        # Started lazily (and again after a fork) so each worker has its own writer thread
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            self._pid = os.getpid()
+            self._model = None
+            self._thread = threading.Thread(target=self._run, name='record-writer', daemon=True)
+            self._thread.start()
+
+    def submit(self, record):
+        """Queue one record for writing; never blocks on the database"""
+        with self._condition:
+            if self._closed:
+                return
+            self._ensure_thread()
+            if len(self._queue) >= self.max_queue:
+                self._queue.popleft()
+                RECORDS.inc('dropped')
+            self._queue.append(record)
+            RECORD_QUEUE_DEPTH.set(len(self._queue))
+            # Wake the writer to start a batch window, or when a batch is full
+            if len(self._queue) == 1 or len(self._queue) >= self.batch_size:
+                self._condition.notify_all()
+
+    def _next_batch(self):
+        with self._condition:
+            while not self._queue and not self._closed:
+                self._condition.wait()
+            # Give a partial batch up to flush_interval to fill, unless someone is waiting on it
+            deadline = time.monotonic() + self.flush_interval
+            while len(self._queue) < self.batch_size and not (self._closed or self._flush_waiters):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            size = min(len(self._queue), self.batch_size)
+            batch = [self._queue.popleft() for _ in range(size)]
+            self._writing = size
+            RECORD_QUEUE_DEPTH.set(len(self._queue))
+            return batch
+
+    def _write(self, batch):
+        try:
+            if self._model is None:
+                self._model = self.model_factory()
+            with RECORD_BATCH_SECONDS.time():
+                self._model.insert_many(batch)
+            RECORDS.inc('written', len(batch))
+        except Exception as e:
+            RECORDS.inc('failed', len(batch))
+            print(f"Failed to write {len(batch)} prediction records: {e}")
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+            with self._condition:
+                self._writing = 0
+                self._condition.notify_all()
+                if self._closed and not self._queue:
+                    return
+
+    def flush(self, timeout=10.0):
+        """Wait until every queued record has been written (or timeout); True if drained"""
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            if self._queue:
+                self._ensure_thread()
+            self._flush_waiters += 1
+            self._condition.notify_all()
+            try:
+                while self._queue or self._writing:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self._condition.wait(remaining)
+                return True
+            finally:
+                self._flush_waiters -= 1
+
+    def close(self, timeout=10.0):
+        """Stop accepting records and write out the queue"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        drained = self.flush(timeout)
+        if not drained:
+            print(f"Prediction records not written at shutdown: {len(self._queue)}")
+        return drained
@@ -0,0 +1,32 @@
+import threading
+import time
+
+
+class StartupTimeline:
+    """
+    Records how long each startup step took, relative to the first import of
+    this module, and prints the whole timeline once when startup settles.
+    """
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.events = []
+        self._logged = False
+        self._lock = threading.Lock()
+
+    def mark(self, event):
+        with self._lock:
+            if not self._logged:
+                self.events.append((event, time.perf_counter() - self.origin))
+
+    def log_once(self):
+        with self._lock:
+            if self._logged:
+                return
+            self._logged = True
+            events = list(self.events)
+        steps = ', '.join(f"{event} +{seconds * 1000:.0f}ms" for event, seconds in events)
+        print(f"Startup timeline: {steps}")
+
+
+timeline = StartupTimeline()
@@ -0,0 +1,211 @@
+import csv
+import io
+import json
+import time
+
+from services.metrics import registry
+from utils.preprocess import SCHEMA
+
+CHUNK_ROWS_PER_SECOND = registry.histogram(
+    'cardiocare_stream_chunk_rows_per_second', 'Scoring throughput of each streamed chunk',
+    buckets=(100, 1000, 5000, 10000, 25000, 50000, 100000, 250000, 500000, 1000000))
+STREAMED_ROWS = registry.counter(
+    'cardiocare_stream_rows_total', 'Rows scored by the streaming endpoint', ('outcome',))
+
+# Identifier columns copied from each input row to its output row
+ID_FIELDS = ('id', 'record_id', 'patient_id')
+
+CSV_COLUMNS = ['row', 'id', 'prediction', 'probability', 'risk_level', 'error']
+
+
+def iter_lines(stream, size=65536):
+    """
+    Decoded lines from a binary request stream, read incrementally.
+    Invalid UTF-8 is replaced (U+FFFD) rather than aborting the stream, so a
+    bad byte in a feature value fails that row's validation like any other
+    malformed value.
+    """
+    while True:
+        line = stream.readline(size)
+        if not line:
+            return
+        # readline(size) may stop mid-line on very long lines; keep reading
+        while not line.endswith(b'\n'):
+            more = stream.readline(size)
+            if not more:
+                break
+            line += more
+        yield line.decode('utf-8', errors='replace')
+
+
+def ndjson_chunks(lines, chunk_rows):
+    """
+    Group NDJSON lines into chunks of parsed records.
+    Yields (records, ids, parse_errors) with parse errors keyed by position in the chunk.
+    """
+    records, ids, parse_errors = [], [], {}
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            parse_errors[len(records)] = 'Invalid JSON'
+            record = None
+        if isinstance(record, dict):
+            ids.append(next((record.pop(field) for field in ID_FIELDS if field in record), None))
+        else:
+            ids.append(None)
+        records.append(record)
+        if len(records) == chunk_rows:
+            yield records, ids, parse_errors
+            records, ids, parse_errors = [], [], {}
+    if records:
+        yield records, ids, parse_errors
+
+
+def csv_chunks(lines, chunk_rows):
+    """
+    Group CSV rows (with a header line) into column-oriented chunks.
+    Yields (columns, ids, n_rows).
+    """
+    reader = csv.reader(lines)
+    header = next(reader, None)
+    if header is None:
+        return
+    header = [name.strip() for name in header]
+    positions = {name: j for j, name in enumerate(header)}
+    id_position = next((positions[field] for field in ID_FIELDS if field in positions), None)
+    feature_positions = {name: j for name, j in positions.items() if name in SCHEMA.index}
+
+    rows = []
+    for row in reader:
+        if not row:
+            continue
+        rows.append(row)
+        if len(rows) == chunk_rows:
+            yield _columns(rows, feature_positions, id_position)
+            rows = []
+    if rows:
+        yield _columns(rows, feature_positions, id_position)
+
+
+def _columns(rows, feature_positions, id_position):
+    columns = {
+        name: [row[j] if j < len(row) else '' for row in rows]
+        for name, j in feature_positions.items()
+    }
+    ids = [row[id_position] if id_position is not None and id_position < len(row) else None for row in rows]
+    return columns, ids, len(rows)
+
+
+class StreamScorer:
+    """
+    Scores an incoming CSV or NDJSON body chunk by chunk and yields the
+    serialized results as each chunk finishes, so memory stays bounded by
+    chunk_rows whatever the size of the upload.
+
+    All chunks are scored by the model bundle that was serving when the
+    stream started.
+    """
+
+    def __init__(self, service, input_format, output_format, chunk_rows, progress=False):
+        self.service = service
+        self.input_format = input_format
+        self.output_format = output_format
+        self.chunk_rows = chunk_rows
+        self.progress = progress
+
+    def generate(self, stream):
+        bundle = self.service.bundle
+        buffer = SCHEMA.allocate(self.chunk_rows)
+        lines = iter_lines(stream)
+        totals = {'rows': 0, 'scored': 0, 'errors': 0, 'chunks': 0}
+        started = time.perf_counter()
+
+        if self.output_format == 'csv':
+            yield _csv_line(CSV_COLUMNS)
+
+        if self.input_format == 'csv':
+            chunks = ((columns, ids, n_rows, {}) for columns, ids, n_rows in csv_chunks(lines, self.chunk_rows))
+        else:
+            chunks = ((records, ids, len(records), parse_errors)
+                      for records, ids, parse_errors in ndjson_chunks(lines, self.chunk_rows))
+
+        for data, ids, n_rows, parse_errors in chunks:
+            chunk_started = time.perf_counter()
+            if self.input_format == 'csv':
+                X, valid, errors = SCHEMA.vectorize_columns(data, n_rows, out=buffer)
+            else:
+                X, valid, errors = SCHEMA.vectorize(data, out=buffer)
+                for i, error in parse_errors.items():
+                    errors[i] = error
+                    valid[i] = False
+
+            predictions = probabilities = ()
+            if valid.any():
+                predictions, probabilities = self.service.score_matrix(X[valid], bundle)
+
+            output = self._serialize(totals['rows'], ids, valid, errors, predictions, probabilities, bundle.version)
+
+            seconds = time.perf_counter() - chunk_started
+            rows_per_second = n_rows / seconds if seconds > 0 else float(n_rows)
+            CHUNK_ROWS_PER_SECOND.observe(rows_per_second)
+            scored = int(valid.sum())
+            STREAMED_ROWS.inc('scored', scored)
+            STREAMED_ROWS.inc('error', n_rows - scored)
+
+            totals['chunks'] += 1
+            totals['rows'] += n_rows
+            totals['scored'] += scored
+            totals['errors'] += n_rows - scored
+
+            if self.progress and self.output_format == 'ndjson':
+                output += json.dumps({'chunk': totals['chunks'], 'rows': n_rows,
+                                      'seconds': seconds, 'rows_per_second': rows_per_second}) + '\n'
+            yield output
+
+        # Per-chunk throughput goes to CHUNK_ROWS_PER_SECOND; log one line per stream
+        elapsed = time.perf_counter() - started
+        totals['seconds'] = elapsed
+        totals['rows_per_second'] = totals['rows'] / elapsed if elapsed > 0 else 0.0
+        totals['model_version'] = bundle.version
+        print(f"Stream scored: {totals['rows']} rows ({totals['errors']} rejected) in {totals['chunks']} chunks, "
+              f"{elapsed:.2f}s ({totals['rows_per_second']:.0f} rows/s)")
+
+        if self.output_format == 'ndjson':
+            yield json.dumps({'summary': totals}) + '\n'
+
+    def _serialize(self, first_row, ids, valid, errors, predictions, probabilities, model_version):
+        scored = iter(zip(predictions, probabilities))
+        if self.output_format == 'csv':
+            out = io.StringIO()
+            writer = csv.writer(out, lineterminator='\n')
+            for i in range(len(valid)):
+                if valid[i]:
+                    prediction, probability = next(scored)
+                    writer.writerow([first_row + i, ids[i] or '', int(prediction), float(probability),
+                                     'High' if prediction == 1 else 'Low', ''])
+                else:
+                    writer.writerow([first_row + i, ids[i] or '', '', '', '', errors[i]])
+            return out.getvalue()
+
+        lines = []
+        for i in range(len(valid)):
+            if valid[i]:
+                prediction, probability = next(scored)
+                row = {'row': first_row + i, 'prediction': int(prediction), 'probability': float(probability),
+                       'risk_level': 'High' if prediction == 1 else 'Low', 'model_version': model_version}
+            else:
+                row = {'row': first_row + i, 'error': errors[i]}
+            if ids[i] is not None:
+                row['id'] = ids[i]
+            lines.append(json.dumps(row))
+        return '\n'.join(lines) + '\n'
+
+
+def _csv_line(values):
+    out = io.StringIO()
+    csv.writer(out, lineterminator='\n').writerow(values)
+    return out.getvalue()
@@ -0,0 +1,111 @@
+import numpy as np
+
+from services.prediction_service import PLAUSIBLE_RANGES, build_result
+from utils.preprocess import SCHEMA
+
+# Points on a grid given only as a range (or by feature name alone)
+DEFAULT_STEPS = 25
+
+
+def grid_values(name, spec, max_points):
+    """
+    Sorted, de-duplicated values to try for feature name.
+
+    spec: a list of values, {"low": .., "high": .., "steps": ..} (missing keys
+    default to the feature's plausible range and DEFAULT_STEPS) or None.
+    Both forms go through the same schema checks; raises ValueError for
+    unknown features and for non-finite, out-of-range or (for integer
+    features) fractional values.
+    """
+    column = SCHEMA.index.get(name)
+    if column is None:
+        raise ValueError(f'Unknown field: {name}')
+    feature = SCHEMA.features[column]
+    integer = feature.dtype.startswith('int')
+
+    if isinstance(spec, list):
+        if not spec or any(type(value) not in (int, float) for value in spec):
+            raise ValueError(f'Grid for {name} must be a non-empty list of numbers')
+        values = np.asarray(spec, dtype=np.float64)
+    elif spec is None or isinstance(spec, dict):
+        spec = spec or {}
+        default_low, default_high = PLAUSIBLE_RANGES.get(name, (feature.low, feature.high))
+        try:
+            low = float(spec.get('low', default_low))
+            high = float(spec.get('high', default_high))
+            steps = int(spec.get('steps', DEFAULT_STEPS))
+        except (TypeError, ValueError):
+            raise ValueError(f'Invalid grid for {name}: low, high and steps must be numbers')
+        if steps < 2 or high <= low:
+            raise ValueError(f'Invalid grid for {name}: need low < high and at least 2 steps')
+        if steps > max_points:
+            raise ValueError(f'Grid for {name} too large: at most {max_points} steps')
+        values = np.linspace(low, high, steps)
+        if integer:
+            values = np.round(values)
+    else:
+        raise ValueError(f'Grid for {name} must be a list of values or {{"low", "high", "steps"}}')
+
+    # NaN and infinities slip past the range checks below (and serialize as invalid JSON)
+    if not np.isfinite(values).all():
+        raise ValueError(f'Grid for {name} must hold finite numbers')
+    values = np.unique(values)
+    if values[0] < feature.low or values[-1] > feature.high:
+        raise ValueError(f'Grid for {name} is out of range (expected {feature.dtype} in [{feature.low}, {feature.high}])')
+    if integer and np.any(values != np.floor(values)):
+        raise ValueError(f'Grid for {name} must hold whole numbers')
+    return values
+
+
+def parse_grids(grids, max_points):
+    """[(feature, values), ...] from a list of feature names or a {feature: spec} mapping"""
+    if isinstance(grids, list):
+        grids = {name: None for name in grids if isinstance(name, str)}
+    if not isinstance(grids, dict) or not grids:
+        raise ValueError('grids must name at least one feature')
+    return [(name, grid_values(name, spec, max_points)) for name, spec in grids.items()]
+
+
+def sensitivity_curves(service, record, grids, max_rows):
+    """
+    Risk as one feature of record varies over each grid, the others held fixed.
+
+    The patient's own row and every perturbed row go into one matrix, scored
+    in a single model pass with the bundle read once, so all curves and the
+    baseline come from the same model version.
+    """
+    X_base, _, errors = SCHEMA.vectorize([record])
+    if errors:
+        raise ValueError(errors[0])
+    parsed = parse_grids(grids, max_rows)
+    n_rows = 1 + sum(len(values) for _, values in parsed)
+    if n_rows > max_rows:
+        raise ValueError(f'Grids too large: at most {max_rows} rows per request')
+
+    X = np.repeat(X_base, n_rows, axis=0)
+    spans = []
+    start = 1
+    for name, values in parsed:
+        stop = start + len(values)
+        X[start:stop, SCHEMA.index[name]] = values
+        spans.append((name, values, start, stop))
+        start = stop
+
+    bundle = service.bundle
+    predictions, probabilities = service.score_matrix(X, bundle)
+
+    curves = []
+    for name, values, start, stop in spans:
+        curves.append({
+            'feature': name,
+            'current': float(X_base[0, SCHEMA.index[name]]),
+            'values': values.tolist(),
+            'probability': probabilities[start:stop].tolist(),
+            'prediction': predictions[start:stop].astype(int).tolist()
+        })
+    return {
+        'baseline': build_result(predictions[0], probabilities[0], bundle.version),
+        'curves': curves,
+        'rows_scored': n_rows,
+        'model_version': bundle.version
+    }
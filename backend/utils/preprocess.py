@@ -0,0 +1,234 @@
+import json
+
+import numpy as np
+
+SCHEMA_FILENAME = 'feature_schema.json'
+
+# Keys a record may carry besides the features (identifiers, not model inputs)
+METADATA_FIELDS = frozenset(['id', 'record_id', 'patient_id', 'user_id'])
+
+_NUMERIC_TYPES = frozenset([int, float, bool, np.int8, np.int16, np.int32, np.int64,
+                            np.float16, np.float32, np.float64, np.bool_])
+
+_INTEGER_DTYPES = frozenset(['int8', 'int16', 'int32', 'int64'])
+
+
+class Feature:
+    """One model input: its name, storage dtype, allowed [low, high] range and default (None: required)"""
+
+    __slots__ = ('name', 'dtype', 'low', 'high', 'default')
+
+    def __init__(self, name, dtype, low, high, default=None):
+        self.name = name
+        self.dtype = dtype
+        self.low = low
+        self.high = high
+        self.default = default
+
+    def to_dict(self):
+        return {'name': self.name, 'dtype': self.dtype, 'low': self.low, 'high': self.high, 'default': self.default}
+
+
+def flag(name, default=0):
+    """A one-hot / yes-no feature"""
+    return Feature(name, 'int8', 0, 1, default)
+
+
+class FeatureSchema:
+    """
+    Ordered feature list compiled into lookup tables and bound arrays.
+
+    vectorize() writes records straight into a float64 matrix in model column
+    order and checks every row against the schema with a handful of array
+    operations, so a bad row is reported in the returned errors instead of
+    raising.
+    """
+
+    def __init__(self, features, metadata_fields=METADATA_FIELDS):
+        self.features = tuple(features)
+        self.names = tuple(feature.name for feature in self.features)
+        self.index = {name: column for column, name in enumerate(self.names)}
+        self.metadata_fields = frozenset(metadata_fields)
+
+        self.low = np.array([feature.low for feature in self.features], dtype=np.float64)
+        self.high = np.array([feature.high for feature in self.features], dtype=np.float64)
+        # Required features start as NaN so a missing one shows up in the NaN check
+        self.template = np.array(
+            [np.nan if feature.default is None else feature.default for feature in self.features],
+            dtype=np.float64)
+        self.integer_columns = np.array(
+            [column for column, feature in enumerate(self.features) if feature.dtype in _INTEGER_DTYPES],
+            dtype=np.intp)
+
+    def __len__(self):
+        return len(self.features)
+
+    def allocate(self, n_rows):
+        """An empty matrix to reuse across vectorize() calls"""
+        return np.empty((n_rows, len(self.features)), dtype=np.float64)
+
+    def vectorize(self, rows, out=None):
+        """
+        Turn a list of record dicts into an (n_rows, n_features) float64 matrix.
+
+        out: optional preallocated matrix with at least len(rows) rows
+        Returns (X, valid, errors): valid is a boolean mask over rows and
+        errors maps the index of each rejected row to a message. Rejected rows
+        hold unspecified values in X.
+        """
+        n_rows = len(rows)
+        X = out[:n_rows] if out is not None else self.allocate(n_rows)
+        X[:] = self.template
+        errors = {}
+
+        index = self.index
+        metadata_fields = self.metadata_fields
+        for i, row in enumerate(rows):
+            if type(row) is not dict:
+                errors[i] = 'Record must be a JSON object'
+                continue
+            X_row = X[i]
+            for key, value in row.items():
+                column = index.get(key)
+                if column is None:
+                    if key not in metadata_fields and i not in errors:
+                        errors[i] = f'Unknown field: {key}'
+                elif type(value) in _NUMERIC_TYPES:
+                    X_row[column] = value
+                elif i not in errors:
+                    errors[i] = f'Invalid value for field: {key}'
+
+        self._check(X, errors)
+        valid = np.ones(n_rows, dtype=bool)
+        if errors:
+            valid[list(errors)] = False
+        return X, valid, errors
+
+    def vectorize_columns(self, columns, n_rows, out=None):
+        """
+        Like vectorize(), for column-oriented input such as a parsed CSV chunk.
+
+        columns: mapping of column name -> sequence of n_rows values (numbers
+        or numeric strings). Columns that are not features are ignored.
+        """
+        X = out[:n_rows] if out is not None else self.allocate(n_rows)
+        X[:] = self.template
+        errors = {}
+
+        for name, column in self.index.items():
+            if name not in columns:
+                continue
+            values = _to_float(columns[name])
+            bad = np.isnan(values)
+            if bad.any():
+                for i in np.flatnonzero(bad):
+                    errors.setdefault(int(i), f'Invalid value for field: {name}')
+            X[:, column] = values
+
+        self._check(X, errors)
+        valid = np.ones(n_rows, dtype=bool)
+        if errors:
+            valid[list(errors)] = False
+        return X, valid, errors
+
+    def _check(self, X, errors):
+        """Add an error for every row with a missing, out-of-range or non-integral value"""
+        bad = np.isnan(X)
+        missing_rows = bad.any(axis=1)
+        with np.errstate(invalid='ignore'):
+            bad |= (X < self.low) | (X > self.high)
+            if len(self.integer_columns):
+                integer_part = X[:, self.integer_columns]
+                bad[:, self.integer_columns] |= integer_part != np.floor(integer_part)
+        bad_rows = np.flatnonzero(bad.any(axis=1))
+        if not len(bad_rows):
+            return
+
+        # Messages are only built for the (few) rejected rows
+        for i in bad_rows:
+            i = int(i)
+            if i in errors:
+                continue
+            column = int(np.flatnonzero(bad[i])[0])
+            feature = self.features[column]
+            if missing_rows[i] and np.isnan(X[i, column]):
+                errors[i] = f'Missing required field: {feature.name}'
+            else:
+                errors[i] = (f'Value out of range for field: {feature.name} '
+                             f'(expected {feature.dtype} in [{feature.low}, {feature.high}])')
+
+    def validate(self, record):
+        """Error message for a single record, or None if it can be scored"""
+        return self.vectorize([record])[2].get(0)
+
+    def check_columns(self, names, source, ordered=True):
+        """
+        Raise ValueError unless names lists exactly this schema's features
+        (in the same order, unless ordered=False)
+        """
+        names = tuple(str(name) for name in names)
+        if names == self.names or (not ordered and sorted(names) == sorted(self.names)):
+            return
+        missing = [name for name in self.names if name not in names]
+        unexpected = [name for name in names if name not in self.index]
+        if missing or unexpected:
+            raise ValueError(f"{source} features do not match the schema "
+                             f"(missing: {missing}, unexpected: {unexpected})")
+        raise ValueError(f"{source} feature order does not match the schema: {list(names)}")
+
+    def to_dict(self):
+        return {'features': [feature.to_dict() for feature in self.features]}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls([Feature(**feature) for feature in data['features']])
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+
+def _to_float(values):
+    """Column of numbers or numeric strings as float64; anything unparseable becomes NaN"""
+    try:
+        return np.asarray(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        pass
+    parsed = np.empty(len(values), dtype=np.float64)
+    for i, value in enumerate(values):
+        try:
+            parsed[i] = float(value)
+        except (TypeError, ValueError):
+            parsed[i] = np.nan
+    return parsed
+
+
+# The 21 inputs of the heart attack model, in training column order
+SCHEMA = FeatureSchema([
+    Feature('age', 'int16', 0, 120),
+    flag('hypertension'),
+    flag('diabetes'),
+    Feature('cholesterol_level', 'float32', 50, 600),
+    flag('obesity'),
+    Feature('waist_circumference', 'float32', 30, 300),
+    Feature('sleep_hours', 'float32', 0, 24),
+    Feature('fasting_blood_sugar', 'float32', 40, 600),
+    Feature('triglycerides', 'float32', 0, 1500),
+    flag('previous_heart_disease'),
+    flag('medication_usage'),
+    flag('region_Urban'),
+    flag('income_level_middle'),
+    flag('smoking_status_Never'),
+    flag('smoking_status_Past'),
+    flag('smoking_status_Unknown'),
+    flag('physical_activity_Low'),
+    flag('stress_level_Moderate'),
+    flag('stress_level_moderate'),
+    flag('EKG_results_Normal'),
+    flag('gender_Male', default=None),
+])
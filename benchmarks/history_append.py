@@ -0,0 +1,116 @@
+"""
+Append latency of the prediction history log as it grows.
+
+Appends --entries history entries (shaped like the ones the frontend saves)
+to a fresh log in a temporary directory and reports p50/p99 append latency
+for each window of --window appends ending at the checkpoints below, so a
+flat profile shows appends stay O(1) in the size of the history. With
+--legacy N the old load-modify-rewrite history.json scheme is measured up
+to N entries for comparison.
+
+    python benchmarks/history_append.py --entries 200000 --legacy 5000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'frontend'))
+
+from history_store import HistoryStore  # noqa: E402
+
+SAMPLE_INPUT = {
+    'age': 55, 'hypertension': 1, 'diabetes': 0, 'cholesterol_level': 240, 'obesity': 0,
+    'waist_circumference': 95, 'sleep_hours': 6.5, 'fasting_blood_sugar': 105, 'triglycerides': 180,
+    'previous_heart_disease': 0, 'medication_usage': 1, 'region_Urban': 1, 'income_level_middle': 1,
+    'smoking_status_Never': 0, 'smoking_status_Past': 1, 'smoking_status_Unknown': 0,
+    'physical_activity_Low': 1, 'stress_level_Moderate': 1, 'stress_level_moderate': 1,
+    'EKG_results_Normal': 1, 'gender_Male': 1
+}
+SAMPLE_RESULT = {'prediction': 1, 'probability': 0.73, 'risk_level': 'High',
+                 'message': 'High risk of heart attack detected'}
+
+
+def make_entry():
+    return {'id': str(uuid.uuid4()), 'timestamp': '2025-10-05T12:48:41',
+            'input': SAMPLE_INPUT, 'result': SAMPLE_RESULT}
+
+
+def checkpoints(total):
+    points = [n for n in (1000, 10000, 50000, 100000, 200000, 500000, 1000000) if n < total]
+    return points + [total]
+
+
+def percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def measure(append, total, window):
+    """Yield (entries, p50, p99) in seconds for the window of appends ending at each checkpoint"""
+    marks = checkpoints(total)
+    latencies = []
+    for n in range(1, total + 1):
+        entry = make_entry()
+        started = time.perf_counter()
+        append(entry)
+        elapsed = time.perf_counter() - started
+        if n > marks[0] - window:
+            latencies.append(elapsed)
+        if n == marks[0]:
+            latencies.sort()
+            yield n, percentile(latencies, 0.5), percentile(latencies, 0.99)
+            latencies = []
+            marks.pop(0)
+
+
+def legacy_appender(path):
+    """The old scheme: load history.json, append, rewrite the whole file"""
+    def append(entry):
+        items = []
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                items = json.load(f)
+        items.append(entry)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(items, f, ensure_ascii=False, indent=2)
+    return append
+
+
+def report(name, rows):
+    print(f"\n{name}")
+    print(f"{'entries':>10}{'p50 us':>12}{'p99 us':>12}")
+    results = []
+    for n, p50, p99 in rows:
+        print(f"{n:>10}{p50 * 1e6:>12.1f}{p99 * 1e6:>12.1f}", flush=True)
+        results.append({'entries': n, 'p50_seconds': p50, 'p99_seconds': p99})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--entries', type=int, default=200000)
+    parser.add_argument('--window', type=int, default=1000, help='appends per measured window')
+    parser.add_argument('--legacy', type=int, default=0, help='also measure history.json rewrites up to N entries')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        store = HistoryStore(os.path.join(tmp, 'history.jsonl'))
+        results['jsonl'] = report('append-only log (history.jsonl)',
+                                  measure(store.append, args.entries, args.window))
+        if args.legacy:
+            append = legacy_appender(os.path.join(tmp, 'history.json'))
+            results['legacy'] = report('legacy rewrite (history.json)',
+                                       measure(append, args.legacy, min(args.window, args.legacy)))
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,306 @@
+"""
+Inference latency benchmarks, with JSON baselines and regression checks.
+
+Benchmarks (select with --only: a comma-separated list of names or name
+prefixes ending at a '.' or '_', e.g. service, threads, api.predict):
+
+  service.batch_<n>   PredictionService.predict (n=1) / predict_batch (n>1)
+                      on n distinct records, for each of --batch-sizes
+  api.predict         POST /api/predict through the Flask test client
+  api.batch_<n>       POST /api/predict/batch with n records (--api-batch)
+  threads_<k>         k threads calling PredictionService.predict at once,
+                      per-call latency, for each of --threads
+  cold_start.*        a fresh interpreter importing app (import) and running
+                      create_app with an eager model load (create_app), and
+                      both together (total)
+
+Every benchmark reports p50/p99/mean milliseconds per call and rows per
+second. The prediction cache is disabled (the model is measured, not the
+cache) unless --cache is given, and records are not written to MongoDB.
+
+    python benchmarks/inference.py --save baseline.json
+    python benchmarks/inference.py --compare baseline.json --threshold 0.2
+
+--compare exits with status 1 if any benchmark's p50 or p99 is more than
+--threshold (a fraction; --p99-threshold for p99 alone) slower than in the
+baseline. Differences under --min-delta-ms are ignored as noise. Baselines
+only compare meaningfully on the same machine, model and backend.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+
+# Applied before the backend is imported; PREDICTION_CACHE_SIZE is kept when --cache is given
+BENCHMARK_ENV = {
+    'RECORD_PREDICTIONS': '0',
+    'MODEL_LOAD_MODE': 'eager',
+    'MODEL_WATCH_INTERVAL': '0',
+    'DEFAULT_RATE_LIMIT': '0',
+    'MAX_IN_FLIGHT': '0',
+    'PREDICTION_CACHE_SIZE': '0',
+}
+
+COLD_START_CHILD = """
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+import app
+imported = time.perf_counter()
+app.create_app()
+created = time.perf_counter()
+print(json.dumps({'import': imported - start, 'create_app': created - imported}))
+"""
+
+
+def summarize(timings, rows=1):
+    """p50/p99/mean in ms per call and rows per second for a list of call durations (seconds)"""
+    timings = np.asarray(timings)
+    return {
+        'iterations': int(len(timings)),
+        'rows': rows,
+        'p50_ms': float(np.percentile(timings, 50) * 1000),
+        'p99_ms': float(np.percentile(timings, 99) * 1000),
+        'mean_ms': float(timings.mean() * 1000),
+        'rows_per_second': float(rows * len(timings) / timings.sum()) if timings.sum() > 0 else None,
+    }
+
+
+def time_calls(call, min_time, min_iterations, max_iterations, warmup=3):
+    """
+    Durations of call(i) for i = 0, 1, ..., after warmup untimed calls; runs
+    until min_time seconds and min_iterations calls, or max_iterations calls
+    """
+    for i in range(warmup):
+        call(i)
+    timings = []
+    deadline = time.perf_counter() + min_time
+    while len(timings) < max_iterations:
+        start = time.perf_counter()
+        call(len(timings))
+        timings.append(time.perf_counter() - start)
+        if len(timings) >= min_iterations and start >= deadline:
+            break
+    return timings
+
+
+def make_records(n_rows, seed=0):
+    """n_rows distinct, valid API records"""
+    from services.prediction_service import FEATURES, PLAUSIBLE_RANGES, synthetic_rows
+    integral = [feature not in PLAUSIBLE_RANGES or feature == 'age' for feature in FEATURES]
+    return [{feature: int(value) if whole else float(value)
+             for feature, value, whole in zip(FEATURES, row.tolist(), integral)}
+            for row in synthetic_rows(n_rows, seed)]
+
+
+def bench_service(service, sizes, pool, args):
+    for size in sizes:
+        # Step through the pool so consecutive calls score different records
+        def call(i, size=size):
+            start = (i * size) % (len(pool) - size + 1)
+            if size == 1:
+                service.predict(pool[start])
+            else:
+                service.predict_batch(pool[start:start + size])
+        yield f'service.batch_{size}', summarize(
+            time_calls(call, args.min_time, args.min_iterations, args.max_iterations), size)
+
+
+def bench_api(client, pool, batch_size, args, selected):
+    def predict(i):
+        response = client.post('/api/predict', json=pool[i % len(pool)])
+        if response.status_code != 200:
+            raise RuntimeError(f"/api/predict returned {response.status_code}: {response.get_data(as_text=True)}")
+    if selected('api.predict'):
+        yield 'api.predict', summarize(time_calls(predict, args.min_time, args.min_iterations, args.max_iterations))
+
+    def predict_batch(i):
+        start = (i * batch_size) % (len(pool) - batch_size + 1)
+        response = client.post('/api/predict/batch', json={'records': pool[start:start + batch_size]})
+        if response.status_code != 200:
+            raise RuntimeError(f"/api/predict/batch returned {response.status_code}: {response.get_data(as_text=True)}")
+    if selected(f'api.batch_{batch_size}'):
+        yield f'api.batch_{batch_size}', summarize(
+            time_calls(predict_batch, args.min_time, args.min_iterations, args.max_iterations), batch_size)
+
+
+def bench_threads(service, thread_counts, pool, args):
+    for n_threads in thread_counts:
+        timings = [[] for _ in range(n_threads)]
+        barrier = threading.Barrier(n_threads)
+        errors = []
+
+        def worker(index):
+            try:
+                barrier.wait()
+                timings[index] = time_calls(
+                    lambda i: service.predict(pool[(index * 7919 + i) % len(pool)]),
+                    args.min_time, args.min_iterations, args.max_iterations)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker, args=(index,)) for index in range(n_threads)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - start
+        if errors:
+            raise errors[0]
+
+        calls = [duration for per_thread in timings for duration in per_thread]
+        result = summarize(calls)
+        # Aggregate throughput of all threads, not the sum of per-call rates
+        result['rows_per_second'] = len(calls) / wall
+        result['threads'] = n_threads
+        yield f'threads_{n_threads}', result
+
+
+def bench_cold_start(runs, env):
+    samples = {'import': [], 'create_app': [], 'total': []}
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', COLD_START_CHILD, BACKEND_DIR], env=env,
+                                check=True, capture_output=True, text=True).stdout
+        phases = json.loads(output.strip().splitlines()[-1])
+        samples['import'].append(phases['import'])
+        samples['create_app'].append(phases['create_app'])
+        samples['total'].append(phases['import'] + phases['create_app'])
+    for phase, timings in samples.items():
+        yield f'cold_start.{phase}', summarize(timings)
+
+
+def run(args):
+    """Run the selected benchmarks; returns the results document"""
+    env = dict(os.environ, **BENCHMARK_ENV)
+    if args.cache:
+        env.pop('PREDICTION_CACHE_SIZE')
+        if 'PREDICTION_CACHE_SIZE' in os.environ:
+            env['PREDICTION_CACHE_SIZE'] = os.environ['PREDICTION_CACHE_SIZE']
+    if args.backend:
+        env['PREDICTION_BACKEND'] = args.backend
+    # Config reads the environment when it is first imported
+    os.environ.update(env)
+    sys.path.insert(0, BACKEND_DIR)
+    from app import create_app
+    from routes.prediction_routes import prediction_service
+
+    def selected(name):
+        return not args.only or any(
+            name == prefix or (name.startswith(prefix) and name[len(prefix)] in '._') for prefix in args.only)
+
+    app = create_app()
+    if not prediction_service.ready:
+        raise SystemExit(f"Model failed to load: {prediction_service.startup_error}")
+    pool = make_records(max(args.batch_sizes + [args.api_batch, args.pool]), args.seed)
+    results = {}
+
+    def record(benchmarks):
+        for name, result in benchmarks:
+            results[name] = result
+            print(f"  {name:<24}p50 {result['p50_ms']:>9.3f} ms   p99 {result['p99_ms']:>9.3f} ms   "
+                  f"{result['rows_per_second']:>12,.0f} rows/s", flush=True)
+
+    sizes = [size for size in args.batch_sizes if selected(f'service.batch_{size}')]
+    record(bench_service(prediction_service, sizes, pool, args))
+    record(bench_api(app.test_client(), pool, args.api_batch, args, selected))
+    counts = [count for count in args.threads if selected(f'threads_{count}')]
+    record(bench_threads(prediction_service, counts, pool, args))
+    if selected('cold_start') and args.cold_runs:
+        record(bench_cold_start(args.cold_runs, env))
+
+    import sklearn
+    return {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'environment': {'python': platform.python_version(), 'numpy': np.__version__,
+                        'sklearn': sklearn.__version__, 'platform': platform.platform(), 'cpus': os.cpu_count(),
+                        'backend': prediction_service.backend, 'model_version': prediction_service.model_version,
+                        'cache': args.cache},
+        'results': results,
+    }
+
+
+def compare(current, baseline, threshold, p99_threshold, min_delta_ms):
+    """Print current against baseline; returns the list of regressions"""
+    regressions = []
+    print(f"\n{'benchmark':<24}{'p50 base':>10}{'p50 now':>10}{'change':>9}{'p99 base':>11}{'p99 now':>10}{'change':>9}")
+    for name, result in current['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            print(f"{name:<24}{'(new)':>10}")
+            continue
+        line = f"{name:<24}"
+        for stat, limit in (('p50_ms', threshold), ('p99_ms', p99_threshold)):
+            change = result[stat] / base[stat] - 1 if base[stat] > 0 else 0.0
+            regressed = change > limit and result[stat] - base[stat] > min_delta_ms
+            if regressed:
+                regressions.append((name, stat, base[stat], result[stat], change))
+            line += f"{base[stat]:>10.3f}{result[stat]:>10.3f}{change:>+8.0%}{'!' if regressed else ' '}"
+        print(line)
+    for name in baseline['results']:
+        if name not in current['results']:
+            print(f"{name:<24}{'(not run)':>10}")
+    if baseline.get('environment', {}).get('model_version') != current['environment']['model_version']:
+        print("Note: the baseline was recorded with a different model version")
+    return regressions
+
+
+def _int_list(text):
+    return [int(value) for value in text.split(',') if value]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--only', type=lambda text: [prefix for prefix in text.split(',') if prefix],
+                        help='comma-separated benchmark names or prefixes to run (default: all)')
+    parser.add_argument('--backend', choices=('sklearn', 'native'), help='prediction backend (default: PREDICTION_BACKEND)')
+    parser.add_argument('--cache', action='store_true', help='keep the prediction cache enabled')
+    parser.add_argument('--batch-sizes', type=_int_list, default=[1, 10, 100, 1000, 10000])
+    parser.add_argument('--api-batch', type=int, default=100, help='records per api.batch request')
+    parser.add_argument('--threads', type=_int_list, default=[1, 4, 16])
+    parser.add_argument('--cold-runs', type=int, default=5, help='fresh interpreters for cold_start (0: skip)')
+    parser.add_argument('--pool', type=int, default=20000, help='distinct records to draw requests from')
+    parser.add_argument('--min-time', type=float, default=1.0, help='seconds to run each benchmark for at least')
+    parser.add_argument('--min-iterations', type=int, default=20)
+    parser.add_argument('--max-iterations', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save', help='write the results (a new baseline) to this file')
+    parser.add_argument('--compare', help='baseline file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed fractional slowdown (default 0.25)')
+    parser.add_argument('--p99-threshold', type=float, help='allowed p99 slowdown (default: --threshold)')
+    parser.add_argument('--min-delta-ms', type=float, default=0.05, help='ignore slowdowns smaller than this')
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    current = run(args)
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(current, f, indent=2)
+        print(f"Results written to {args.save}")
+
+    if baseline is not None:
+        p99_threshold = args.threshold if args.p99_threshold is None else args.p99_threshold
+        regressions = compare(current, baseline, args.threshold, p99_threshold, args.min_delta_ms)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s):")
+            for name, stat, before, after, change in regressions:
+                print(f"  {name} {stat}: {before:.3f} -> {after:.3f} ({change:+.0%})")
+            return 1
+        print("\nNo regressions")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,65 @@
+import os
+import threading
+
+DEFAULT_URI = 'mongodb://localhost:27017/cardio_care'
+DEFAULT_DATABASE = 'cardio_care'
+
+_client = None
+_client_pid = None
+_lock = threading.Lock()
+
+
+def _create_client(uri, **options):
+    # mongomock:// URIs give an in-memory stand-in for tests and local runs
+    if uri.startswith('mongomock://'):
+        import mongomock
+        return mongomock.MongoClient('mongodb://' + uri[len('mongomock://'):])
+
+    from pymongo import MongoClient
+    options.setdefault('maxPoolSize', int(os.environ.get('MONGO_MAX_POOL_SIZE') or 50))
+    options.setdefault('minPoolSize', int(os.environ.get('MONGO_MIN_POOL_SIZE') or 0))
+    options.setdefault('serverSelectionTimeoutMS', int(os.environ.get('MONGO_TIMEOUT_MS') or 5000))
+    # Connects lazily: creating the client does not wait for the server
+    return MongoClient(uri, **options)
+
+
+def get_client(uri=None, **options):
+    """
+    The process-wide MongoClient.
+
+    One client holds one connection pool shared by every thread of the
+    process, so it is created once and reused. pymongo clients must not be
+    used across fork, so a forked worker (e.g. gunicorn with preload)
+    transparently gets its own client on first use.
+    """
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is not None and _client_pid == pid:
+        return _client
+    with _lock:
+        if _client is None or _client_pid != pid:
+            _client = _create_client(uri or os.environ.get('MONGO_URI') or DEFAULT_URI, **options)
+            _client_pid = pid
+        return _client
+
+
+def set_client(client):
+    """Use this client (e.g. a mongomock.MongoClient) instead of connecting to MONGO_URI"""
+    global _client, _client_pid
+    with _lock:
+        _client = client
+        _client_pid = os.getpid()
+
+
+def get_database(uri=None):
+    """The database named in the URI (cardio_care if it names none)"""
+    return get_client(uri).get_default_database(DEFAULT_DATABASE)
+
+
+def close_client():
+    global _client, _client_pid
+    with _lock:
+        if _client is not None and _client_pid == os.getpid():
+            _client.close()
+        _client = None
+        _client_pid = None
@@ -0,0 +1,49 @@
+"""
+Create the collections' indexes (idempotent).
+
+    python database/init_db.py            # uses MONGO_URI
+
+Record listings are sorted newest first with _id as a tie-breaker, so every
+index ends in (timestamp, _id). A filtered, keyset-paginated query then
+reads exactly one page of index entries whatever page it is on.
+"""
+import os
+import sys
+
+from pymongo import ASCENDING, DESCENDING
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.connection import get_database
+
+INDEXES = {
+    'prediction_records': [
+        # A patient's records by date
+        ('user_timestamp', [('user_id', ASCENDING), ('timestamp', DESCENDING), ('_id', DESCENDING)]),
+        # High/low risk records by date
+        ('risk_timestamp', [('risk_level', ASCENDING), ('timestamp', DESCENDING), ('_id', DESCENDING)]),
+        # Unfiltered listings and date ranges
+        ('timestamp', [('timestamp', DESCENDING), ('_id', DESCENDING)]),
+    ],
+    'api_keys': [
+        ('key_hash', [('key_hash', ASCENDING)], {'unique': True}),
+        ('name', [('name', ASCENDING)], {'unique': True}),
+    ],
+}
+
+
+def create_indexes(db=None):
+    """Create every index in INDEXES; returns the names per collection"""
+    db = db if db is not None else get_database()
+    created = {}
+    for collection, indexes in INDEXES.items():
+        created[collection] = [
+            db[collection].create_index(keys, name=name, **(options[0] if options else {}))
+            for name, keys, *options in indexes
+        ]
+    return created
+
+
+if __name__ == '__main__':
+    for collection, names in create_indexes().items():
+        print(f"{collection}: {', '.join(names)}")
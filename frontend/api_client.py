@@ -0,0 +1,187 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+
+# Statuses that mean the request was turned away before being processed
+# (admission control, overloaded or restarting backend behind the load balancer)
+RETRY_STATUSES = frozenset([429, 502, 503, 504])
+
+
+def _not_sent(error):
+    """True if the request failed before reaching the server (safe to resend)"""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, (NewConnectionError, ConnectTimeoutError))
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Raised without contacting the backend while the circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    Stops calling a backend that keeps failing. After failure_threshold
+    consecutive failures the circuit opens and calls fail fast for
+    reset_timeout seconds; then one trial call is let through (half-open)
+    and its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class BackendClient:
+    """
+    Shared client for the CardioCare API.
+
+    One keep-alive Session with a sized connection pool is reused for every
+    call, so requests skip TCP/TLS setup. Calls that fail in a way that is
+    safe to repeat (the connection could not be made, or the backend answered
+    429/502/503/504) are retried with jittered exponential backoff, honouring
+    Retry-After. Scoring is deterministic, so scoring calls are also retried
+    after read timeouts (at worst the backend stores a duplicate record). A
+    circuit breaker stops hammering a backend that
+    keeps failing.
+
+    Thread-safe; meant to be created once per process (st.cache_resource).
+    """
+
+    def __init__(self, base_url, api_key=None, pool_size=10, connect_timeout=3.05, read_timeout=10.0,
+                 retries=3, backoff=0.2, max_backoff=2.0, breaker=None):
+        self.base_url = base_url.rstrip("/")
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.breaker = breaker or CircuitBreaker()
+
+        self.session = requests.Session()
+        # Retries are handled here, with backoff and the breaker, not by urllib3
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if api_key:
+            self.session.headers["X-API-Key"] = api_key
+
+    def _delay(self, attempt, response=None):
+        """Full-jitter backoff, or the server's Retry-After when it sent one"""
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after:
+                try:
+                    return min(self.max_backoff, float(retry_after)) * random.uniform(0.8, 1.2)
+                except ValueError:
+                    pass
+        return random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt)))
+
+    def request(self, method, path, idempotent=None, **kwargs):
+        """
+        Send a request and return the final Response (which may still be an
+        error status). idempotent: whether a read timeout may be retried
+        (default: GET/HEAD only).
+        """
+        if idempotent is None:
+            idempotent = method.upper() in ("GET", "HEAD")
+        kwargs.setdefault("timeout", self.timeout)
+        url = f"{self.base_url}/{path.lstrip('/')}"
+
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                raise CircuitOpenError("Backend unavailable (circuit open); try again shortly")
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                self.breaker.record_failure()
+                # A failed connect never reached the backend; anything else is only safe if idempotent
+                if not (idempotent or _not_sent(e)) or attempt >= self.retries:
+                    raise
+                time.sleep(self._delay(attempt))
+                attempt += 1
+                continue
+
+            if response.status_code >= 500:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            if response.status_code in RETRY_STATUSES and attempt < self.retries:
+                time.sleep(self._delay(attempt, response))
+                attempt += 1
+                continue
+            return response
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def predict(self, record):
+        """POST /predict, retried like an idempotent call"""
+        return self.post("/predict", json=record, idempotent=True)
+
+    def whatif(self, record, grids):
+        """POST /predict/whatif: risk curves for record as each feature in grids varies"""
+        return self.post("/predict/whatif", json={"record": record, "grids": grids}, idempotent=True)
+
+    def predict_many(self, records, max_workers=None):
+        """
+        Score many records concurrently over the shared pool (e.g. several
+        scenarios on one page). Returns a Response or the raised exception per
+        record, in input order.
+        """
+        def call(record):
+            try:
+                return self.predict(record)
+            except requests.exceptions.RequestException as e:
+                return e
+
+        workers = min(max_workers or self.pool_size, self.pool_size, max(len(records), 1))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(call, records))
+
+    def close(self):
+        self.session.close()
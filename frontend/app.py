@@ -2,9 +2,13 @@ import streamlit as st
 import requests
 import json
 import os
+import pandas as pd
 import uuid
 from datetime import datetime
 
+from api_client import BackendClient, CircuitOpenError
+from history_store import HistoryStore
+
 # Configure page
 st.set_page_config(
     page_title="CardioCare - Heart Attack Prediction",
@@ -14,35 +18,96 @@ st.set_page_config(
 
 # Backend API URL
 API_URL = st.secrets.get("API_URL", os.getenv("API_URL", "http://localhost:5000/api"))
+API_KEY = st.secrets.get("API_KEY", os.getenv("API_KEY"))
+
+@st.cache_resource
+def _backend_client():
+    # One pooled keep-alive client per process, shared by every session and rerun
+    return BackendClient(
+        API_URL,
+        api_key=API_KEY,
+        pool_size=int(os.getenv("API_POOL_SIZE", "10")),
+        read_timeout=float(os.getenv("API_TIMEOUT", "10"))
+    )
+
+# Local history storage: an append-only JSON-lines log shared by all sessions
+# (the old history.json is migrated into it on first use)
+HISTORY_PATH = os.path.join(os.path.dirname(__file__), "history.jsonl")
+LEGACY_HISTORY_PATH = os.path.join(os.path.dirname(__file__), "history.json")
+
+@st.cache_resource
+def _history_store():
+    return HistoryStore(HISTORY_PATH, legacy_path=LEGACY_HISTORY_PATH)
+
+HISTORY_PAGE_SIZE = 20
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def _history_page(version, risk, timestamp_prefix, page):
+    # version changes whenever the log does, so cached pages never go stale
+    return _history_store().page(page, HISTORY_PAGE_SIZE, risk=risk, timestamp_prefix=timestamp_prefix)
 
-# Local history storage
-HISTORY_PATH = os.path.join(os.path.dirname(__file__), "history.json")
-
-def _load_history():
-    if not os.path.exists(HISTORY_PATH):
-        return []
+def _append_history(entry):
     try:
-        with open(HISTORY_PATH, "r", encoding="utf-8") as f:
-            return json.load(f)
+        _history_store().append(entry)
     except Exception:
-        return []
+        pass
 
-def _save_history(history_items):
+def _delete_history(entry_id):
     try:
-        with open(HISTORY_PATH, "w", encoding="utf-8") as f:
-            json.dump(history_items, f, ensure_ascii=False, indent=2)
+        _history_store().delete(entry_id)
     except Exception:
         pass
 
-def _append_history(entry):
-    history_items = _load_history()
-    history_items.append(entry)
-    _save_history(history_items)
+# Measurements offered on the results page's what-if curves
+WHATIF_FEATURES = {
+    "cholesterol_level": "Cholesterol Level (mg/dL)",
+    "triglycerides": "Triglycerides (mg/dL)",
+    "sleep_hours": "Sleep Hours per Night",
+    "waist_circumference": "Waist Circumference (cm)",
+    "fasting_blood_sugar": "Fasting Blood Sugar (mg/dL)",
+    "age": "Age",
+}
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def _whatif_curves(record_json, features):
+    """Risk curves for one patient, all features scored by the backend in one request"""
+    response = _backend_client().whatif(json.loads(record_json), list(features))
+    response.raise_for_status()
+    return response.json()
+
+
+def show_whatif(data):
+    st.subheader("What If?")
+    st.caption("How the estimated risk changes when one measurement changes and everything else stays the same.")
+    features = st.multiselect(
+        "Measurements",
+        list(WHATIF_FEATURES),
+        default=["cholesterol_level", "triglycerides", "sleep_hours", "waist_circumference"],
+        format_func=WHATIF_FEATURES.get
+    )
+    if not features:
+        return
+
+    try:
+        with st.spinner("Computing risk curves..."):
+            curves = _whatif_curves(json.dumps(data, sort_keys=True), tuple(features))
+    except CircuitOpenError:
+        st.error("The backend is temporarily unavailable. Please try again in a few seconds.")
+        return
+    except requests.exceptions.RequestException as e:
+        st.error("Could not compute the risk curves.")
+        st.caption(str(e))
+        return
+
+    columns = st.columns(2)
+    for i, curve in enumerate(curves["curves"]):
+        label = WHATIF_FEATURES.get(curve["feature"], curve["feature"])
+        chart = pd.DataFrame({label: curve["values"], "Risk probability": curve["probability"]})
+        with columns[i % 2]:
+            st.markdown(f"**{label}** (current: {curve['current']:g})")
+            st.line_chart(chart, x=label, y="Risk probability", height=220)
 
-def _delete_history(entry_id):
-    history_items = _load_history()
-    new_items = [h for h in history_items if h.get("id") != entry_id]
-    _save_history(new_items)
 
 def main():
     st.title("CardioCare - Heart Attack Prediction System")
@@ -152,7 +217,7 @@ def show_prediction():
             with st.spinner("Analyzing your health data..."):
                 # Make API call
                 try:
-                    response = requests.post(f"{API_URL}/predict", json=data, timeout=10)
+                    response = _backend_client().predict(data)
 
                     if response.status_code == 200:
                         result = response.json()
@@ -192,6 +257,8 @@ def show_prediction():
                         except Exception:
                             pass
 
+                except CircuitOpenError:
+                    st.error("The backend is temporarily unavailable. Please try again in a few seconds.")
                 except requests.exceptions.Timeout:
                     st.error("Request timed out. Please confirm the backend is running.")
                 except requests.exceptions.ConnectionError:
@@ -250,24 +317,37 @@ def show_results():
             st.markdown(f"**Stress Level**: {stress_label}")
             st.markdown(f"**Sleep Hours**: {data['sleep_hours']}")
 
+        st.markdown("---")
+        show_whatif(data)
+
 def show_history():
     st.header("Prediction History")
 
-    history_items = _load_history()
-
-    if not history_items:
+    try:
+        version = _history_store().refresh()
+    except Exception:
         st.info("No predictions saved yet.")
         return
 
-    # Sort by timestamp desc
-    def _parse_ts(ts):
-        try:
-            return datetime.fromisoformat(ts)
-        except Exception:
-            return datetime.min
-    history_items_sorted = sorted(history_items, key=lambda h: _parse_ts(h.get("timestamp", "")), reverse=True)
+    # Filters run against the sorted index, so a rerun costs the same for any history size
+    col_search, col_risk = st.columns([3, 1])
+    with col_search:
+        timestamp_prefix = st.text_input("Search by date", placeholder="e.g. 2025-10 or 2025-10-05T12").strip()
+    with col_risk:
+        risk_label = st.selectbox("Risk level", ["All", "HIGH", "LOW"])
+    risk = {"HIGH": "High", "LOW": "Low"}.get(risk_label)
+
+    _, total = _history_page(version, risk, timestamp_prefix, 0)
+    if not total:
+        st.info("No predictions saved yet." if not timestamp_prefix and risk is None else "No matching predictions.")
+        return
+
+    page_count = (total + HISTORY_PAGE_SIZE - 1) // HISTORY_PAGE_SIZE
+    page = st.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count, value=1, step=1)
+    history_items_sorted, total = _history_page(version, risk, timestamp_prefix, int(page) - 1)
+    st.caption(f"{total} saved predictions")
 
-    # Build a concise label for each item
+    # Build a concise label for each item on this page (newest first)
     labels = []
     for item in history_items_sorted:
         ts = item.get("timestamp", "")
@@ -0,0 +1,306 @@
+import bisect
+import json
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class _FileLock:
+    """
+    Inter-process lock on a separate lock file (flock on POSIX, msvcrt on
+    Windows, where every lock is exclusive). A separate file keeps the lock
+    valid while compaction replaces the log itself.
+    """
+
+    def __init__(self, path, shared=False):
+        self.path = path
+        self.shared = shared
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.path, "a+b")
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_SH if self.shared else fcntl.LOCK_EX)
+        else:
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+        return self
+
+    def __exit__(self, *exc_info):
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            else:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self._file.close()
+            self._file = None
+
+
+class HistoryStore:
+    """
+    Prediction history as an append-only JSON-lines log.
+
+    Every saved prediction is one line appended under a file lock, so an
+    append costs the same at 10 entries or 100k and concurrent Streamlit
+    sessions cannot overwrite each other's entries. Deleting appends a
+    tombstone line ({"deleted": id}); once tombstones make up a large share
+    of the log it is compacted in a background thread (rewritten without
+    deleted entries and atomically swapped in).
+
+    An existing history.json (the old whole-file format) is migrated into
+    the log the first time the store is opened. The old file is left in
+    place; a <name>.migrated marker records that it has been imported.
+
+    For browsing, refresh() keeps an in-memory index of (timestamp, offset)
+    keys sorted by timestamp, overall and per risk level. It only parses the
+    lines appended since the previous call (the whole log only after a
+    compaction), and page() reads just the requested entries from their
+    offsets, so serving a page does not depend on the size of the history.
+    """
+
+    TOMBSTONE_KEY = "deleted"
+
+    def __init__(self, path, legacy_path=None, compact_min_tombstones=100, compact_ratio=0.25):
+        self.path = path
+        self.lock_path = path + ".lock"
+        self.compact_min_tombstones = compact_min_tombstones
+        self.compact_ratio = compact_ratio
+        self._compactor = None
+        self._index_lock = threading.RLock()
+        self._reset_index(None)
+        if legacy_path:
+            self.migrate(legacy_path)
+
+    def _lock(self, shared=False):
+        return _FileLock(self.lock_path, shared)
+
+    def _append_lines(self, lines):
+        data = "".join(json.dumps(line, ensure_ascii=False, separators=(",", ":")) + "\n" for line in lines)
+        with self._lock():
+            with open(self.path, "a+b") as f:
+                # A writer that crashed mid-line leaves no trailing newline;
+                # start on a fresh line so only that torn line is lost
+                if f.seek(0, os.SEEK_END) > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        data = "\n" + data
+                f.write(data.encode("utf-8"))
+
+    def append(self, entry):
+        """Save one history entry (a dict with an "id")"""
+        self._append_lines([entry])
+
+    def delete(self, entry_id):
+        """Mark an entry as deleted; the log is compacted later in the background"""
+        self._append_lines([{self.TOMBSTONE_KEY: entry_id}])
+        # Updates the tombstone count and starts a compaction if due
+        self.refresh()
+
+    def _read(self):
+        """(live entries in append order, tombstone count); call with a lock held"""
+        entries = {}
+        tombstones = 0
+        try:
+            f = open(self.path, "r", encoding="utf-8")
+        except FileNotFoundError:
+            return [], 0
+        with f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # torn line from a crashed writer
+                if not isinstance(record, dict):
+                    continue
+                if self.TOMBSTONE_KEY in record and len(record) == 1:
+                    entries.pop(record[self.TOMBSTONE_KEY], None)
+                    tombstones += 1
+                else:
+                    entries[record.get("id")] = record
+        return list(entries.values()), tombstones
+
+    def load(self):
+        """All live entries, oldest first"""
+        with self._lock(shared=True):
+            return self._read()[0]
+
+    def _reset_index(self, inode):
+        self._index_inode = inode
+        self._index_offset = 0
+        self._by_id = {}
+        # Sorted (timestamp, offset, length) keys: all entries and per risk level
+        self._sorted = {None: [], "High": [], "Low": []}
+        self._pending = {}
+        self._live = 0
+        self._tombstones = 0
+
+    def _index_record(self, line, offset):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            return
+        if not isinstance(record, dict):
+            return
+        if self.TOMBSTONE_KEY in record and len(record) == 1:
+            self._tombstones += 1
+            self._unindex(record[self.TOMBSTONE_KEY])
+            return
+
+        entry_id = record.get("id")
+        self._unindex(entry_id)
+        # ISO timestamps sort chronologically as strings, no parsing needed
+        timestamp = record.get("timestamp")
+        timestamp = timestamp if isinstance(timestamp, str) else ""
+        result = record.get("result")
+        risk = "High" if isinstance(result, dict) and result.get("prediction") == 1 else "Low"
+        key = (timestamp, offset, len(line))
+        self._by_id[entry_id] = (key, risk)
+        self._pending[key] = risk
+
+    def _unindex(self, entry_id):
+        indexed = self._by_id.pop(entry_id, None)
+        if indexed is None:
+            return
+        key, risk = indexed
+        if self._pending.pop(key, None) is not None:
+            return
+        for keys in (self._sorted[None], self._sorted[risk]):
+            del keys[bisect.bisect_left(keys, key)]
+
+    def _merge_pending(self):
+        """Add the keys read by this refresh to the sorted lists"""
+        pending, self._pending = self._pending, {}
+        for risk, keys in self._sorted.items():
+            new_keys = [key for key, key_risk in pending.items() if risk is None or key_risk == risk]
+            if len(new_keys) > 64:
+                # One sort (mostly a merge of two sorted runs) beats many inserts
+                keys.extend(new_keys)
+                keys.sort()
+            else:
+                for key in new_keys:
+                    bisect.insort(keys, key)
+
+    def _refresh_index(self):
+        """Catch the index up with the log; call with the index lock and a file lock held"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            self._reset_index(None)
+            return
+        if stat.st_ino != self._index_inode or stat.st_size < self._index_offset:
+            # First read, or the log was compacted (replaced) since
+            self._reset_index(stat.st_ino)
+        if stat.st_size == self._index_offset:
+            return
+
+        offset = self._index_offset
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # unterminated tail of a crashed writer; the next append terminates it
+                self._index_record(line, offset)
+                offset += len(line)
+        self._merge_pending()
+        self._index_offset = offset
+        self._live = len(self._by_id)
+
+    def refresh(self):
+        """Update the index and return a version that changes whenever the history does"""
+        with self._index_lock:
+            with self._lock(shared=True):
+                self._refresh_index()
+            version = (self._index_inode, self._index_offset)
+        self.maybe_compact()
+        return version
+
+    @staticmethod
+    def _prefix_range(keys, prefix):
+        if not prefix:
+            return 0, len(keys)
+        return bisect.bisect_left(keys, (prefix,)), bisect.bisect_left(keys, (prefix + "\uffff",))
+
+    def page(self, page, page_size, risk=None, timestamp_prefix=""):
+        """
+        One page of entries, newest first, and the number of matching entries.
+
+        page: 0-based page number
+        risk: "High" or "Low" to filter by risk level (None: all)
+        timestamp_prefix: only entries whose timestamp starts with it (e.g. "2025-10")
+        """
+        with self._index_lock:
+            with self._lock(shared=True):
+                self._refresh_index()
+                keys = self._sorted[risk]
+                low, high = self._prefix_range(keys, timestamp_prefix)
+                end = max(low, high - page * page_size)
+                selected = keys[max(low, end - page_size):end]
+
+                entries = []
+                if selected:
+                    with open(self.path, "rb") as f:
+                        for _, offset, length in reversed(selected):
+                            f.seek(offset)
+                            entries.append(json.loads(f.read(length)))
+        self.maybe_compact()
+        return entries, high - low
+
+    def _needs_compaction(self):
+        return (self._tombstones >= self.compact_min_tombstones
+                and self._tombstones >= self.compact_ratio * max(self._live, 1))
+
+    def maybe_compact(self):
+        """Start a background compaction if tombstones have piled up"""
+        if not self._needs_compaction():
+            return
+        if self._compactor is not None and self._compactor.is_alive():
+            return
+        self._compactor = threading.Thread(target=self.compact, name="history-compaction", daemon=True)
+        self._compactor.start()
+
+    def compact(self):
+        """Rewrite the log with only the live entries"""
+        tmp_path = self.path + ".tmp"
+        with self._lock():
+            entries, tombstones = self._read()
+            if not tombstones:
+                return
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for entry in entries:
+                    f.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+
+    def migrate(self, legacy_path):
+        """One-time import of a history.json list, recorded in a <name>.migrated marker file"""
+        marker_path = legacy_path + ".migrated"
+        if not os.path.exists(legacy_path) or os.path.exists(marker_path):
+            return
+        with self._lock():
+            if os.path.exists(marker_path):
+                return  # another process migrated it first
+            try:
+                with open(legacy_path, "r", encoding="utf-8") as f:
+                    items = json.load(f)
+            except ValueError:
+                items = []
+            if not isinstance(items, list):
+                items = []
+            entries = [item for item in items if isinstance(item, dict)]
+            with open(self.path, "a", encoding="utf-8") as f:
+                for entry in entries:
+                    f.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            with open(marker_path, "w", encoding="utf-8") as f:
+                json.dump({"source": os.path.basename(legacy_path), "entries": len(entries)}, f)
+                f.flush()
+                os.fsync(f.fileno())
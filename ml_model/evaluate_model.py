@@ -0,0 +1,108 @@
+"""
+Evaluate a published model version the way the backend serves it.
+
+    python ml_model/evaluate_model.py                        # active version, held-out split
+    python ml_model/evaluate_model.py --version 20250101-120000 --all
+    python ml_model/evaluate_model.py --data extract.csv --raw --all --json
+
+The dataset comes from the columnar cache (see preprocessing.py), so only
+the first evaluation of a file pays for parsing it. By default the same
+held-out split as train_model.py is used (same --test-size and --seed);
+--all scores every row instead.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from sklearn.metrics import (accuracy_score, classification_report, confusion_matrix, f1_score,
+                             precision_score, recall_score, roc_auc_score)
+from sklearn.model_selection import train_test_split
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from preprocessing import DEFAULT_CACHE_DIR, DEFAULT_CHUNK_ROWS, DEFAULT_DATA_PATH, load_dataset
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from services.model_store import active_version, versions_dir
+from services.prediction_service import PredictionService
+
+METADATA_FILENAME = 'metadata.json'
+
+
+def evaluate(service, X, y):
+    """Metrics for the service's model on (X, y), scored as one batch"""
+    start = time.perf_counter()
+    predictions, probabilities = service.score_matrix(X)
+    seconds = time.perf_counter() - start
+    return {
+        'rows': int(len(y)),
+        'accuracy': accuracy_score(y, predictions),
+        'precision': precision_score(y, predictions, zero_division=0),
+        'recall': recall_score(y, predictions, zero_division=0),
+        'f1': f1_score(y, predictions, zero_division=0),
+        'roc_auc': roc_auc_score(y, probabilities) if len(np.unique(y)) > 1 else None,
+        'confusion_matrix': confusion_matrix(y, predictions, labels=[0, 1]).tolist(),
+        'rows_per_second': len(y) / seconds if seconds > 0 else None,
+    }, predictions
+
+
+def training_metrics(version):
+    """Test metrics recorded by train_model.py for version, if any"""
+    try:
+        with open(os.path.join(versions_dir(), version, METADATA_FILENAME), 'r', encoding='utf-8') as f:
+            return json.load(f).get('test_metrics')
+    except (OSError, ValueError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--version', help='model version (default: the active one)')
+    parser.add_argument('--backend', choices=PredictionService.BACKENDS, help='prediction backend')
+    parser.add_argument('--data', default=DEFAULT_DATA_PATH, help='dataset CSV')
+    parser.add_argument('--raw', action='store_true', help='--data is a raw extract to clean and encode')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument('--all', action='store_true', help='score every row, not just the held-out split')
+    parser.add_argument('--test-size', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', action='store_true', help='print the metrics as JSON')
+    args = parser.parse_args(argv)
+
+    X, y, data_key = load_dataset(args.data, args.cache_dir, raw=args.raw, chunk_rows=args.chunk_rows)
+    if not args.all:
+        _, X, _, y = train_test_split(X, y, test_size=args.test_size, random_state=args.seed, stratify=y)
+
+    version = args.version or active_version()
+    service = PredictionService(backend=args.backend, load=False)
+    service.reload(version)
+
+    metrics, predictions = evaluate(service, X, y)
+    report = {
+        'version': service.model_version,
+        'data': {'path': os.path.abspath(args.data), 'key': data_key, 'split': 'all' if args.all else 'test'},
+        'metrics': metrics,
+        'training_test_metrics': training_metrics(version) if version else None,
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return report
+
+    print(f"Model version {report['version']} on {metrics['rows']} rows ({report['data']['split']})")
+    for name in ('accuracy', 'precision', 'recall', 'f1', 'roc_auc'):
+        if metrics[name] is not None:
+            print(f"  {name:<10} {metrics[name]:.4f}")
+    print(f"  confusion  {metrics['confusion_matrix']}")
+    print("Classification Report:")
+    print(classification_report(y, predictions, zero_division=0))
+    if report['training_test_metrics']:
+        recorded = report['training_test_metrics']
+        print("Recorded at training: " + ", ".join(f"{name} {value:.4f}" for name, value in recorded.items()))
+    return report
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,526 @@
+"""
+Turn a dataset CSV into model-ready columns, streaming it in chunks.
+
+Two kinds of input are accepted:
+- processed: a CSV that already has the model's feature columns plus
+  heart_attack (e.g. backend/datasets/heart_attack_train_processed.csv);
+  it is validated against the feature schema and downcast. The notebook
+  that makes it oversamples with SMOTE after one-hot encoding, so synthetic
+  rows can carry fractional flags (e.g. region_Urban=0.37). Those are kept
+  as they are: a flag column holding any is stored as float64 instead of
+  int8, and meta.json counts the affected rows per column. Anything else
+  outside the schema (NaN, out-of-range values, unknown columns) is an error
+- raw (--raw): a dirty extract with the original columns (gender, region,
+  smoking_status, ...). It is cleaned and encoded the way the notebooks in
+  preprocessing/ did: exact duplicates dropped, text normalized, negative
+  and physiologically impossible values treated as missing, missing values
+  imputed (numeric: median, categorical: 'Unknown' or the most common value),
+  measurements rounded and categoricals one-hot encoded into the schema's
+  flags. Oversampling and feature selection stay training decisions; the
+  selected features are the schema's.
+
+Neither pass holds more than one chunk of the file in memory. A raw file is
+read twice: the first pass finds duplicates (8 bytes of hash per row) and
+counts values for the medians and modes, the second cleans and writes.
+
+The result is a columnar cache, one .npy file per column in the schema's
+storage dtype (int8 flags, int16 age, float32 measurements, int8 target),
+under cache_dir/<key>/ (meta.json lists the dtypes actually used). The key hashes the file's contents, the schema and
+the pipeline version, so an edited file or changed rules are never served
+from a stale entry. Loading memory-maps the columns, which is near instant.
+
+    python ml_model/preprocessing.py heartAttack_dirty.csv --raw
+    python ml_model/preprocessing.py heartAttack_dirty.csv --raw --export-csv processed.csv
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ML_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(ML_DIR, '..', 'backend'))
+from utils.preprocess import SCHEMA
+
+TARGET = 'heart_attack'
+DEFAULT_DATA_PATH = os.path.join(ML_DIR, '..', 'backend', 'datasets', 'heart_attack_train_processed.csv')
+DEFAULT_CACHE_DIR = os.path.join(ML_DIR, '.cache')
+DEFAULT_CHUNK_ROWS = 200000
+
+# Bump when the cleaning rules change, so old cache entries are not reused
+PIPELINE_VERSION = 1
+META_FILENAME = 'meta.json'
+
+# Valid physiological ranges; values outside are treated as missing
+RANGE_RULES = {
+    'age': (0, 100),
+    'sleep_hours': (0, 24),
+    'cholesterol_level': (50, 500),
+    'triglycerides': (0, 1500),
+    'waist_circumference': (30, 300),
+    'fasting_blood_sugar': (40, 600),
+}
+
+MEASUREMENTS = ('age', 'cholesterol_level', 'waist_circumference', 'sleep_hours',
+                'fasting_blood_sugar', 'triglycerides')
+BINARY_COLUMNS = ('hypertension', 'diabetes', 'obesity', 'previous_heart_disease', 'medication_usage')
+
+# One-hot flags of the schema: feature -> (raw column, value), compared after normalization
+FLAGS = {
+    'region_Urban': ('region', 'Urban'),
+    'income_level_middle': ('income_level', 'middle'),
+    'smoking_status_Never': ('smoking_status', 'Never'),
+    'smoking_status_Past': ('smoking_status', 'Past'),
+    'smoking_status_Unknown': ('smoking_status', 'Unknown'),
+    'physical_activity_Low': ('physical_activity', 'Low'),
+    'stress_level_Moderate': ('stress_level', 'Moderate'),
+    'stress_level_moderate': ('stress_level', 'moderate'),
+    'EKG_results_Normal': ('EKG_results', 'Normal'),
+    'gender_Male': ('gender', 'Male'),
+}
+CATEGORICAL_COLUMNS = tuple(sorted(set(column for column, _ in FLAGS.values())))
+# Categoricals written in title case by the cleaning step
+TITLE_CASE = frozenset(['gender', 'region', 'smoking_status', 'EKG_results'])
+# Categoricals whose missing values become their own 'Unknown' category
+UNKNOWN_FILL = frozenset(['smoking_status', 'region'])
+
+NUMERIC_COLUMNS = MEASUREMENTS + BINARY_COLUMNS
+
+# Schema columns of the 0/1 features (one-hot and yes/no flags)
+FLAG_COLUMNS = np.array([column for column, feature in enumerate(SCHEMA.features)
+                         if feature.dtype == 'int8' and (feature.low, feature.high) == (0, 1)], dtype=np.intp)
+RAW_COLUMNS = NUMERIC_COLUMNS + CATEGORICAL_COLUMNS + (TARGET,)
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """SHA-256 of a file's contents, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def dataset_key(path, raw=False):
+    """Cache key for path: its content hash combined with the schema and the pipeline rules"""
+    digest = hashlib.sha256(file_digest(path).encode('ascii'))
+    digest.update(json.dumps(SCHEMA.to_dict(), sort_keys=True).encode('utf-8'))
+    digest.update(f"{PIPELINE_VERSION}:{'raw' if raw else 'processed'}".encode('ascii'))
+    return digest.hexdigest()[:24]
+
+
+def count_rows(path, chunk_size=1 << 20):
+    """Data rows in a CSV with a header line (no quoted newlines)"""
+    lines = 0
+    last = b'\n'
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            lines += chunk.count(b'\n')
+            last = chunk[-1:]
+    if last != b'\n':
+        lines += 1
+    return max(lines - 1, 0)
+
+
+def _read_chunks(path, chunk_rows, columns=None):
+    """Raw chunks as strings (NaN for empty cells); parsing and coercion happen per column"""
+    return pd.read_csv(path, chunksize=chunk_rows, dtype=str, usecols=columns)
+
+
+# --- raw pipeline -----------------------------------------------------------------
+
+def _map_distinct(series, convert):
+    """
+    convert applied to each distinct value of series only, then spread back
+    over the rows (extracts repeat a few thousand distinct strings per column)
+    """
+    codes, distinct = pd.factorize(series)
+    converted = np.asarray(convert(pd.Series(distinct, dtype=object)))
+    return converted, codes
+
+
+def _normalize_text(series, title=False):
+    """Trim, collapse inner whitespace and (optionally) title-case"""
+    def normalize(values):
+        values = values.str.strip().str.replace(r'\s+', ' ', regex=True)
+        return values.str.title() if title else values
+
+    converted, codes = _map_distinct(series, normalize)
+    result = np.append(converted.astype(object), np.nan)
+    return pd.Series(result[codes], index=series.index)
+
+
+def _clean_numeric(series, column):
+    """Numbers with unparseable, negative and out-of-range values set to NaN"""
+    converted, codes = _map_distinct(series, lambda values: pd.to_numeric(values, errors='coerce'))
+    # Code -1 (a missing cell) picks the appended NaN
+    values = np.append(converted.astype(np.float64), np.nan)[codes]
+    with np.errstate(invalid='ignore'):
+        if column in RANGE_RULES:
+            low, high = RANGE_RULES[column]
+            values[(values < low) | (values > high)] = np.nan
+        elif column in BINARY_COLUMNS or column == TARGET:
+            values[(values != 0) & (values != 1)] = np.nan
+        else:
+            values[values < 0] = np.nan
+    return values
+
+
+def _clean_chunk(chunk):
+    """{column: cleaned values} for the columns the features are built from"""
+    cleaned = {}
+    for column in NUMERIC_COLUMNS + (TARGET,):
+        cleaned[column] = _clean_numeric(chunk[column], column)
+    for column in CATEGORICAL_COLUMNS:
+        cleaned[column] = _normalize_text(chunk[column], title=column in TITLE_CASE)
+    return cleaned
+
+
+def _add_counts(totals, values):
+    """Merge value counts of values (NaN excluded) into totals"""
+    for value, count in pd.Series(values).value_counts(dropna=True).items():
+        totals[value] = totals.get(value, 0) + int(count)
+
+
+def _median(counts):
+    """Exact median (pandas semantics) from a value -> count mapping"""
+    if not counts:
+        return None
+    values = sorted(counts)
+    total = sum(counts.values())
+    lower_rank, upper_rank = (total - 1) // 2, total // 2
+    seen = 0
+    lower = upper = None
+    for value in values:
+        seen += counts[value]
+        if lower is None and seen > lower_rank:
+            lower = value
+        if seen > upper_rank:
+            upper = value
+            break
+    return (lower + upper) / 2.0
+
+
+def _mode(counts):
+    """Most common value; ties go to the smallest, as pandas' mode()[0]"""
+    if not counts:
+        return None
+    best = max(counts.values())
+    return min(value for value, count in counts.items() if count == best)
+
+
+class _SeenRows:
+    """Hashes of the rows kept so far, as one sorted array (8 bytes per row)"""
+
+    def __init__(self):
+        self.hashes = np.empty(0, dtype=np.uint64)
+
+    def first_occurrences(self, chunk):
+        """Mask of rows in chunk not seen before (in this chunk or earlier ones)"""
+        hashes = pd.util.hash_pandas_object(chunk, index=False).to_numpy()
+        unique, first_index = np.unique(hashes, return_index=True)
+        position = np.searchsorted(self.hashes, unique)
+        known = position < len(self.hashes)
+        known[known] = self.hashes[position[known]] == unique[known]
+
+        keep = np.zeros(len(chunk), dtype=bool)
+        keep[first_index[~known]] = True
+        # Two sorted runs: the stable sort merges them in linear time
+        merged = np.concatenate([self.hashes, unique[~known]])
+        merged.sort(kind='stable')
+        self.hashes = merged
+        return keep
+
+
+def _scan_raw(path, chunk_rows):
+    """
+    First pass over a raw file: which rows to keep (first occurrences with a
+    valid target) and the statistics used to impute the missing values
+    """
+    missing = [column for column in RAW_COLUMNS if column not in pd.read_csv(path, nrows=0).columns]
+    if missing:
+        raise ValueError(f"{path} is missing raw columns: {missing}")
+
+    seen = _SeenRows()
+    keep_masks = []
+    stats = {'rows_read': 0, 'duplicates': 0, 'missing_target': 0, 'invalid': {}, 'missing': {}}
+    counts = {column: {} for column in NUMERIC_COLUMNS + CATEGORICAL_COLUMNS}
+
+    for chunk in _read_chunks(path, chunk_rows):
+        keep = seen.first_occurrences(chunk)
+        stats['rows_read'] += len(chunk)
+        stats['duplicates'] += int(len(chunk) - keep.sum())
+
+        cleaned = _clean_chunk(chunk)
+        has_target = ~np.isnan(cleaned[TARGET])
+        stats['missing_target'] += int((keep & ~has_target).sum())
+        keep &= has_target
+        keep_masks.append(keep)
+
+        for column in NUMERIC_COLUMNS:
+            present = chunk[column].notna().to_numpy()[keep]
+            values = cleaned[column][keep]
+            invalid = int((present & np.isnan(values)).sum())
+            stats['invalid'][column] = stats['invalid'].get(column, 0) + invalid
+            stats['missing'][column] = stats['missing'].get(column, 0) + int(np.isnan(values).sum())
+            _add_counts(counts[column], values)
+        for column in CATEGORICAL_COLUMNS:
+            values = cleaned[column][keep]
+            stats['missing'][column] = stats['missing'].get(column, 0) + int(values.isna().sum())
+            _add_counts(counts[column], values)
+
+    fill = {column: _median(counts[column]) for column in NUMERIC_COLUMNS}
+    for column in CATEGORICAL_COLUMNS:
+        fill[column] = 'Unknown' if column in UNKNOWN_FILL else _mode(counts[column])
+    return keep_masks, fill, stats
+
+
+def _encode_raw(chunk, keep, fill):
+    """Model columns (name -> float64 values) for the kept rows of a raw chunk"""
+    cleaned = _clean_chunk(chunk)
+    columns = {}
+    for column in NUMERIC_COLUMNS:
+        values = cleaned[column][keep]
+        if fill[column] is not None:
+            values[np.isnan(values)] = fill[column]
+        # The feature notebook rounded every numeric feature to a whole number
+        columns[column] = np.round(values)
+    categorical = {}
+    for column in CATEGORICAL_COLUMNS:
+        values = cleaned[column][keep]
+        categorical[column] = values.fillna(fill[column]) if fill[column] is not None else values
+    for feature, (column, value) in FLAGS.items():
+        columns[feature] = (categorical[column] == value).to_numpy(dtype=np.float64)
+    columns[TARGET] = cleaned[TARGET][keep]
+    return columns
+
+
+# --- cache ------------------------------------------------------------------------
+
+def _storage_dtype(column):
+    if column == TARGET:
+        return np.int8
+    return np.dtype(SCHEMA.features[SCHEMA.index[column]].dtype)
+
+
+class _ColumnWriter:
+    """
+    Preallocated .npy memmaps, one per column, filled chunk by chunk.
+
+    With fractional_flags, flag values strictly between 0 and 1 are accepted;
+    the first one seen in a column widens that column to float64.
+    """
+
+    def __init__(self, directory, n_rows, fractional_flags=False):
+        self.directory = directory
+        self.arrays = {
+            column: np.lib.format.open_memmap(os.path.join(directory, f'{column}.npy'), mode='w+',
+                                              dtype=_storage_dtype(column), shape=(n_rows,))
+            for column in SCHEMA.names + (TARGET,)
+        }
+        self.n_rows = n_rows
+        self.offset = 0
+        self.fractional_flags = fractional_flags
+        self.fractional_rows = 0
+        self.fractional_counts = {}
+
+    def _widen(self, name):
+        """Rewrite a column as float64, keeping the rows written so far"""
+        path = os.path.join(self.directory, f'{name}.npy')
+        old = self.arrays[name]
+        new = np.lib.format.open_memmap(path + '.tmp', mode='w+', dtype=np.float64, shape=(self.n_rows,))
+        new[:self.offset] = old[:self.offset]
+        del old
+        os.replace(path + '.tmp', path)
+        self.arrays[name] = new
+
+    def _accept_fractional_flags(self, X, n_rows):
+        """
+        Errors for X with fractional flags allowed (None if it has none);
+        widens and counts the columns that have them
+        """
+        flags = X[:, FLAG_COLUMNS]
+        with np.errstate(invalid='ignore'):
+            fractional = (flags > 0) & (flags < 1)
+        if not fractional.any():
+            return None
+        # Check the rest of each row with its fractional flags replaced by a valid value
+        flags[fractional] = 0
+        checked = X.copy()
+        checked[:, FLAG_COLUMNS] = flags
+        errors = SCHEMA.vectorize_columns(
+            {name: checked[:, column] for name, column in SCHEMA.index.items()}, n_rows)[2]
+
+        self.fractional_rows += int(fractional.any(axis=1).sum())
+        for k in np.flatnonzero(fractional.any(axis=0)):
+            name = SCHEMA.names[FLAG_COLUMNS[k]]
+            self.fractional_counts[name] = self.fractional_counts.get(name, 0) + int(fractional[:, k].sum())
+            if self.arrays[name].dtype != np.float64:
+                self._widen(name)
+        return errors
+
+    def write(self, columns, n_rows, source):
+        """Validate one chunk against the schema, downcast it and append it"""
+        X, _, errors = SCHEMA.vectorize_columns(columns, n_rows)
+        if errors and self.fractional_flags:
+            accepted = self._accept_fractional_flags(X, n_rows)
+            if accepted is not None:
+                errors = accepted
+        if errors:
+            row, error = min(errors.items())
+            raise ValueError(f"{source}, data row {self.offset + row + 1}: {error}")
+        target = np.asarray(columns[TARGET], dtype=np.float64)
+        if np.any((target != 0) & (target != 1)):
+            raise ValueError(f"{source}: {TARGET} must be 0 or 1")
+        if self.offset + n_rows > self.n_rows:
+            raise ValueError(f"{source} has more rows than counted; quoted newlines are not supported")
+
+        end = self.offset + n_rows
+        for column, name in enumerate(SCHEMA.names):
+            self.arrays[name][self.offset:end] = X[:, column]
+        self.arrays[TARGET][self.offset:end] = target
+        self.offset = end
+
+    def close(self):
+        if self.offset != self.n_rows:
+            raise ValueError(f"Expected {self.n_rows} rows, wrote {self.offset}")
+        for array in self.arrays.values():
+            array.flush()
+        self.arrays = {}
+
+
+def _build_processed(path, directory, chunk_rows):
+    header = pd.read_csv(path, nrows=0).columns
+    if TARGET not in header:
+        raise ValueError(f"{path} has no {TARGET} column")
+    SCHEMA.check_columns(header.drop(TARGET), path, ordered=False)
+
+    writer = _ColumnWriter(directory, count_rows(path), fractional_flags=True)
+    for chunk in _read_chunks(path, chunk_rows):
+        columns = {column: chunk[column].to_numpy() for column in chunk.columns}
+        writer.write(columns, len(chunk), path)
+    writer.close()
+    return {'rows_read': writer.n_rows, 'fractional_flag_rows': writer.fractional_rows,
+            'fractional_flags': writer.fractional_counts}
+
+
+def _build_raw(path, directory, chunk_rows):
+    keep_masks, fill, stats = _scan_raw(path, chunk_rows)
+    writer = _ColumnWriter(directory, int(sum(mask.sum() for mask in keep_masks)))
+    for chunk, keep in zip(_read_chunks(path, chunk_rows, list(RAW_COLUMNS)), keep_masks):
+        if keep.any():
+            writer.write(_encode_raw(chunk, keep, fill), int(keep.sum()), path)
+    writer.close()
+    stats['fill'] = {column: value for column, value in fill.items()}
+    return stats
+
+
+def build_cache(path, cache_dir=DEFAULT_CACHE_DIR, raw=False, chunk_rows=DEFAULT_CHUNK_ROWS, key=None):
+    """Run the pipeline on path and publish its columns as cache_dir/<key>; returns the directory"""
+    key = key or dataset_key(path, raw)
+    directory = os.path.join(cache_dir, key)
+    # Built aside and renamed so a concurrent run never reads half an entry
+    tmp = f"{directory}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    try:
+        start = time.perf_counter()
+        stats = (_build_raw if raw else _build_processed)(path, tmp, chunk_rows)
+        columns = load_columns(tmp)
+        meta = {
+            'key': key,
+            'source': os.path.abspath(path),
+            'raw': raw,
+            'pipeline_version': PIPELINE_VERSION,
+            'rows': int(columns[TARGET].shape[0]),
+            'columns': {column: array.dtype.name for column, array in columns.items()},
+            'stats': stats,
+            'build_seconds': time.perf_counter() - start,
+        }
+        with open(os.path.join(tmp, META_FILENAME), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=2)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+    shutil.rmtree(directory, ignore_errors=True)
+    try:
+        os.rename(tmp, directory)
+    except OSError:
+        # Another process published the same entry first
+        shutil.rmtree(tmp, ignore_errors=True)
+    return directory
+
+
+def load_columns(directory):
+    """{column: read-only memmap} for a cache entry (target included)"""
+    return {
+        column: np.load(os.path.join(directory, f'{column}.npy'), mmap_mode='r')
+        for column in SCHEMA.names + (TARGET,)
+    }
+
+
+def to_matrix(columns, dtype=np.float64):
+    """The features as an (n_rows, n_features) matrix in schema order"""
+    X = np.empty((len(columns[TARGET]), len(SCHEMA)), dtype=dtype)
+    for column, name in enumerate(SCHEMA.names):
+        X[:, column] = columns[name]
+    return X
+
+
+def load_dataset(path=DEFAULT_DATA_PATH, cache_dir=DEFAULT_CACHE_DIR, use_cache=True, raw=False,
+                 chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Return (X, y, key): the float64 feature matrix in schema order, the int8
+    target and the dataset's cache key. The pipeline only runs when the file
+    is not cached yet (or use_cache is False).
+    """
+    key = dataset_key(path, raw)
+    directory = os.path.join(cache_dir, key)
+    if not use_cache or not os.path.isfile(os.path.join(directory, META_FILENAME)):
+        build_cache(path, cache_dir, raw, chunk_rows, key)
+    columns = load_columns(directory)
+    return to_matrix(columns), np.asarray(columns[TARGET]), key
+
+
+def export_csv(directory, path, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Write a cache entry back out as a processed CSV (features, then the target)"""
+    columns = load_columns(directory)
+    n_rows = len(columns[TARGET])
+    names = list(SCHEMA.names) + [TARGET]
+    for start in range(0, max(n_rows, 1), chunk_rows):
+        frame = pd.DataFrame({name: columns[name][start:start + chunk_rows] for name in names})
+        frame.to_csv(path, mode='w' if start == 0 else 'a', header=start == 0, index=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build the columnar dataset cache for a CSV')
+    parser.add_argument('input', nargs='?', default=DEFAULT_DATA_PATH, help='dataset CSV')
+    parser.add_argument('--raw', action='store_true', help='input is a raw extract to clean and encode')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument('--force', action='store_true', help='rebuild even if the file is cached')
+    parser.add_argument('--export-csv', metavar='PATH', help='also write the processed dataset as CSV')
+    args = parser.parse_args(argv)
+
+    key = dataset_key(args.input, args.raw)
+    directory = os.path.join(args.cache_dir, key)
+    if args.force or not os.path.isfile(os.path.join(directory, META_FILENAME)):
+        build_cache(args.input, args.cache_dir, args.raw, args.chunk_rows, key)
+    with open(os.path.join(directory, META_FILENAME), 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    print(f"{meta['rows']} rows cached in {directory} (built in {meta['build_seconds']:.2f}s)")
+    print(json.dumps(meta['stats'], indent=2))
+
+    if args.export_csv:
+        export_csv(directory, args.export_csv, args.chunk_rows)
+        print(f"Processed dataset written to {args.export_csv}")
+
+
+if __name__ == '__main__':
+    main()
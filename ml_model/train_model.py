@@ -1,44 +1,310 @@
-import pandas as pd
+"""
+Train the Random Forest and publish it as a new model version.
+
+    python ml_model/train_model.py                    # search the default grid
+    python ml_model/train_model.py --param n_estimators=100,300 --param max_depth=none,12
+    python ml_model/train_model.py --no-search        # one model, n_estimators=100
+
+The dataset is loaded through the columnar cache keyed by the CSV's content
+hash (see preprocessing.py; --raw runs the cleaning pipeline on a raw
+extract). Every candidate is cross-validated in parallel on all cores; the
+folds are split and scaled once and the same arrays are shared
+by every candidate. The best candidate is refit on the training split,
+checked on the held-out test split and saved as a new version together with
+a metadata.json recording the data hash, the parameters, and each
+candidate's CV score, fit time and inference latency. The forest is also
+exported as a compact forest.ccf, which the native backend loads without
+sklearn, after checking it predicts exactly like the pickle.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+import joblib
 import numpy as np
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler
+import sklearn
+from joblib import Parallel, delayed
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import accuracy_score, classification_report
-import joblib
-import os
+from sklearn.metrics import accuracy_score, classification_report, f1_score, roc_auc_score
+from sklearn.model_selection import ParameterGrid, StratifiedKFold, train_test_split
+from sklearn.preprocessing import StandardScaler
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from preprocessing import DEFAULT_CACHE_DIR, DEFAULT_CHUNK_ROWS, DEFAULT_DATA_PATH, load_dataset
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from services.forest_engine import PROBA_TOLERANCE, load_compact, save_compact
+from services.model_store import COMPACT_FILENAME, MODEL_FILENAME, SCALER_FILENAME, activate_version, versions_dir
+from utils.preprocess import SCHEMA, SCHEMA_FILENAME
+
+METADATA_FILENAME = 'metadata.json'
+
+# Searched unless --param or --no-search is given
+DEFAULT_GRID = {
+    'n_estimators': [100, 200],
+    'max_depth': [None, 12],
+    'min_samples_leaf': [1, 4],
+    'max_features': ['sqrt', 0.5],
+}
+
+SCORERS = {
+    'accuracy': lambda model, X, y: accuracy_score(y, model.predict(X)),
+    'f1': lambda model, X, y: f1_score(y, model.predict(X)),
+    'roc_auc': lambda model, X, y: roc_auc_score(y, model.predict_proba(X)[:, 1]),
+}
+
+# Single-row predictions timed per candidate (the request path scores one row)
+LATENCY_REPEATS = 50
+
+
+def _parse_value(text):
+    if text.lower() == 'none':
+        return None
+    for cast in (int, float):
+        try:
+            return cast(text)
+        except ValueError:
+            pass
+    return text
+
+
+def parse_grid(params):
+    """{"name": [values]} from --param name=v1,v2 arguments"""
+    grid = {}
+    for param in params:
+        name, _, values = param.partition('=')
+        if not name or not values:
+            raise ValueError(f"Expected name=value[,value...], got: {param}")
+        grid[name] = [_parse_value(value) for value in values.split(',')]
+    return grid
+
+
+def measure_latency(model, X, repeats=LATENCY_REPEATS):
+    """Single-row predict_proba latency (p50/p99 ms) and batch cost per row (us) on X"""
+    timings = []
+    for i in range(repeats):
+        row = X[i % len(X)].reshape(1, -1)
+        start = time.perf_counter()
+        model.predict_proba(row)
+        timings.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    model.predict_proba(X)
+    batch = time.perf_counter() - start
+    return {
+        'single_p50_ms': float(np.percentile(timings, 50) * 1000),
+        'single_p99_ms': float(np.percentile(timings, 99) * 1000),
+        'batch_us_per_row': batch / len(X) * 1e6,
+    }
+
+
+def make_folds(X, y, n_folds, seed):
+    """Split and scale the CV folds once; every candidate reuses these arrays"""
+    folds = []
+    for train_index, test_index in StratifiedKFold(n_folds, shuffle=True, random_state=seed).split(X, y):
+        scaler = StandardScaler().fit(X[train_index])
+        folds.append((scaler.transform(X[train_index]), y[train_index],
+                      scaler.transform(X[test_index]), y[test_index]))
+    return folds
+
+
+def _evaluate(params, fold, scoring, seed):
+    """Fit one candidate on one fold (single-threaded: the folds run in parallel instead)"""
+    X_train, y_train, X_test, y_test = fold
+    model = RandomForestClassifier(random_state=seed, n_jobs=1, **params)
+    start = time.perf_counter()
+    model.fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - start
+    result = {'score': SCORERS[scoring](model, X_test, y_test), 'fit_seconds': fit_seconds}
+    result.update(measure_latency(model, X_test))
+    return result
+
+
+def search(grid, folds, scoring, seed, n_jobs):
+    """Cross-validate every candidate in grid; returns one summary per candidate, best first"""
+    candidates = list(ParameterGrid(grid))
+    # One task per (candidate, fold); joblib memory-maps the fold arrays once
+    # and shares them with every worker instead of pickling them per task
+    results = Parallel(n_jobs=n_jobs)(
+        delayed(_evaluate)(params, fold, scoring, seed) for params in candidates for fold in folds
+    )
+
+    summaries = []
+    for i, params in enumerate(candidates):
+        runs = results[i * len(folds):(i + 1) * len(folds)]
+        scores = [run['score'] for run in runs]
+        summaries.append({
+            'params': params,
+            'score_mean': float(np.mean(scores)),
+            'score_std': float(np.std(scores)),
+            'fit_seconds': float(np.mean([run['fit_seconds'] for run in runs])),
+            'single_p50_ms': float(np.median([run['single_p50_ms'] for run in runs])),
+            'single_p99_ms': float(np.median([run['single_p99_ms'] for run in runs])),
+            'batch_us_per_row': float(np.median([run['batch_us_per_row'] for run in runs])),
+        })
+    # Best score first; equal scores go to the faster model
+    summaries.sort(key=lambda summary: (-summary['score_mean'], summary['single_p50_ms']))
+    return summaries
+
+
+def export_compact(model, scaler, path, X_check, version):
+    """
+    Write the compact forest file and check it reproduces the model's
+    probabilities on X_check (raw rows); returns what metadata.json records
+    """
+    save_compact(path, model, scaler, features=SCHEMA.names, metadata={'version': version})
+    engine, engine_scaler, _ = load_compact(path)
+    expected = model.predict_proba(scaler.transform(X_check))
+    difference = float(np.max(np.abs(engine.predict_proba(engine_scaler.transform(X_check)) - expected)))
+    if difference > PROBA_TOLERANCE:
+        raise ValueError(f"Compact forest probabilities differ from the model by {difference:.3g}")
+    return {'file': COMPACT_FILENAME, 'bytes': os.path.getsize(path), 'max_proba_difference': difference}
+
+
+def reserve_version(root):
+    """
+    A new version name and its staging directory. Names are the local time
+    to the second, with -2, -3, ... appended when another run already took
+    it; creating the staging directory claims the name atomically.
+    """
+    os.makedirs(root, exist_ok=True)
+    stamp = time.strftime('%Y%m%d-%H%M%S')
+    attempt = 1
+    while True:
+        version = stamp if attempt == 1 else f'{stamp}-{attempt}'
+        attempt += 1
+        staging_dir = os.path.join(root, f'.{version}.tmp')
+        try:
+            os.mkdir(staging_dir)
+        except FileExistsError:
+            continue  # another run is writing this version
+        if not os.path.exists(os.path.join(root, version)):
+            return version, staging_dir
+        os.rmdir(staging_dir)  # already published
+
+
+def save_version(model, scaler, metadata, activate=True, X_check=None):
+    """
+    Write the artifacts as a new version directory and (optionally) make it
+    the active one. With X_check (raw rows) the compact forest is exported too.
+    """
+    root = versions_dir()
+    version, staging_dir = reserve_version(root)
+
+    joblib.dump(model, os.path.join(staging_dir, MODEL_FILENAME))
+    joblib.dump(scaler, os.path.join(staging_dir, SCALER_FILENAME))
+    SCHEMA.save(os.path.join(staging_dir, SCHEMA_FILENAME))
+    metadata = dict(metadata, version=version)
+    if X_check is not None:
+        metadata['compact'] = export_compact(
+            model, scaler, os.path.join(staging_dir, COMPACT_FILENAME), X_check, version)
+        metadata['compact']['pickle_bytes'] = os.path.getsize(os.path.join(staging_dir, MODEL_FILENAME))
+    with open(os.path.join(staging_dir, METADATA_FILENAME), 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, indent=2)
+
+    # Publish the finished directory in one rename so it is never seen
+    # half-written; the backend's model watcher (or POST /api/model/reload)
+    # then swaps it in without a restart
+    os.rename(staging_dir, os.path.join(root, version))
+    if activate:
+        activate_version(version)
+    return version
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--data', default=DEFAULT_DATA_PATH, help='training CSV')
+    parser.add_argument('--raw', action='store_true', help='--data is a raw extract to clean and encode')
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS, help='rows per preprocessing chunk')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help='preprocessed dataset cache')
+    parser.add_argument('--no-cache', action='store_true', help='parse the CSV even if it is cached')
+    parser.add_argument('--param', action='append', default=[], metavar='NAME=V1,V2',
+                        help='RandomForestClassifier parameter values to search (repeatable)')
+    parser.add_argument('--no-search', action='store_true', help='train only n_estimators=100')
+    parser.add_argument('--cv', type=int, default=5, help='cross-validation folds (default 5)')
+    parser.add_argument('--scoring', choices=sorted(SCORERS), default='accuracy')
+    parser.add_argument('--jobs', type=int, default=-1, help='parallel fits (default: all cores)')
+    parser.add_argument('--test-size', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--no-activate', action='store_true', help='save the version without activating it')
+    args = parser.parse_args(argv)
 
-# Load the dataset
-data_path = os.path.join(os.path.dirname(__file__), '..', 'backend', 'datasets', 'heart_attack_train_processed.csv')
-df = pd.read_csv(data_path)
+    if args.no_search:
+        grid = {'n_estimators': [100]}
+    elif args.param:
+        try:
+            grid = parse_grid(args.param)
+        except ValueError as e:
+            parser.error(str(e))
+    else:
+        grid = DEFAULT_GRID
 
-# Separate features and target
-X = df.drop('heart_attack', axis=1)
-y = df['heart_attack']
+    # Load the dataset
+    start = time.perf_counter()
+    X, y, data_key = load_dataset(args.data, args.cache_dir, use_cache=not args.no_cache, raw=args.raw,
+                                  chunk_rows=args.chunk_rows)
+    print(f"Loaded {len(X)} rows in {time.perf_counter() - start:.2f}s (dataset {data_key})")
 
-# Split the data
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+    # Split the data
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=args.test_size, random_state=args.seed, stratify=y)
 
-# Scale the features
-scaler = StandardScaler()
-X_train_scaled = scaler.fit_transform(X_train)
-X_test_scaled = scaler.transform(X_test)
+    # Cross-validate every candidate
+    folds = make_folds(X_train, y_train, args.cv, args.seed)
+    n_candidates = len(ParameterGrid(grid))
+    print(f"Searching {n_candidates} candidates x {args.cv} folds...")
+    start = time.perf_counter()
+    candidates = search(grid, folds, args.scoring, args.seed, args.jobs)
+    search_seconds = time.perf_counter() - start
+    for candidate in candidates:
+        print(f"  {args.scoring} {candidate['score_mean']:.4f} +/- {candidate['score_std']:.4f}  "
+              f"fit {candidate['fit_seconds']:.2f}s  p50 {candidate['single_p50_ms']:.2f}ms  {candidate['params']}")
+    best = candidates[0]
 
-# Train Random Forest model
-rf_model = RandomForestClassifier(n_estimators=100, random_state=42)
-rf_model.fit(X_train_scaled, y_train)
+    # Refit the best candidate on the whole training split. The scaler is
+    # fitted on plain arrays, as the backend serves it (feature_schema.json
+    # records the column order)
+    scaler = StandardScaler().fit(X_train)
+    X_train_scaled = scaler.transform(X_train)
+    X_test_scaled = scaler.transform(X_test)
+    model = RandomForestClassifier(random_state=args.seed, n_jobs=args.jobs, **best['params'])
+    start = time.perf_counter()
+    model.fit(X_train_scaled, y_train)
+    fit_seconds = time.perf_counter() - start
+    # Serve single-threaded: a per-request thread pool costs more than it saves
+    model.set_params(n_jobs=None)
 
-# Evaluate the model
-y_pred = rf_model.predict(X_test_scaled)
-accuracy = accuracy_score(y_test, y_pred)
-print(f"Model Accuracy: {accuracy:.4f}")
-print("Classification Report:")
-print(classification_report(y_test, y_pred))
+    # Evaluate the model
+    y_pred = model.predict(X_test_scaled)
+    test_metrics = {
+        'accuracy': accuracy_score(y_test, y_pred),
+        'f1': f1_score(y_test, y_pred),
+        'roc_auc': roc_auc_score(y_test, model.predict_proba(X_test_scaled)[:, 1]),
+    }
+    latency = measure_latency(model, X_test_scaled)
+    print(f"Model Accuracy: {test_metrics['accuracy']:.4f}")
+    print("Classification Report:")
+    print(classification_report(y_test, y_pred))
 
-# Save the model and scaler
-model_dir = os.path.join(os.path.dirname(__file__), '..', 'backend', 'models')
-os.makedirs(model_dir, exist_ok=True)
+    metadata = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'data': {'path': os.path.abspath(args.data), 'raw': args.raw, 'key': data_key, 'rows': int(len(X)),
+                 'train_rows': int(len(X_train)), 'test_rows': int(len(X_test))},
+        'model': {'class': 'RandomForestClassifier', 'params': best['params'], 'seed': args.seed},
+        'fit_seconds': fit_seconds,
+        'latency': latency,
+        'test_metrics': test_metrics,
+        'search': {'scoring': args.scoring, 'cv_folds': args.cv, 'seconds': search_seconds,
+                   'candidates': candidates},
+        'environment': {'python': platform.python_version(), 'sklearn': sklearn.__version__,
+                        'numpy': np.__version__, 'cpus': os.cpu_count()},
+    }
+    version = save_version(model, scaler, metadata, activate=not args.no_activate, X_check=X_test)
+    print(f"Model and scaler saved successfully as version {version}!")
+    return version
 
-joblib.dump(rf_model, os.path.join(model_dir, 'ml_model.pkl'))
-joblib.dump(scaler, os.path.join(model_dir, 'scaler.pkl'))
 
-print("Model and scaler saved successfully!")
\ No newline at end of file
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,268 @@
+"""
+Score a large CSV or Parquet file offline with the backend's model.
+
+The input is read in chunks, chunks are scored in a process pool (one
+process per core by default, each loading the model once) and the results
+are written to a CSV in input order:
+
+    row, <id columns>, prediction, probability, risk_level, model_version, error
+
+Rows that fail schema validation get an error instead of a prediction.
+
+After every written chunk a checkpoint (<output>.checkpoint) records how far
+the output got. Re-running the same command with --resume after a crash
+truncates any partially written chunk and carries on from there with the
+same model version.
+
+    python tools/bulk_score.py screening.parquet scores.csv --workers 8
+    python tools/bulk_score.py screening.parquet scores.csv --workers 8 --resume
+
+Parquet input needs pyarrow.
+"""
+import argparse
+import collections
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+
+# Identifier columns copied from the input to the output
+ID_FIELDS = ('id', 'record_id', 'patient_id', 'user_id')
+
+OUTPUT_COLUMNS = ['prediction', 'probability', 'risk_level', 'model_version', 'error']
+
+# Checkpoint label for the legacy flat artifacts (no versions directory)
+LEGACY_VERSION = 'legacy'
+
+# Per-process state, set up by _init_worker
+_service = None
+_buffer = None
+
+
+def _backend_imports():
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+
+
+def _init_worker(version, backend, chunk_rows):
+    global _service, _buffer
+    _backend_imports()
+    from services.prediction_service import PredictionService
+    from utils.preprocess import SCHEMA
+
+    _service = PredictionService(backend=backend, load=False)
+    _service.reload(None if version == LEGACY_VERSION else version)
+    _buffer = SCHEMA.allocate(chunk_rows)
+
+
+def _score_chunk(first_row, frame):
+    """Score one input chunk and return it as CSV text (no header) plus its error count"""
+    from utils.preprocess import SCHEMA
+
+    n_rows = len(frame)
+    columns = {name: frame[name].to_numpy() for name in frame.columns if name in SCHEMA.index}
+    X, valid, errors = SCHEMA.vectorize_columns(columns, n_rows, out=_buffer)
+
+    prediction = np.full(n_rows, np.nan)
+    probability = np.full(n_rows, np.nan)
+    if valid.any():
+        predicted, positive = _service.score_matrix(X[valid], _service.bundle)
+        prediction[valid] = predicted
+        probability[valid] = positive
+
+    out = pd.DataFrame({'row': np.arange(first_row, first_row + n_rows)})
+    for name in ID_FIELDS:
+        if name in frame.columns:
+            out[name] = frame[name].to_numpy()
+    out['prediction'] = pd.array(prediction, dtype='Int8')
+    out['probability'] = probability
+    out['risk_level'] = np.where(valid, np.where(prediction == 1, 'High', 'Low'), '')
+    out['model_version'] = np.where(valid, _service.model_version, '')
+    error = np.full(n_rows, '', dtype=object)
+    for i, message in errors.items():
+        error[i] = message
+    out['error'] = error
+    return out.to_csv(index=False, header=False), len(errors)
+
+
+def read_chunks(path, chunk_rows, skip_rows=0):
+    """Yield DataFrames of up to chunk_rows rows, starting skip_rows rows into the file"""
+    if path.lower().endswith(('.parquet', '.pq')):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            sys.exit('Reading Parquet needs pyarrow (pip install pyarrow)')
+        parquet = pq.ParquetFile(path)
+        skipped = 0
+        for batch in parquet.iter_batches(batch_size=chunk_rows):
+            if skipped < skip_rows:
+                # Resume only ever skips whole chunks
+                skipped += batch.num_rows
+                continue
+            yield batch.to_pandas()
+        return
+
+    skip = range(1, skip_rows + 1) if skip_rows else None
+    for frame in pd.read_csv(path, chunksize=chunk_rows, skiprows=skip):
+        yield frame
+
+
+def output_header(path):
+    """Header of the output CSV: row, the input's id columns, then the scores"""
+    if path.lower().endswith(('.parquet', '.pq')):
+        import pyarrow.parquet as pq
+        names = pq.ParquetFile(path).schema_arrow.names
+    else:
+        names = list(pd.read_csv(path, nrows=0).columns)
+    return ','.join(['row'] + [name for name in ID_FIELDS if name in names] + OUTPUT_COLUMNS) + '\n'
+
+
+class Checkpoint:
+    """Progress of one run, rewritten atomically after every chunk"""
+
+    def __init__(self, path, state):
+        self.path = path
+        self.state = state
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(path, json.load(f))
+
+    def save(self):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+
+def input_identity(path):
+    stat = os.stat(path)
+    return {'path': os.path.abspath(path), 'size': stat.st_size, 'mtime': stat.st_mtime}
+
+
+def start_run(args):
+    """Open the output and checkpoint for a new or resumed run"""
+    checkpoint_path = args.output + '.checkpoint'
+    identity = input_identity(args.input)
+
+    if args.resume and os.path.exists(checkpoint_path):
+        checkpoint = Checkpoint.load(checkpoint_path)
+        state = checkpoint.state
+        if state['input'] != identity or state['chunk_rows'] != args.chunk_rows:
+            sys.exit('Checkpoint does not match this input file and --chunk-rows; rerun without --resume')
+        output = open(args.output, 'r+b')
+        # Drop whatever was written after the last completed chunk
+        output.truncate(state['output_bytes'])
+        output.seek(state['output_bytes'])
+        print(f"Resuming after {state['rows_done']} rows with model version {state['version']}")
+        return checkpoint, output
+
+    _backend_imports()
+    from config import Config
+    from services.model_store import active_version
+    version = args.version or active_version()
+    if version is None:
+        # No versions directory: score with the legacy flat artifacts, as the backend does
+        if not os.path.isfile(Config.MODEL_PATH):
+            sys.exit('No model found; train a model first')
+        version = LEGACY_VERSION
+
+    output = open(args.output, 'wb')
+    output.write(output_header(args.input).encode('utf-8'))
+    output.flush()
+    os.fsync(output.fileno())
+    checkpoint = Checkpoint(checkpoint_path, {
+        'input': identity,
+        'chunk_rows': args.chunk_rows,
+        'version': version,
+        'rows_done': 0,
+        'errors': 0,
+        'output_bytes': output.tell(),
+    })
+    checkpoint.save()
+    return checkpoint, output
+
+
+def run(args):
+    checkpoint, output = start_run(args)
+    state = checkpoint.state
+    if state.get('finished'):
+        output.close()
+        print(f"Already finished: {state['rows_done']} rows scored with model {state['version']}")
+        return
+    workers = args.workers or os.cpu_count() or 1
+    # Bounded so a slow writer or a huge input cannot pile chunks up in memory
+    max_in_flight = workers * 2
+
+    started = time.perf_counter()
+    rows_this_run = 0
+    with output, ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(state['version'], args.backend, args.chunk_rows)) as pool:
+        in_flight = collections.deque()
+        next_row = state['rows_done']
+
+        def write_oldest():
+            nonlocal rows_this_run
+            future, n_rows = in_flight.popleft()
+            text, n_errors = future.result()
+            output.write(text.encode('utf-8'))
+            output.flush()
+            os.fsync(output.fileno())
+            state['rows_done'] += n_rows
+            state['errors'] += n_errors
+            state['output_bytes'] = output.tell()
+            checkpoint.save()
+
+            rows_this_run += n_rows
+            elapsed = time.perf_counter() - started
+            print(f"{state['rows_done']} rows scored ({rows_this_run / elapsed:.0f} rows/s)", flush=True)
+
+        for frame in read_chunks(args.input, args.chunk_rows, skip_rows=state['rows_done']):
+            in_flight.append((pool.submit(_score_chunk, next_row, frame), len(frame)))
+            next_row += len(frame)
+            if len(in_flight) >= max_in_flight:
+                write_oldest()
+        while in_flight:
+            write_oldest()
+
+    elapsed = time.perf_counter() - started
+    state['finished'] = True
+    checkpoint.save()
+    print(f"Done: {state['rows_done']} rows ({state['errors']} rejected) with model {state['version']}; "
+          f"{rows_this_run} rows in {elapsed:.1f}s this run ({rows_this_run / elapsed if elapsed else 0:.0f} rows/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help='CSV (with header) or Parquet file of patient records')
+    parser.add_argument('output', help='CSV file to write the scores to')
+    parser.add_argument('--workers', type=int, default=0, help='scoring processes (default: one per core)')
+    parser.add_argument('--chunk-rows', type=int, default=50000)
+    parser.add_argument('--version', help='model version to score with (default: the active one)')
+    parser.add_argument('--backend', choices=('sklearn', 'native'),
+                        help='prediction backend (default: PREDICTION_BACKEND)')
+    parser.add_argument('--model-dir', help='model directory (default: MODEL_DIR or backend/models)')
+    parser.add_argument('--resume', action='store_true', help='continue from <output>.checkpoint')
+    args = parser.parse_args()
+
+    if args.model_dir:
+        # Read by backend/config.py, in this process and in the workers
+        os.environ['MODEL_DIR'] = os.path.abspath(args.model_dir)
+    if args.resume and not os.path.exists(args.output + '.checkpoint'):
+        print('No checkpoint found; starting from the beginning')
+    run(args)
+
+
+if __name__ == '__main__':
+    main()
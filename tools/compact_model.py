@@ -0,0 +1,177 @@
+"""
+Export model versions as compact forest files and report what they save.
+
+For each version the compact forest.ccf is written if it is missing (or
+with --force), then the script reports:
+
+- file size: the pickled model + scaler against forest.ccf
+- load time: median over --runs fresh interpreters, each loading the pickles
+  with joblib (which imports sklearn) or forest.ccf with forest_engine's
+  NumPy-only loader, plus a repeated load in this process (imports and page
+  cache warm)
+- parity: the largest probability difference and the number of differing
+  predictions between the pickle and forest.ccf on --rows synthetic rows
+
+Exits with status 1 if any version's probabilities differ by more than
+--tolerance.
+
+    python tools/compact_model.py                  # the active version
+    python tools/compact_model.py --all --json compact.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import joblib
+import numpy as np
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+sys.path.insert(0, BACKEND_DIR)
+
+from services.forest_engine import PROBA_TOLERANCE, load_compact, save_compact  # noqa: E402
+from services.model_store import (COMPACT_FILENAME, MODEL_FILENAME, SCALER_FILENAME, active_version,  # noqa: E402
+                                  list_versions, versions_dir)
+from services.prediction_service import synthetic_rows  # noqa: E402
+from utils.preprocess import SCHEMA  # noqa: E402
+
+PICKLE_CHILD = """
+import sys, time
+start = time.perf_counter()
+import joblib
+joblib.load(sys.argv[1])
+joblib.load(sys.argv[2])
+print(time.perf_counter() - start)
+"""
+
+COMPACT_CHILD = """
+import sys, time
+start = time.perf_counter()
+sys.path.insert(0, sys.argv[2])
+from services.forest_engine import load_compact
+load_compact(sys.argv[1])
+print(time.perf_counter() - start, 'sklearn' in sys.modules)
+"""
+
+
+def cold_load_seconds(code, args, runs):
+    """Median seconds to import and load in a fresh interpreter, and the last run's extra output"""
+    timings, extra = [], []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', code, *args], check=True,
+                                capture_output=True, text=True).stdout.split()
+        timings.append(float(output[0]))
+        extra = output[1:]
+    return statistics.median(timings), extra
+
+
+def report_version(version, args):
+    directory = os.path.join(versions_dir(), version)
+    model_path = os.path.join(directory, MODEL_FILENAME)
+    scaler_path = os.path.join(directory, SCALER_FILENAME)
+    compact_path = os.path.join(directory, COMPACT_FILENAME)
+
+    model = joblib.load(model_path)
+    scaler = joblib.load(scaler_path)
+    # Loaded again with sklearn already imported: the load alone
+    start = time.perf_counter()
+    joblib.load(model_path)
+    joblib.load(scaler_path)
+    pickle_warm = time.perf_counter() - start
+
+    if args.force or not os.path.isfile(compact_path):
+        save_compact(compact_path, model, scaler, features=SCHEMA.names, metadata={'version': version})
+        print(f"{version}: wrote {compact_path}")
+
+    engine, engine_scaler, header = load_compact(compact_path)
+    start = time.perf_counter()
+    load_compact(compact_path)
+    compact_warm = time.perf_counter() - start
+
+    # The scaler may have been fitted on named columns; give it the same
+    X = synthetic_rows(args.rows, args.seed)
+    X_named = X
+    if getattr(scaler, 'feature_names_in_', None) is not None:
+        import pandas as pd
+        X_named = pd.DataFrame(X, columns=list(scaler.feature_names_in_))
+    expected = model.predict_proba(scaler.transform(X_named))
+    actual = engine.predict_proba(engine_scaler.transform(X))
+
+    pickle_cold, _ = cold_load_seconds(PICKLE_CHILD, [model_path, scaler_path], args.runs)
+    compact_cold, extra = cold_load_seconds(COMPACT_CHILD, [compact_path, BACKEND_DIR], args.runs)
+
+    pickle_bytes = os.path.getsize(model_path) + os.path.getsize(scaler_path)
+    compact_bytes = os.path.getsize(compact_path)
+    return {
+        'version': version,
+        'trees': header['n_trees'],
+        'nodes': header['n_nodes'],
+        'pickle_bytes': pickle_bytes,
+        'compact_bytes': compact_bytes,
+        'size_ratio': pickle_bytes / compact_bytes,
+        'pickle_load_seconds': pickle_cold,
+        'compact_load_seconds': compact_cold,
+        'pickle_load_warm_seconds': pickle_warm,
+        'compact_load_warm_seconds': compact_warm,
+        'compact_imports_sklearn': extra == ['True'],
+        'parity_rows': args.rows,
+        'max_proba_difference': float(np.max(np.abs(actual - expected))),
+        'prediction_mismatches': int(np.sum(np.argmax(actual, axis=1) != np.argmax(expected, axis=1))),
+    }
+
+
+def print_report(result):
+    mib = 1024.0 * 1024.0
+    print(f"\n== {result['version']} ({result['trees']} trees, {result['nodes']} nodes) ==")
+    print(f"{'':<22}{'pickle':>12}{'compact':>12}{'saving':>10}")
+    print(f"{'size (MiB)':<22}{result['pickle_bytes'] / mib:>12.2f}{result['compact_bytes'] / mib:>12.2f}"
+          f"{result['size_ratio']:>9.1f}x")
+    for label, suffix in (('cold load (ms)', ''), ('warm load (ms)', '_warm')):
+        before = result[f'pickle_load{suffix}_seconds']
+        after = result[f'compact_load{suffix}_seconds']
+        print(f"{label:<22}{before * 1000:>12.1f}{after * 1000:>12.1f}{before / max(after, 1e-9):>9.1f}x")
+    print(f"parity on {result['parity_rows']} rows: max |proba difference| {result['max_proba_difference']:.3g}, "
+          f"{result['prediction_mismatches']} differing predictions")
+    if result['compact_imports_sklearn']:
+        print("Warning: loading the compact forest imported sklearn")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--version', action='append', help='version to report (repeatable; default: the active one)')
+    parser.add_argument('--all', action='store_true', help='every version on disk')
+    parser.add_argument('--force', action='store_true', help='rewrite forest.ccf even if it exists')
+    parser.add_argument('--rows', type=int, default=20000, help='synthetic rows for the parity check')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters per cold load measurement')
+    parser.add_argument('--tolerance', type=float, default=PROBA_TOLERANCE,
+                        help='largest accepted probability difference')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args(argv)
+
+    versions = list_versions() if args.all else args.version or [active_version()]
+    if not versions or versions == [None]:
+        sys.exit(f'No model versions found in {versions_dir()}')
+
+    results = []
+    for version in versions:
+        result = report_version(version, args)
+        print_report(result)
+        results.append(result)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    failed = [result['version'] for result in results if result['max_proba_difference'] > args.tolerance]
+    if failed:
+        print(f"\nProbabilities differ beyond {args.tolerance:g} for: {', '.join(failed)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,465 @@
+"""
+Load generator for capacity testing of the gunicorn deployment.
+
+Sends realistic patient records to /api/predict over raw asyncio HTTP/1.1
+connections. The records are shaped like the ones show_prediction sends:
+form-level choices (gender, smoking status, ...) drawn from plausible
+distributions and one-hot encoded the same way.
+
+Two load models:
+
+  closed loop (--concurrency 1,2,4,...)  N users, each sending its next
+      request as soon as the previous one is answered
+  open loop (--rate 50,100,200,...)      requests arrive at R per second
+      (Poisson, or evenly spaced with --arrivals uniform) whether or not
+      earlier ones were answered. Latency is measured from each request's
+      scheduled send time, so queueing in front of a saturated server counts.
+
+Every level in the list is run for --duration seconds after --warmup
+seconds, reporting throughput, latency percentiles and errors by status.
+The saturation point is the first level where errors exceed
+--max-error-rate, p99 exceeds --slo-ms, throughput stops growing by at least
+--min-gain (closed loop), or throughput falls below 95% of the offered
+rate (open loop). The capacity is the best throughput seen before it.
+
+Without --url, a local gunicorn (backend/gunicorn.conf.py, wsgi:app) is
+started for every combination of --workers and --threads. Each one is
+measured in turn and the configurations are ranked by capacity. Rate
+limiting and MongoDB recording are turned off in the started backend.
+
+    python tools/loadgen.py --workers 1,2,4 --threads 1,4 --concurrency 1,2,4,8,16,32
+    python tools/loadgen.py --url http://127.0.0.1:5000 --rate 50,100,200,400 --slo-ms 250
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.parse
+import urllib.request
+
+import numpy as np
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+
+# Environment of a started backend; the client's own environment is passed
+# through first, so e.g. PREDICTION_BACKEND=native still applies
+BACKEND_ENV = {
+    'RECORD_PREDICTIONS': '0',
+    'DEFAULT_RATE_LIMIT': '0',
+    'MODEL_WATCH_INTERVAL': '0',
+}
+
+# Form choices and how often patients pick them
+CHOICES = {
+    'gender': (['Male', 'Female'], [0.5, 0.5]),
+    'region': (['Urban', 'Rural'], [0.6, 0.4]),
+    'smoking_status': (['Never', 'Past', 'Current', 'Unknown'], [0.5, 0.25, 0.2, 0.05]),
+    'physical_activity': (['High', 'Moderate', 'Low'], [0.3, 0.4, 0.3]),
+    'stress_level': (['Low', 'Moderate', 'High'], [0.35, 0.4, 0.25]),
+    'income_level': (['Low', 'Middle', 'High'], [0.3, 0.45, 0.25]),
+    'ekg_results': (['Normal', 'Abnormal'], [0.8, 0.2]),
+}
+CONDITIONS = {
+    'hypertension': 0.3, 'diabetes': 0.15, 'previous_heart_disease': 0.1, 'obesity': 0.25,
+    'medication_usage': 0.2,
+}
+
+
+def make_patient(rng):
+    """One /api/predict record, encoded like show_prediction encodes the form"""
+    choice = {name: rng.choice(options, p=weights) for name, (options, weights) in CHOICES.items()}
+    record = {'age': int(np.clip(rng.normal(54, 14), 18, 90))}
+    record.update({name: int(rng.random() < p) for name, p in CONDITIONS.items()})
+    record.update({
+        'cholesterol_level': int(np.clip(rng.normal(200, 40), 100, 600)),
+        'waist_circumference': int(np.clip(rng.normal(92, 14), 50, 200)),
+        'sleep_hours': round(float(np.clip(rng.normal(6.8, 1.2), 0, 12)), 1),
+        'fasting_blood_sugar': int(np.clip(rng.lognormal(np.log(100), 0.25), 50, 500)),
+        'triglycerides': int(np.clip(rng.lognormal(np.log(140), 0.4), 50, 1000)),
+        'region_Urban': int(choice['region'] == 'Urban'),
+        'income_level_middle': int(choice['income_level'] == 'Middle'),
+        'smoking_status_Never': int(choice['smoking_status'] == 'Never'),
+        'smoking_status_Past': int(choice['smoking_status'] == 'Past'),
+        'smoking_status_Unknown': int(choice['smoking_status'] == 'Unknown'),
+        'physical_activity_Low': int(choice['physical_activity'] == 'Low'),
+        'stress_level_Moderate': int(choice['stress_level'] == 'Moderate'),
+        'stress_level_moderate': int(choice['stress_level'] == 'Moderate'),
+        'EKG_results_Normal': int(choice['ekg_results'] == 'Normal'),
+        'gender_Male': int(choice['gender'] == 'Male'),
+    })
+    return record
+
+
+def encode_requests(host, port, path, n, seed):
+    """n ready-to-send HTTP requests, each with a different patient"""
+    rng = np.random.default_rng(seed)
+    requests = []
+    for _ in range(n):
+        body = json.dumps(make_patient(rng)).encode()
+        head = (f"POST {path} HTTP/1.1\r\nHost: {host}:{port}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: keep-alive\r\n\r\n").encode()
+        requests.append(head + body)
+    return requests
+
+
+class Connection:
+    """A keep-alive HTTP/1.1 connection; reopened when the server closes it"""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def send(self, request):
+        """Send one request and read the whole response; returns the status code"""
+        reused = self.writer is not None
+        try:
+            return await self._exchange(request)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            # A kept-alive connection the server has since closed: retry once
+            self.close()
+            if not reused:
+                raise
+            return await self._exchange(request)
+
+    async def _exchange(self, request):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.writer.write(request)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionResetError('connection closed by server')
+        status = int(status_line.split()[1])
+        length, chunked, close = 0, False, False
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            name, value = name.strip().lower(), value.strip().lower()
+            if name == 'content-length':
+                length = int(value)
+            elif name == 'transfer-encoding':
+                chunked = 'chunked' in value
+            elif name == 'connection':
+                close = value == 'close'
+
+        if chunked:
+            while True:
+                size = int((await self.reader.readline()).split(b';')[0], 16)
+                await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+        elif length:
+            await self.reader.readexactly(length)
+        if close:
+            self.close()
+        return status
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+class Recorder:
+    """
+    Outcomes of the requests sent inside the measured window. Throughput
+    counts only the successes completed inside it too, so requests still
+    queued when the window closes do not inflate it.
+    """
+
+    def __init__(self, end):
+        self.end = end
+        self.latencies = []
+        self.outcomes = {}
+        self.completed = 0
+
+    def add(self, latency, outcome):
+        self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+        if outcome == 200:
+            self.latencies.append(latency)
+            if time.perf_counter() <= self.end:
+                self.completed += 1
+
+    def summary(self, seconds):
+        requests = sum(self.outcomes.values())
+        errors = requests - self.outcomes.get(200, 0)
+        latencies = np.asarray(self.latencies) * 1000
+        percentiles = {}
+        if len(latencies):
+            for name, q in (('p50', 50), ('p90', 90), ('p99', 99), ('p999', 99.9)):
+                percentiles[name] = float(np.percentile(latencies, q))
+            percentiles['mean'] = float(latencies.mean())
+            percentiles['max'] = float(latencies.max())
+        return {
+            'requests': requests,
+            'errors': errors,
+            'error_rate': errors / requests if requests else 0.0,
+            'outcomes': {str(outcome): count for outcome, count in sorted(self.outcomes.items(), key=str)},
+            'throughput': self.completed / seconds,
+            'latency_ms': percentiles,
+        }
+
+
+async def _timed_send(connection, request, timeout):
+    """The response status, or the name of the failure"""
+    try:
+        return await asyncio.wait_for(connection.send(request), timeout)
+    except asyncio.TimeoutError:
+        connection.close()
+        return 'timeout'
+    except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+        connection.close()
+        return type(e).__name__
+
+
+async def closed_loop(target, requests, concurrency, duration, warmup, timeout):
+    host, port = target
+    measure_from = time.perf_counter() + warmup
+    end = measure_from + duration
+    recorder = Recorder(end)
+
+    async def user(index):
+        connection = Connection(host, port)
+        i = index
+        while True:
+            start = time.perf_counter()
+            if start >= end:
+                break
+            outcome = await _timed_send(connection, requests[i % len(requests)], timeout)
+            if start >= measure_from:
+                recorder.add(time.perf_counter() - start, outcome)
+            i += concurrency
+        connection.close()
+
+    await asyncio.gather(*(user(index) for index in range(concurrency)))
+    return recorder.summary(duration)
+
+
+async def open_loop(target, requests, rate, duration, warmup, timeout, max_connections, arrivals, seed):
+    host, port = target
+    rng = np.random.default_rng(seed)
+    slots = asyncio.Semaphore(max_connections)
+    idle = []
+
+    async def fire(request, scheduled, measured):
+        # Waiting for a free connection is part of the latency
+        async with slots:
+            connection = idle.pop() if idle else Connection(host, port)
+            outcome = await _timed_send(connection, request, timeout)
+            idle.append(connection)
+        if measured:
+            recorder.add(time.perf_counter() - scheduled, outcome)
+
+    start = time.perf_counter()
+    measure_from, end = start + warmup, start + warmup + duration
+    recorder = Recorder(end)
+    scheduled, i, tasks, arrivals_measured = start, 0, [], 0
+    while scheduled < end:
+        now = time.perf_counter()
+        if scheduled > now:
+            await asyncio.sleep(scheduled - now)
+        tasks.append(asyncio.ensure_future(fire(requests[i % len(requests)], scheduled, scheduled >= measure_from)))
+        arrivals_measured += scheduled >= measure_from
+        i += 1
+        scheduled += rng.exponential(1 / rate) if arrivals == 'poisson' else 1 / rate
+    # Requests still queued at the end are waited for (up to the timeout)
+    await asyncio.wait(tasks, timeout=timeout + 5)
+    for task in tasks:
+        task.cancel()
+    for connection in idle:
+        connection.close()
+    summary = recorder.summary(duration)
+    # The arrivals actually drawn, which differ from rate by Poisson noise
+    summary['offered'] = arrivals_measured / duration
+    return summary
+
+
+def find_saturation(steps, mode, slo_ms, max_error_rate, min_gain):
+    """(index of the first saturated step or None, reasons)"""
+    for index, step in enumerate(steps):
+        reasons = []
+        if step['error_rate'] > max_error_rate:
+            reasons.append(f"error rate {step['error_rate']:.1%}")
+        p99 = step['latency_ms'].get('p99')
+        if slo_ms and (p99 is None or p99 > slo_ms):
+            reasons.append(f"p99 over {slo_ms:g} ms")
+        if mode == 'open' and step['throughput'] < 0.95 * step['offered']:
+            reasons.append(f"throughput {step['throughput']:.0f}/s below the offered {step['offered']:.0f}/s")
+        if mode == 'closed' and index and step['throughput'] < steps[index - 1]['throughput'] * (1 + min_gain):
+            gain = step['throughput'] / max(steps[index - 1]['throughput'], 1e-9) - 1
+            reasons.append(f"throughput {gain:+.0%} over concurrency {steps[index - 1]['level']:g}")
+        if reasons:
+            return index, reasons
+    return None, []
+
+
+def run_levels(target, args, label=''):
+    """Run every load level against target; returns the steps and the saturation analysis"""
+    host, port = target
+    requests = encode_requests(host, port, args.path, args.payloads, args.seed)
+    mode = 'open' if args.rate else 'closed'
+    levels = args.rate or args.concurrency
+    steps = []
+    print(f"\n{label}{'rate/s' if mode == 'open' else 'users':>8}{'req/s':>9}{'p50 ms':>9}{'p90 ms':>9}"
+          f"{'p99 ms':>9}{'max ms':>9}{'errors':>8}")
+    for level in levels:
+        if mode == 'open':
+            step = asyncio.run(open_loop(target, requests, level, args.duration, args.warmup, args.timeout,
+                                         args.max_connections, args.arrivals, args.seed))
+        else:
+            step = asyncio.run(closed_loop(target, requests, int(level), args.duration, args.warmup, args.timeout))
+        step['level'] = level
+        steps.append(step)
+        latency = step['latency_ms']
+        print(f"{label}{level:>8g}{step['throughput']:>9.1f}" +
+              ''.join(f"{latency.get(name, float('nan')):>9.1f}" for name in ('p50', 'p90', 'p99', 'max')) +
+              f"{step['error_rate']:>8.1%}", flush=True)
+        if step['errors']:
+            print(f"{label}{'':>8}outcomes: {step['outcomes']}")
+
+    saturated_at, reasons = find_saturation(steps, mode, args.slo_ms, args.max_error_rate, args.min_gain)
+    healthy = steps[:saturated_at] if saturated_at is not None else steps
+    # A closed loop is still at capacity at the level where throughput flattened
+    if mode == 'closed' and saturated_at is not None and reasons and all('throughput' in r for r in reasons):
+        healthy = steps[:saturated_at + 1]
+    best = max(healthy, key=lambda step: step['throughput']) if healthy else None
+    analysis = {
+        'mode': mode,
+        'saturated_at': steps[saturated_at]['level'] if saturated_at is not None else None,
+        'reasons': reasons,
+        'capacity': best['throughput'] if best else 0.0,
+        'capacity_level': best['level'] if best else None,
+        'capacity_p99_ms': best['latency_ms'].get('p99') if best else None,
+    }
+    if saturated_at is None:
+        print(f"{label}No saturation up to {levels[-1]:g}; capacity at least {analysis['capacity']:.1f} req/s")
+    else:
+        print(f"{label}Saturates at {analysis['saturated_at']:g} ({', '.join(reasons)}); "
+              f"capacity {analysis['capacity']:.1f} req/s")
+    return {'steps': steps, **analysis}
+
+
+def wait_until_ready(base_url, timeout, process=None):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process is not None and process.poll() is not None:
+            return False
+        try:
+            with urllib.request.urlopen(base_url + '/api/ready', timeout=2):
+                return True
+        except Exception:
+            time.sleep(0.5)
+    return False
+
+
+def start_backend(workers, threads, port, args):
+    env = dict(os.environ, **BACKEND_ENV)
+    env.update({'GUNICORN_WORKERS': str(workers), 'GUNICORN_THREADS': str(threads),
+                'GUNICORN_BIND': f'127.0.0.1:{port}'})
+    if not args.cache:
+        env['PREDICTION_CACHE_SIZE'] = '0'
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL,
+        stderr=None if args.server_logs else subprocess.DEVNULL)
+    if not wait_until_ready(f'http://127.0.0.1:{port}', args.start_timeout, process):
+        stop_backend(process)
+        raise RuntimeError(f'gunicorn ({workers} workers x {threads} threads) did not become ready '
+                           f'within {args.start_timeout:g}s')
+    return process
+
+
+def stop_backend(process):
+    if process.poll() is None:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+def _float_list(text):
+    return [float(value) for value in text.split(',') if value]
+
+
+def _int_list(text):
+    return [int(value) for value in text.split(',') if value]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='drive an already running backend instead of starting gunicorn')
+    parser.add_argument('--path', default='/api/predict')
+    parser.add_argument('--workers', type=_int_list, default=[2], help='gunicorn worker counts to sweep')
+    parser.add_argument('--threads', type=_int_list, default=[1], help='gunicorn threads per worker to sweep')
+    parser.add_argument('--port', type=int, default=5077, help='port for started backends')
+    parser.add_argument('--concurrency', type=_float_list, default=[1, 2, 4, 8, 16, 32],
+                        help='closed loop: concurrent users per level')
+    parser.add_argument('--rate', type=_float_list, help='open loop: arrival rates (requests/s) per level')
+    parser.add_argument('--arrivals', choices=('poisson', 'uniform'), default='poisson')
+    parser.add_argument('--max-connections', type=int, default=256, help='open loop: connection limit')
+    parser.add_argument('--duration', type=float, default=10.0, help='measured seconds per level')
+    parser.add_argument('--warmup', type=float, default=2.0, help='unmeasured seconds before each level')
+    parser.add_argument('--timeout', type=float, default=10.0, help='per-request timeout in seconds')
+    parser.add_argument('--slo-ms', type=float, help='p99 latency target; exceeding it counts as saturated')
+    parser.add_argument('--max-error-rate', type=float, default=0.01)
+    parser.add_argument('--min-gain', type=float, default=0.05,
+                        help='closed loop: smallest throughput gain per level that is not saturation')
+    parser.add_argument('--payloads', type=int, default=1000, help='distinct patients to cycle through')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--cache', action='store_true', help='keep the prediction cache on in started backends')
+    parser.add_argument('--start-timeout', type=float, default=120)
+    parser.add_argument('--server-logs', action='store_true', help="show gunicorn's log output")
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args(argv)
+
+    results = []
+    if args.url:
+        url = urllib.parse.urlsplit(args.url)
+        target = (url.hostname, url.port or 80)
+        if not wait_until_ready(args.url.rstrip('/'), args.start_timeout):
+            sys.exit(f'{args.url} is not ready')
+        results.append({'url': args.url, **run_levels(target, args)})
+    else:
+        for workers in args.workers:
+            for threads in args.threads:
+                print(f"\n== gunicorn: {workers} workers x {threads} threads ==")
+                process = start_backend(workers, threads, args.port, args)
+                try:
+                    run = run_levels(('127.0.0.1', args.port), args)
+                finally:
+                    stop_backend(process)
+                results.append({'workers': workers, 'threads': threads, **run})
+
+        if len(results) > 1:
+            print(f"\n{'workers':>8}{'threads':>8}{'capacity/s':>12}{'at':>8}{'p99 ms':>9}  saturation")
+            # Highest capacity first; equal capacity goes to the smaller deployment
+            ranked = sorted(results, key=lambda r: (-round(r['capacity'], 1), r['workers'] * r['threads']))
+            for result in ranked:
+                p99 = result['capacity_p99_ms']
+                print(f"{result['workers']:>8}{result['threads']:>8}{result['capacity']:>12.1f}"
+                      f"{result['capacity_level'] or 0:>8g}{p99 if p99 is not None else float('nan'):>9.1f}  "
+                      f"{', '.join(result['reasons']) or 'none reached'}")
+            best = ranked[0]
+            print(f"Best: GUNICORN_WORKERS={best['workers']} GUNICORN_THREADS={best['threads']} "
+                  f"({best['capacity']:.1f} req/s)")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                       'cpus': os.cpu_count(), 'path': args.path, 'duration': args.duration,
+                       'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""
+Measure per-worker memory of the gunicorn deployment with and without the
+shared (memory-mapped) model.
+
+For each mode the script starts gunicorn from backend/ with
+gunicorn.conf.py, waits for it to answer, sends a few predictions so every
+worker touches the model, then reads RSS and PSS of the master and each
+worker from /proc/<pid>/smaps_rollup (Linux only).
+
+PSS splits shared pages between the processes mapping them, so the PSS
+total is the real memory cost of the deployment; RSS counts shared pages
+once per process.
+
+    python tools/measure_worker_memory.py --workers 4
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+
+MODES = {
+    'baseline': {'PREDICTION_BACKEND': 'sklearn', 'MODEL_SHARING': '', 'GUNICORN_PRELOAD': '0'},
+    'shared': {'PREDICTION_BACKEND': 'native', 'MODEL_SHARING': 'mmap', 'GUNICORN_PRELOAD': '1'},
+}
+
+SAMPLE_RECORD = {
+    'age': 55, 'hypertension': 1, 'diabetes': 0, 'cholesterol_level': 240, 'obesity': 0,
+    'waist_circumference': 95, 'sleep_hours': 6.5, 'fasting_blood_sugar': 105, 'triglycerides': 180,
+    'previous_heart_disease': 0, 'medication_usage': 1, 'region_Urban': 1, 'income_level_middle': 1,
+    'smoking_status_Never': 0, 'smoking_status_Past': 1, 'smoking_status_Unknown': 0,
+    'physical_activity_Low': 1, 'stress_level_Moderate': 1, 'stress_level_moderate': 1,
+    'EKG_results_Normal': 1, 'gender_Male': 1
+}
+
+
+def read_memory(pid):
+    """RSS and PSS of pid in KiB"""
+    memory = {}
+    with open(f'/proc/{pid}/smaps_rollup', 'r') as f:
+        for line in f:
+            key, _, rest = line.partition(':')
+            if key in ('Rss', 'Pss'):
+                memory[key.lower()] = int(rest.split()[0])
+    return memory
+
+
+def child_pids(pid):
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children', 'r') as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+
+def wait_until_serving(url, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=2):
+                return True
+        except Exception:
+            time.sleep(0.5)
+    return False
+
+
+def post_prediction(url):
+    request = urllib.request.Request(
+        url, data=json.dumps(SAMPLE_RECORD).encode(), headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=30) as response:
+        response.read()
+
+
+def measure(mode, workers, port, timeout):
+    env = dict(os.environ, **MODES[mode])
+    env['GUNICORN_WORKERS'] = str(workers)
+    env['GUNICORN_BIND'] = f'127.0.0.1:{port}'
+    env['PREDICTION_CACHE_SIZE'] = '0'
+
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        base_url = f'http://127.0.0.1:{port}'
+        if not wait_until_serving(base_url + '/api/ready', timeout):
+            raise RuntimeError(f'{mode}: gunicorn did not start within {timeout}s')
+
+        # Enough requests that every worker has served (and paged in) the model
+        for _ in range(workers * 20):
+            post_prediction(base_url + '/api/predict')
+        time.sleep(1)
+
+        master = read_memory(process.pid)
+        worker_memory = [read_memory(pid) for pid in child_pids(process.pid)]
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout=30)
+
+    return {
+        'mode': mode,
+        'master': master,
+        'workers': worker_memory,
+        'total_rss_kib': master['rss'] + sum(w['rss'] for w in worker_memory),
+        'total_pss_kib': master['pss'] + sum(w['pss'] for w in worker_memory),
+    }
+
+
+def print_report(report):
+    mib = 1024.0
+    print(f"\n== {report['mode']} ==")
+    print(f"{'process':<10}{'RSS MiB':>12}{'PSS MiB':>12}")
+    print(f"{'master':<10}{report['master']['rss'] / mib:>12.1f}{report['master']['pss'] / mib:>12.1f}")
+    for i, worker in enumerate(report['workers']):
+        print(f"{'worker ' + str(i):<10}{worker['rss'] / mib:>12.1f}{worker['pss'] / mib:>12.1f}")
+    print(f"{'total':<10}{report['total_rss_kib'] / mib:>12.1f}{report['total_pss_kib'] / mib:>12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--timeout', type=float, default=120, help='seconds to wait for gunicorn to start')
+    parser.add_argument('--modes', nargs='+', choices=sorted(MODES), default=['baseline', 'shared'])
+    parser.add_argument('--json', help='also write the measurements to this file')
+    args = parser.parse_args()
+
+    if not os.path.exists('/proc/self/smaps_rollup'):
+        sys.exit('This script needs Linux /proc/<pid>/smaps_rollup')
+
+    reports = [measure(mode, args.workers, args.port, args.timeout) for mode in args.modes]
+    for report in reports:
+        print_report(report)
+
+    if len(reports) == 2:
+        before, after = reports
+        saved = (before['total_pss_kib'] - after['total_pss_kib']) / 1024.0
+        print(f"\nPSS saved by '{after['mode']}' over '{before['mode']}': {saved:.1f} MiB")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()